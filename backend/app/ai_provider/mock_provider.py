@@ -1,143 +1,201 @@
 """Mock AI Provider for generating offers and messages"""
 
+from statistics import median
+
+import numpy as np
+
+from app.ai_provider.templates import message_templates
+
+# Bump whenever the pricing rules below change: cached valuations
+# (app.ai_provider.valuation_cache) are keyed on it
+PRICING_VERSION = 1
+
+CURRENT_YEAR = 2025
+
+# (days after first contact, message template) - consumed by app.followups
+FOLLOWUP_SCHEDULE = (
+    (1, "follow_up_1"),
+    (3, "follow_up_2"),
+    (7, "follow_up_3"),
+)
+BASE_VALUE = 20000
+MIN_VALUE = 3000
+
+CONDITION_ADJUSTMENTS = {
+    "excellent": 1.1,
+    "good": 1.0,
+    "fair": 0.85,
+    "poor": 0.7
+}
+# Columnar condition codes for estimate_offers_batch; unknown prices at 1.0
+CONDITION_CODES = {name: code for code, name in enumerate(CONDITION_ADJUSTMENTS)}
+UNKNOWN_CONDITION = -1
+
+# Comparable listings: how many are needed before they count, the asking
+# price -> offer ratio, and the mileage adjustment applied per mile of difference
+MIN_COMPS = 3
+COMPS_OFFER_RATIO = 0.85
+COMPS_DOLLARS_PER_MILE = 0.05
+
+# Largest key span grouped with a dense lookup table instead of a sort
+DENSE_KEY_SPAN = 1 << 22
+
+
+def _base_value(year, mileage):
+    """Integer value before the condition adjustment"""
+    base_value = BASE_VALUE  # Starting point
+    
+    # Adjust for year
+    age = CURRENT_YEAR - year
+    base_value -= (age * 1000)
+    
+    # Adjust for mileage
+    if mileage > 100000:
+        base_value -= 5000
+    elif mileage > 75000:
+        base_value -= 3000
+    elif mileage > 50000:
+        base_value -= 1500
+    
+    return base_value
+
+
+def _adjusted_value(base_value, adjustment):
+    # Ensure minimum value
+    return max(base_value * adjustment, MIN_VALUE)
+
+
+def _offer_range(value):
+    """(low, fair, max) rounded to cents"""
+    return round(value * 0.85, 2), round(value, 2), round(value * 1.15, 2)
+
+
+def condition_codes(conditions):
+    """Condition names (any case) or codes -> int64 CONDITION_CODES array"""
+    conditions = np.asarray(conditions)
+    if np.issubdtype(conditions.dtype, np.integer):
+        codes = conditions.astype(np.int64)
+        return np.where((codes >= 0) & (codes < len(CONDITION_CODES)), codes, UNKNOWN_CONDITION)
+    names, inverse = np.unique(conditions.astype(str), return_inverse=True)
+    codes = np.array(
+        [CONDITION_CODES.get(name.lower(), UNKNOWN_CONDITION) for name in names],
+        dtype=np.int64
+    )
+    return codes[inverse.reshape(-1)]
+
+
+def _group(keys):
+    """(distinct keys, index of each row's key) - np.unique without the sort when keys are dense"""
+    if not keys.size:
+        return keys, keys
+    low = int(keys.min())
+    span = int(keys.max()) - low + 1
+    if span > DENSE_KEY_SPAN:
+        unique_keys, inverse = np.unique(keys, return_inverse=True)
+        return unique_keys, inverse.reshape(-1)
+    offsets = keys - low
+    present = np.flatnonzero(np.bincount(offsets, minlength=span))
+    lookup = np.empty(span, dtype=np.int64)
+    lookup[present] = np.arange(len(present))
+    return present + low, lookup[offsets]
+
+
 class MockAIProvider:
     
     def estimate_offer(self, year, make, model, mileage, condition, region, comps=None):
-        """Generate AI offer estimation"""
-        
-        # Base value calculation (simplified)
-        base_value = 20000  # Starting point
-        
-        # Adjust for year
-        current_year = 2025
-        age = current_year - year
-        base_value -= (age * 1000)
+        """Generate AI offer estimation
         
-        # Adjust for mileage
-        if mileage > 100000:
-            base_value -= 5000
-        elif mileage > 75000:
-            base_value -= 3000
-        elif mileage > 50000:
-            base_value -= 1500
+        comps: comparable listings (asking_price / mileage attributes, see
+        app.matching.comps); with at least MIN_COMPS the rule-based value
+        is averaged with their mileage-adjusted median asking price.
+        """
+        offer = self.price_offer(year, mileage, condition, comps)
+        return self.explain_offer(year, make, model, mileage, condition, offer)
+    
+    def price_offer(self, year, mileage, condition, comps=None):
+        """Offer range without the rationale - the cacheable part of estimate_offer"""
         
-        # Adjust for condition
-        condition_adjustments = {
-            "excellent": 1.1,
-            "good": 1.0,
-            "fair": 0.85,
-            "poor": 0.7
-        }
-        base_value *= condition_adjustments.get(condition.lower(), 1.0)
+        base_value = _adjusted_value(
+            _base_value(year, mileage),
+            CONDITION_ADJUSTMENTS.get(condition.lower(), 1.0)
+        )
         
-        # Ensure minimum value
-        base_value = max(base_value, 3000)
+        comp_value = None
+        if comps and len(comps) >= MIN_COMPS:
+            comp_value = median(
+                comp.asking_price + (comp.mileage - mileage) * COMPS_DOLLARS_PER_MILE
+                for comp in comps
+            )
+            base_value = max((base_value + comp_value * COMPS_OFFER_RATIO) / 2, MIN_VALUE)
         
         # Calculate offer range
-        fair_offer = base_value
-        low_offer = base_value * 0.85
-        max_offer = base_value * 1.15
+        low_offer, fair_offer, max_offer = _offer_range(base_value)
+        
+        return {
+            "low": low_offer,
+            "fair": fair_offer,
+            "max": max_offer,
+            "market_value": base_value,
+            "comp_count": len(comps) if comp_value is not None else 0,
+            "comp_value": comp_value
+        }
+    
+    def explain_offer(self, year, make, model, mileage, condition, offer):
+        """price_offer result -> estimate_offer response with its rationale"""
         
         rationale = f"Based on {year} {make} {model} with {mileage:,} miles in {condition} condition. "
-        rationale += f"Market analysis shows similar vehicles trading at ${fair_offer:,.0f}. "
+        if offer["comp_value"] is not None:
+            rationale += (
+                f"{offer['comp_count']} comparable listings ask around "
+                f"${offer['comp_value']:,.0f} (mileage adjusted). "
+            )
+        rationale += f"Market analysis shows similar vehicles trading at ${offer['market_value']:,.0f}. "
         rationale += "This estimate considers current market demand and vehicle history."
         
         return {
-            "low": round(low_offer, 2),
-            "fair": round(fair_offer, 2),
-            "max": round(max_offer, 2),
+            "low": offer["low"],
+            "fair": offer["fair"],
+            "max": offer["max"],
             "rationale": rationale
         }
     
-    def generate_message(self, template, lead_data, tone="friendly"):
-        """Generate AI message for dealer to send to seller"""
+    def estimate_offers_batch(self, year, mileage, condition, region=None):
+        """Columnar estimate_offer: float64 low/fair/max arrays, no rationale
         
-        listing = lead_data.get("listing", {})
-        seller_name = lead_data.get("seller_name", "there")
-        offer = lead_data.get("offer", {})
-        dealer_name = lead_data.get("dealer_name", "Our Team")
-        dealership_name = lead_data.get("dealership_name", "Our Dealership")
+        condition holds CONDITION_CODES (or names); region is accepted for
+        parity with estimate_offer, which does not price on it either.
+        Every value equals the scalar path's (without comps) for the same row.
+        """
+        year = np.asarray(year, dtype=np.int64)
+        mileage = np.asarray(mileage, dtype=np.int64)
+        codes = condition_codes(condition)
         
-        vehicle = f"{listing.get('year')} {listing.get('make')} {listing.get('model')}"
-        offer_amount = offer.get("amount", 0)
+        mileage_penalty = np.select(
+            [mileage > 100000, mileage > 75000, mileage > 50000],
+            [5000, 3000, 1500],
+            0
+        )
+        base = BASE_VALUE - (CURRENT_YEAR - year) * 1000 - mileage_penalty
         
-        messages = {
-            "initial_contact": {
-                "subject": f"Interest in Your {vehicle}",
-                "body": f"""Hi {seller_name},
-
-I hope this message finds you well! My name is {dealer_name} from {dealership_name}, and I came across your {vehicle} listing.
-
-We're actively looking for quality vehicles like yours, and after reviewing the details, I'd love to discuss a potential purchase.
-
-Based on our initial assessment:
-• Vehicle: {vehicle}
-• Mileage: {listing.get('mileage', 'N/A'):,} miles
-• Our preliminary offer: ${offer_amount:,.0f}
-
-Would you be available for a quick chat to discuss this further? I'd be happy to answer any questions and provide more details about our offer.
-
-Looking forward to hearing from you!
-
-Best regards,
-{dealer_name}
-{dealership_name}
-{lead_data.get('dealer_phone', '')}"""
-            },
-            "follow_up_1": {
-                "subject": f"Following up - {vehicle}",
-                "body": f"""Hi {seller_name},
-
-I wanted to follow up on my previous message about your {vehicle}. I understand you're probably busy, so I wanted to reach out again.
-
-We're still very interested in your vehicle and our offer of ${offer_amount:,.0f} still stands. We can make the process quick and easy:
-
-✓ Fast, hassle-free transaction
-✓ Same-day payment available
-✓ We handle all paperwork
-✓ No hidden fees
-
-Would you be open to discussing this further? Feel free to call or text me anytime.
-
-Best,
-{dealer_name}
-{dealership_name}"""
-            },
-            "follow_up_2": {
-                "subject": f"Final follow-up - {vehicle}",
-                "body": f"""Hi {seller_name},
-
-This is my final follow-up about your {vehicle}. I completely understand if you've already sold it or decided to keep it.
-
-If you're still interested in selling, our offer of ${offer_amount:,.0f} remains available. We've had great success with similar vehicles and would love to add yours to our inventory.
-
-No pressure at all - just wanted to make sure you had all the information you need to make the best decision.
-
-Wishing you all the best,
-{dealer_name}
-{dealership_name}"""
-            },
-            "request_more_info": {
-                "subject": f"Quick questions about your {vehicle}",
-                "body": f"""Hi {seller_name},
-
-Thank you for listing your {vehicle}! We're definitely interested, but I'd love to gather a bit more information to provide you with our best offer:
-
-• Service history - do you have maintenance records?
-• Any accidents or damage history?
-• Current mechanical condition?
-• Reason for selling?
-• Timeline - when are you looking to sell?
-
-Once I have these details, I can provide you with a comprehensive offer within 24 hours.
-
-Thanks!
-{dealer_name}
-{dealership_name}"""
-            }
-        }
+        # Rows sharing (integer base, condition) price identically. Round each
+        # distinct pair once with Python's round(): numpy's rint(x * 100) / 100
+        # disagrees with it in the last bit on some inputs.
+        keys = base * 8 + (codes - UNKNOWN_CONDITION)
+        unique_keys, inverse = _group(keys)
+        adjustments = {code: CONDITION_ADJUSTMENTS[name] for name, code in CONDITION_CODES.items()}
+        table = np.array([
+            _offer_range(_adjusted_value(
+                base_value, adjustments.get(code + UNKNOWN_CONDITION, 1.0)
+            ))
+            for base_value, code in (divmod(int(key), 8) for key in unique_keys)
+        ], dtype=np.float64).reshape(-1, 3)
         
-        return messages.get(template, messages["initial_contact"])
+        offers = table[inverse]
+        return {"low": offers[:, 0], "fair": offers[:, 1], "max": offers[:, 2]}
+    
+    def generate_message(self, template, lead_data, tone="friendly", dealer_id=None):
+        """Generate AI message for dealer to send to seller (see app.ai_provider.templates)"""
+        return message_templates.render(template, lead_data, tone, dealer_id)
     
     def schedule_follow_ups(self, lead_id):
         """Generate follow-up schedule"""
@@ -148,20 +206,9 @@ Thanks!
         return [
             {
                 "lead_id": lead_id,
-                "stage": 1,
-                "scheduled_for": (now + timedelta(days=1)).isoformat(),
-                "message_type": "follow_up_1"
-            },
-            {
-                "lead_id": lead_id,
-                "stage": 2,
-                "scheduled_for": (now + timedelta(days=3)).isoformat(),
-                "message_type": "follow_up_2"
-            },
-            {
-                "lead_id": lead_id,
-                "stage": 3,
-                "scheduled_for": (now + timedelta(days=7)).isoformat(),
-                "message_type": "follow_up_3"
+                "stage": stage,
+                "scheduled_for": (now + timedelta(days=days)).isoformat(),
+                "message_type": message_type
             }
+            for stage, (days, message_type) in enumerate(FOLLOWUP_SCHEDULE, start=1)
         ]
\ No newline at end of file
@@ -0,0 +1,307 @@
+"""
+Message template registry for MockAIProvider.generate_message
+Templates are compiled once at import: for every (template, tone) pair the
+tone's greeting and sign-off are spliced in and the text is turned into a
+generated function returning (subject, body) from a single f-string each,
+so a render formats the lead values once and does no template parsing.
+Per-dealer overrides are validated and compiled the same way when they are
+registered; only whitelisted placeholders (no format specs) reach the
+generated code and all literal text goes through repr().
+
+Overrides are stored in dealer_message_templates and edited through
+/api/dealers/templates, which also updates the worker serving the edit.
+Every process that renders (API workers, the follow-up scheduler) runs a
+background sync (start_sync) that reloads the table every REFRESH_SECONDS,
+recompiling only rows whose text changed; resolving a template never
+touches the database.
+
+Placeholders: {seller_name} {vehicle} {mileage} {offer} {dealer_name}
+{dealership_name} {dealer_phone}, plus {greeting} and {sign_off} for the tone.
+"""
+
+import logging
+import string
+import threading
+import time
+from collections import namedtuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TEMPLATE = "initial_contact"
+DEFAULT_TONE = "friendly"
+REFRESH_SECONDS = 30
+
+# Render function arguments, in order
+FIELDS = ("seller_name", "vehicle", "mileage", "offer", "dealer_name", "dealership_name", "dealer_phone")
+
+# Tone phrases spliced into every template; a sign_off of None keeps the template's own
+TONES = {
+    "friendly": {"greeting": "Hi {seller_name},", "sign_off": None},
+    "professional": {"greeting": "Dear {seller_name},", "sign_off": "Kind regards,"},
+    "casual": {"greeting": "Hey {seller_name}!", "sign_off": "Cheers,"},
+}
+
+Template = namedtuple("Template", "subject body sign_off")
+
+TEMPLATES = {
+    "initial_contact": Template(
+        subject="Interest in Your {vehicle}",
+        sign_off="Best regards,",
+        body="""{greeting}
+
+I hope this message finds you well! My name is {dealer_name} from {dealership_name}, and I came across your {vehicle} listing.
+
+We're actively looking for quality vehicles like yours, and after reviewing the details, I'd love to discuss a potential purchase.
+
+Based on our initial assessment:
+• Vehicle: {vehicle}
+• Mileage: {mileage} miles
+• Our preliminary offer: ${offer}
+
+Would you be available for a quick chat to discuss this further? I'd be happy to answer any questions and provide more details about our offer.
+
+Looking forward to hearing from you!
+
+{sign_off}
+{dealer_name}
+{dealership_name}
+{dealer_phone}"""
+    ),
+    "follow_up_1": Template(
+        subject="Following up - {vehicle}",
+        sign_off="Best,",
+        body="""{greeting}
+
+I wanted to follow up on my previous message about your {vehicle}. I understand you're probably busy, so I wanted to reach out again.
+
+We're still very interested in your vehicle and our offer of ${offer} still stands. We can make the process quick and easy:
+
+✓ Fast, hassle-free transaction
+✓ Same-day payment available
+✓ We handle all paperwork
+✓ No hidden fees
+
+Would you be open to discussing this further? Feel free to call or text me anytime.
+
+{sign_off}
+{dealer_name}
+{dealership_name}"""
+    ),
+    "follow_up_2": Template(
+        subject="Final follow-up - {vehicle}",
+        sign_off="Wishing you all the best,",
+        body="""{greeting}
+
+This is my final follow-up about your {vehicle}. I completely understand if you've already sold it or decided to keep it.
+
+If you're still interested in selling, our offer of ${offer} remains available. We've had great success with similar vehicles and would love to add yours to our inventory.
+
+No pressure at all - just wanted to make sure you had all the information you need to make the best decision.
+
+{sign_off}
+{dealer_name}
+{dealership_name}"""
+    ),
+    "follow_up_3": Template(
+        subject="Still interested in your {vehicle}?",
+        sign_off="All the best,",
+        body="""{greeting}
+
+Just checking in one last time about your {vehicle}. If it's still available, our offer of ${offer} is good for a few more days.
+
+If the timing isn't right, no worries at all - reply and let me know, and I won't reach out again.
+
+{sign_off}
+{dealer_name}
+{dealership_name}"""
+    ),
+    "request_more_info": Template(
+        subject="Quick questions about your {vehicle}",
+        sign_off="Thanks!",
+        body="""{greeting}
+
+Thank you for listing your {vehicle}! We're definitely interested, but I'd love to gather a bit more information to provide you with our best offer:
+
+• Service history - do you have maintenance records?
+• Any accidents or damage history?
+• Current mechanical condition?
+• Reason for selling?
+• Timeline - when are you looking to sell?
+
+Once I have these details, I can provide you with a comprehensive offer within 24 hours.
+
+{sign_off}
+{dealer_name}
+{dealership_name}"""
+    ),
+}
+
+
+def _expression(text):
+    """str.format-style text -> source of one equivalent f-string expression"""
+    parts = []
+    for literal, field, spec, conversion in string.Formatter().parse(text):
+        if literal:
+            parts.append(repr(literal))
+        if field is None:
+            continue
+        if field not in FIELDS:
+            raise ValueError(f"Unknown template field: {field}")
+        if spec or conversion:
+            raise ValueError(f"Format specs are not supported: {{{field}}}")
+        parts.append(f"f'{{{field}}}'")
+    return " ".join(parts) or "''"
+
+
+def compile_template(template, tone):
+    """Render function (*lead_values) -> (subject, body) for one template in one tone"""
+    phrases = TONES[tone]
+    body = template.body.replace("{greeting}", phrases["greeting"])
+    body = body.replace("{sign_off}", phrases["sign_off"] or template.sign_off)
+
+    source = (
+        f"def render({', '.join(FIELDS)}):\n"
+        f"    return ({_expression(template.subject)}), ({_expression(body)})\n"
+    )
+    namespace = {}
+    exec(compile(source, f"<template:{tone}>", "exec"), namespace)
+    return namespace["render"]
+
+
+def compile_override(subject, body, sign_off="Best regards,"):
+    """{tone: render function} for a dealer template; raises ValueError on unknown placeholders"""
+    template = Template(subject, body, sign_off)
+    return {tone: compile_template(template, tone) for tone in TONES}
+
+
+def lead_values(lead_data):
+    """Render arguments (FIELDS order) for one lead, each formatted once"""
+    listing = lead_data.get("listing", {})
+    offer = lead_data.get("offer", {})
+    mileage = listing.get("mileage")
+    return (
+        lead_data.get("seller_name", "there"),
+        f"{listing.get('year')} {listing.get('make')} {listing.get('model')}",
+        f"{mileage:,}" if mileage is not None else "N/A",
+        f"{offer.get('amount') or 0:,.0f}",
+        lead_data.get("dealer_name", "Our Team"),
+        lead_data.get("dealership_name", "Our Dealership"),
+        lead_data.get("dealer_phone", "")
+    )
+
+
+class TemplateRegistry:
+    def __init__(self, templates=TEMPLATES):
+        self.compiled = {
+            (name, tone): compile_template(template, tone)
+            for name, template in templates.items() for tone in TONES
+        }
+        self.overrides = {}  # (dealer_id, name, tone) -> render function
+        self.sources = {}  # (dealer_id, name) -> (subject, body, sign_off) the overrides came from
+        self.edits = 0  # set_override / clear_overrides calls, so load() never undoes a newer edit
+        self.sync_thread = None
+        self.lock = threading.Lock()
+
+    def set_override(self, dealer_id, name, subject, body, sign_off="Best regards,"):
+        """Replace (or add) a template for one dealer; raises ValueError on unknown placeholders"""
+        compiled = compile_override(subject, body, sign_off)
+        with self.lock:
+            self.edits += 1
+            self.sources[(dealer_id, name)] = (subject, body, sign_off)
+            for tone, renderer in compiled.items():
+                self.overrides[(dealer_id, name, tone)] = renderer
+
+    def clear_overrides(self, dealer_id, name=None):
+        with self.lock:
+            self.edits += 1
+            for key in [k for k in self.sources if k[0] == dealer_id and name in (None, k[1])]:
+                del self.sources[key]
+            for key in [k for k in self.overrides if k[0] == dealer_id and name in (None, k[1])]:
+                del self.overrides[key]
+
+    def load(self):
+        """Replace the overrides with dealer_message_templates, compiling only changed rows
+
+        Returns False, keeping the current overrides, when this worker saved
+        or deleted a template while the table was read; the next load picks it up.
+        """
+        from app.database import SessionLocal
+        from app.models import DealerMessageTemplate
+
+        with self.lock:
+            edits = self.edits
+        db = SessionLocal()
+        try:
+            rows = db.query(
+                DealerMessageTemplate.dealer_id, DealerMessageTemplate.name, DealerMessageTemplate.subject,
+                DealerMessageTemplate.body, DealerMessageTemplate.sign_off
+            ).all()
+        finally:
+            db.close()
+
+        with self.lock:
+            sources, overrides = dict(self.sources), dict(self.overrides)
+        new_sources, new_overrides = {}, {}
+        for dealer_id, name, subject, body, sign_off in rows:
+            source = (subject, body, sign_off)
+            if sources.get((dealer_id, name)) == source:
+                compiled = {tone: overrides[(dealer_id, name, tone)] for tone in TONES}
+            else:
+                try:
+                    compiled = compile_override(*source)
+                except ValueError as e:
+                    logger.error(f"Skipping template {name!r} of dealer {dealer_id}: {e}")
+                    continue
+            new_sources[(dealer_id, name)] = source
+            for tone, renderer in compiled.items():
+                new_overrides[(dealer_id, name, tone)] = renderer
+
+        with self.lock:
+            if self.edits != edits:
+                return False
+            self.sources, self.overrides = new_sources, new_overrides
+        return True
+
+    def start_sync(self, interval=REFRESH_SECONDS):
+        """Load the overrides now and every interval seconds in a daemon thread; once per process"""
+        with self.lock:
+            if self.sync_thread is not None:
+                return
+            self.sync_thread = threading.Thread(
+                target=self._sync_loop, args=(interval,), name="template-sync", daemon=True
+            )
+        self.sync_thread.start()
+
+    def _sync_loop(self, interval):
+        while True:
+            try:
+                self.load()
+            except Exception as e:
+                logger.error(f"❌ Dealer message templates not synced: {e}")
+            time.sleep(interval)
+
+    def resolve(self, name, tone=DEFAULT_TONE, dealer_id=None):
+        """Render function: dealer override, then built-in, then initial_contact"""
+        if tone not in TONES:
+            tone = DEFAULT_TONE
+        if dealer_id is not None and self.overrides:
+            compiled = self.overrides.get((dealer_id, name, tone))
+            if compiled is not None:
+                return compiled
+        return self.compiled.get((name, tone)) or self.compiled[(DEFAULT_TEMPLATE, tone)]
+
+    def render(self, name, lead_data, tone=DEFAULT_TONE, dealer_id=None):
+        subject, body = self.resolve(name, tone, dealer_id)(*lead_values(lead_data))
+        return {"subject": subject, "body": body}
+
+    def render_many(self, leads, name=DEFAULT_TEMPLATE, tone=DEFAULT_TONE, dealer_id=None):
+        """Render one template for many lead_data dicts (bulk outreach), resolved once"""
+        render = self.resolve(name, tone, dealer_id)
+        return [
+            {"subject": subject, "body": body}
+            for subject, body in (render(*lead_values(lead_data)) for lead_data in leads)
+        ]
+
+
+# Process-wide registry used by MockAIProvider
+message_templates = TemplateRegistry()
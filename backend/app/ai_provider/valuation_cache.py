@@ -0,0 +1,250 @@
+"""
+Valuation cache for MockAIProvider.price_offer
+Every lead for the same listing and every re-estimate of a popular model
+used to recompute the offer (and its comps lookup) from scratch. Prices
+are cached under the normalized (year, make, model, mileage bucket,
+condition, region) tuple in a bounded LRU with a TTL.
+
+- Mileage buckets are aligned to the pricing tiers (50k/75k/100k are
+  upper bounds), so a bucket never straddles a tier boundary
+- Keys carry PRICING_VERSION, so changed pricing rules never serve old prices
+- New comps invalidate their (make, model, year bucket) groups, once per
+  comps insert or refresh for all the groups it touched: one shared
+  round trip per ingested batch, not one per listing
+- VALUATION_CACHE_URL adds a shared second level all gunicorn workers
+  read through: redis://... (needs the redis package) or "local" for an
+  in-process stand-in with the same interface
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from app.ai_provider.mock_provider import PRICING_VERSION
+from app.matching.comps import bucket_key, comps_index
+
+logger = logging.getLogger(__name__)
+
+VALUATION_CACHE_SIZE = int(os.getenv("VALUATION_CACHE_SIZE", "50000"))
+VALUATION_CACHE_TTL = int(os.getenv("VALUATION_CACHE_TTL", "900"))
+VALUATION_CACHE_URL = os.getenv("VALUATION_CACHE_URL", "")
+MILEAGE_BUCKET = 1000
+
+
+class LocalBackend:
+    """In-process stand-in for the shared backend (development, single worker)"""
+
+    def __init__(self):
+        self.entries = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self.entries[key]
+                return None
+            return value
+
+    def set(self, key, value, ttl=None):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + ttl if ttl else None, value)
+
+    def incr(self, key):
+        with self.lock:
+            _, value = self.entries.get(key, (None, 0))
+            self.entries[key] = (None, int(value) + 1)
+            return int(value) + 1
+
+    def incr_many(self, keys):
+        for key in keys:
+            self.incr(key)
+
+
+class RedisBackend:
+    """Shared backend on Redis: plain GET / SET EX / INCR, batched INCRs in one pipeline"""
+
+    def __init__(self, url):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("VALUATION_CACHE_URL=redis://... needs the redis package (pip install redis)")
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self.client.get(key)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(key, value, ex=ttl)
+
+    def incr(self, key):
+        return self.client.incr(key)
+
+    def incr_many(self, keys):
+        pipeline = self.client.pipeline(transaction=False)
+        for key in keys:
+            pipeline.incr(key)
+        pipeline.execute()
+
+
+def get_backend(url=VALUATION_CACHE_URL):
+    """Shared backend configured by VALUATION_CACHE_URL, None when unset"""
+    if not url:
+        return None
+    if url == "local":
+        return LocalBackend()
+    return RedisBackend(url)
+
+
+def valuation_key(year, make, model, mileage, condition, region):
+    """Normalized cache key; (mileage - 1) keeps tier bounds like 50000 at the top of their bucket"""
+    return (
+        int(year),
+        str(make).strip().lower(),
+        str(model).strip().lower(),
+        max(int(mileage) - 1, 0) // MILEAGE_BUCKET,
+        str(condition).strip().lower(),
+        str(region).strip().lower()
+    )
+
+
+class ValuationCache:
+    def __init__(self, max_size=VALUATION_CACHE_SIZE, ttl=VALUATION_CACHE_TTL, backend=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self.entries = OrderedDict()   # key -> (expires_at, offer)
+        self.groups = {}               # comps group -> keys cached for it
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    def _shared_key(self, key):
+        # The group generation moves every key of the group when any worker invalidates it
+        group = "|".join(map(str, bucket_key(key[1], key[2], key[0])))
+        generation = self.backend.get(f"valuation:gen:{group}") or 0
+        return f"valuation:v{PRICING_VERSION}:{int(generation)}:" + "|".join(map(str, key))
+
+    def get(self, key):
+        now = time.monotonic()
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, offer = entry
+                if expires_at > now:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return offer
+                self._drop(key)
+                self.expirations += 1
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(self._shared_key(key))
+            except Exception as e:
+                logger.warning(f"⚠️  Shared valuation cache unavailable: {e}")
+                value = None
+            if value is not None:
+                offer = json.loads(value)
+                self._put_local(key, offer)
+                with self.lock:
+                    self.shared_hits += 1
+                return offer
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, offer):
+        self._put_local(key, offer)
+        if self.backend is not None:
+            try:
+                self.backend.set(self._shared_key(key), json.dumps(offer), self.ttl)
+            except Exception as e:
+                logger.warning(f"⚠️  Shared valuation cache unavailable: {e}")
+
+    def get_or_compute(self, key, compute):
+        offer = self.get(key)
+        if offer is None:
+            offer = compute()
+            self.put(key, offer)
+        return offer
+
+    def _put_local(self, key, offer):
+        group = bucket_key(key[1], key[2], key[0])
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.ttl, offer)
+            self.entries.move_to_end(key)
+            self.groups.setdefault(group, set()).add(key)
+            while len(self.entries) > self.max_size:
+                oldest = next(iter(self.entries))
+                self._drop(oldest)
+                self.evictions += 1
+
+    def _drop(self, key):
+        """Remove a local entry; caller holds the lock"""
+        del self.entries[key]
+        group = bucket_key(key[1], key[2], key[0])
+        keys = self.groups.get(group)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self.groups[group]
+
+    def invalidate(self, groups=None):
+        """Drop cached prices of some comps groups (make, model, year bucket), or everything locally
+
+        comps_index calls this once per change with every group it touched;
+        the shared generations of those groups move in one round trip. A
+        full invalidation only clears this process; shared entries are
+        retired by the TTL or a PRICING_VERSION bump.
+        """
+        with self.lock:
+            if groups is None:
+                self.invalidations += len(self.entries)
+                self.entries.clear()
+                self.groups.clear()
+                return
+            for group in groups:
+                keys = self.groups.pop(group, ())
+                for key in keys:
+                    del self.entries[key]
+                self.invalidations += len(keys)
+
+        if self.backend is not None and groups:
+            try:
+                self.backend.incr_many([f"valuation:gen:{'|'.join(map(str, group))}" for group in groups])
+            except Exception as e:
+                logger.warning(f"⚠️  Shared valuation cache unavailable: {e}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "shared_backend": type(self.backend).__name__ if self.backend else None,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.hits + self.shared_hits) / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations
+            }
+
+
+# Process-wide cache used by app.ingestion.estimate_listing
+valuation_cache = ValuationCache(backend=get_backend())
+comps_index.listeners.append(valuation_cache.invalidate)
@@ -1,4 +1,4 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Path
 from sqlalchemy.orm import Session
 from sqlalchemy import desc
 from typing import List, Optional
@@ -7,11 +7,15 @@ import logging
 
 from app.database import get_db
 from app.models import (
-    Lead, CarListing, DealerProfile, Message, User, 
+    Lead, CarListing, DealerProfile, DealerMessageTemplate, Message, User, 
     LeadStatus, LeadSource, UserRole
 )
-from app.auth import get_current_user
+from app.schemas import MessageTemplateRequest
+from app.auth import Principal, get_current_dealer
 from app.ai_provider.mock_provider import MockAIProvider
+from app.ai_provider.templates import TEMPLATES, compile_override, message_templates
+from app.followups import next_stage
+from app.delivery.outbox import enqueue as enqueue_delivery
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -21,27 +25,15 @@ ai_provider = MockAIProvider()
 def get_dealer_leads(
     source: Optional[str] = None,  # "hot_lead" or "marketplace"
     status: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Get all leads for the current dealer"""
     
-    # Verify user is a dealer
-    if current_user.role != UserRole.DEALER:
-        raise HTTPException(status_code=403, detail="Only dealers can access leads")
-    
-    # Get dealer profile
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
-    if not dealer:
-        raise HTTPException(status_code=404, detail="Dealer profile not found")
-    
     # Query leads
     query = db.query(Lead, CarListing).join(
         CarListing, Lead.listing_id == CarListing.id
-    ).filter(Lead.dealer_id == dealer.id)
+    ).filter(Lead.dealer_id == dealer.dealer_id)
     
     # Filter by source (hot_lead vs marketplace)
     if source == "hot_lead":
@@ -120,26 +112,99 @@ def get_dealer_leads(
         "leads": leads
     }
 
+@router.get("/templates")
+def list_templates(
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Built-in message templates and the dealer's own versions of them"""
+    
+    overrides = db.query(DealerMessageTemplate).filter(
+        DealerMessageTemplate.dealer_id == dealer.dealer_id
+    ).order_by(DealerMessageTemplate.name).all()
+    
+    return {
+        "built_in": [{
+            "name": name,
+            "subject": template.subject,
+            "body": template.body,
+            "sign_off": template.sign_off
+        } for name, template in TEMPLATES.items()],
+        "overrides": [{
+            "name": override.name,
+            "subject": override.subject,
+            "body": override.body,
+            "sign_off": override.sign_off,
+            "updated_at": override.updated_at.isoformat() if override.updated_at else None
+        } for override in overrides]
+    }
+
+@router.put("/templates/{name}")
+def save_template(
+    request: MessageTemplateRequest,
+    name: str = Path(..., pattern=r"^[a-z0-9_]{1,50}$"),
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Use the dealer's own subject / body for a template (built-in name or a new one)"""
+    
+    try:
+        compile_override(request.subject, request.body, request.sign_off)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    
+    override = db.query(DealerMessageTemplate).filter(
+        DealerMessageTemplate.dealer_id == dealer.dealer_id,
+        DealerMessageTemplate.name == name
+    ).first()
+    
+    if not override:
+        override = DealerMessageTemplate(dealer_id=dealer.dealer_id, name=name)
+        db.add(override)
+    
+    override.subject = request.subject
+    override.body = request.body
+    override.sign_off = request.sign_off
+    db.commit()
+    
+    # This worker uses it right away; the others on their next template sync
+    message_templates.set_override(dealer.dealer_id, name, request.subject, request.body, request.sign_off)
+    
+    return {"name": name, "message": "Template saved"}
+
+@router.delete("/templates/{name}")
+def delete_template(
+    name: str,
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Go back to the built-in template"""
+    
+    deleted = db.query(DealerMessageTemplate).filter(
+        DealerMessageTemplate.dealer_id == dealer.dealer_id,
+        DealerMessageTemplate.name == name
+    ).delete(synchronize_session=False)
+    
+    if not deleted:
+        raise HTTPException(status_code=404, detail="Template not found")
+    
+    db.commit()
+    message_templates.clear_overrides(dealer.dealer_id, name)
+    
+    return {"name": name, "message": "Template deleted"}
+
 @router.get("/{lead_id}")
 def get_lead_details(
     lead_id: int,
-    current_user: User = Depends(get_current_user),
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Get detailed information about a specific lead"""
     
-    # Get dealer profile
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
-    if not dealer:
-        raise HTTPException(status_code=404, detail="Dealer profile not found")
-    
     # Get lead with listing
     lead = db.query(Lead).filter(
         Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
+        Lead.dealer_id == dealer.dealer_id
     ).first()
     
     if not lead:
@@ -213,18 +278,15 @@ def get_lead_details(
 def generate_message(
     lead_id: int,
     message_type: str,  # "initial_contact" or "follow_up_1", etc.
-    current_user: User = Depends(get_current_user),
+    tone: str = "friendly",  # "friendly", "professional" or "casual"
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Generate AI message for a lead"""
     
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
     lead = db.query(Lead).filter(
         Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
+        Lead.dealer_id == dealer.dealer_id
     ).first()
     
     if not lead:
@@ -263,16 +325,17 @@ def generate_message(
             "offer": {
                 "amount": lead.ai_offer_fair or lead.dealer_offer_amount
             },
-            "dealer_name": f"{current_user.first_name} {current_user.last_name}",
+            "dealer_name": f"{dealer.first_name} {dealer.last_name}",
             "dealership_name": dealer.company_name
         },
-        tone="friendly"
+        tone=tone,
+        dealer_id=dealer.dealer_id
     )
     
     # Save message
     new_message = Message(
         lead_id=lead_id,
-        dealer_id=dealer.id,
+        dealer_id=dealer.dealer_id,
         message_type=message_type,
         subject=message_data.get("subject", ""),
         body=message_data.get("body", ""),
@@ -296,18 +359,14 @@ def send_message(
     lead_id: int,
     message_id: int,
     updated_body: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Send a message to the seller (dealer clicks 'Send')"""
     
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
     lead = db.query(Lead).filter(
         Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
+        Lead.dealer_id == dealer.dealer_id
     ).first()
     
     if not lead:
@@ -334,37 +393,39 @@ def send_message(
     if not lead.first_contact_sent:
         lead.first_contact_sent = True
         lead.first_contact_at = datetime.utcnow()
+        lead.followup_stage, lead.next_followup_at = next_stage(
+            db.get(DealerProfile, dealer.dealer_id), lead.first_contact_at
+        )
     
     lead.last_contact_at = datetime.utcnow()
     lead.status = LeadStatus.CONTACTED
     
-    # TODO: Actually send email/SMS here using SendGrid, Twilio, etc.
-    logger.info(f"Message sent to seller for lead {lead_id}")
+    # Delivered by the outbox workers once this commits (app.delivery.outbox)
+    listing = db.get(CarListing, lead.listing_id)
+    enqueue_delivery(db, message, listing)
+    logger.info(f"Message queued for delivery to seller for lead {lead_id}")
     
     db.commit()
     
     return {
         "success": True,
         "message": "Message sent successfully",
-        "sent_at": message.sent_at.isoformat() if message.sent_at else None
+        "sent_at": message.sent_at.isoformat() if message.sent_at else None,
+        "delivery_status": message.delivery_status
     }
 
 @router.put("/{lead_id}/update-offer")
 def update_offer(
     lead_id: int,
     offer_amount: float,
-    current_user: User = Depends(get_current_user),
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Dealer updates the offer amount"""
     
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
     lead = db.query(Lead).filter(
         Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
+        Lead.dealer_id == dealer.dealer_id
     ).first()
     
     if not lead:
@@ -1,75 +1,136 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from sqlalchemy import desc
+from sqlalchemy import and_, desc, insert, or_, select, text, true, tuple_
 from typing import List, Optional
 from datetime import datetime
+import base64
+import json
 import logging
+import time
 
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models import (
-    Lead, CarListing, DealerProfile, Message, User, 
+    Lead, CarListing, DealerProfile, Message, User, IngestionJob,
     LeadStatus, LeadSource, UserRole
 )
-from app.auth import get_current_user
+from app.auth import Principal, get_current_dealer, get_current_dealer_async
 from app.ai_provider.mock_provider import MockAIProvider
+from app.ai_provider.templates import message_templates
+from app.followups import next_stage, followup_stats
+from app.delivery.outbox import enqueue as enqueue_delivery, delivery_stats
+from app.ingestion import (
+    validate_payload, enqueue, listing_from_payload, draft_estimate, queue_stats, bulk_ingest
+)
+from app.schemas import GenerateMessagesRequest
+from app import metrics
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
 ai_provider = MockAIProvider()
+webhook_timer = metrics.tracker("lead_received")
+
+def _encode_cursor(created_at, lead_id):
+    """Encode a (created_at, id) keyset position as an opaque cursor; created_at may be None"""
+    raw = f"{created_at.isoformat() if created_at else ''}|{lead_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_cursor(cursor):
+    """Decode a cursor produced by _encode_cursor back into (created_at, id)"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, lead_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at) if created_at else None, int(lead_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def _estimate_count(db: AsyncSession, statement):
+    """Planner row estimate for a query - one EXPLAIN instead of a COUNT(*) scan"""
+    compiled = statement.compile(
+        dialect=db.bind.dialect,
+        compile_kwargs={"literal_binds": True}
+    )
+    plan = (await db.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}"))).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
 
 @router.get("/")
-def get_dealer_leads(
+async def get_dealer_leads(
     source: Optional[str] = None,  # "hot_lead" or "marketplace"
     status: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,  # next_cursor from the previous page
+    dealer: Principal = Depends(get_current_dealer_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get all leads for the current dealer"""
-    
-    # Verify user is a dealer
-    if current_user.role != UserRole.DEALER:
-        raise HTTPException(status_code=403, detail="Only dealers can access leads")
-    
-    # Get dealer profile
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
-    if not dealer:
-        raise HTTPException(status_code=404, detail="Dealer profile not found")
+    """Get a page of leads for the current dealer, newest first"""
+    
+    # Latest message per lead, resolved in the same statement via LATERAL
+    latest_message = (
+        select(Message.subject, Message.body, Message.sent)
+        .where(Message.lead_id == Lead.id)
+        .order_by(desc(Message.created_at))
+        .limit(1)
+        .lateral("latest_message")
+    )
     
     # Query leads
-    query = db.query(Lead, CarListing).join(
+    query = select(Lead, CarListing).join(
         CarListing, Lead.listing_id == CarListing.id
-    ).filter(Lead.dealer_id == dealer.id)
+    ).where(Lead.dealer_id == dealer.dealer_id)
     
     # Filter by source (hot_lead vs marketplace)
     if source == "hot_lead":
-        query = query.filter(CarListing.source == LeadSource.HOT_LEAD)
+        query = query.where(CarListing.source == LeadSource.HOT_LEAD)
     elif source == "marketplace":
-        query = query.filter(CarListing.source != LeadSource.HOT_LEAD)
+        query = query.where(CarListing.source != LeadSource.HOT_LEAD)
     
     # Filter by status
     if status:
-        query = query.filter(Lead.status == status)
-    
-    # Order by newest first
-    query = query.order_by(desc(Lead.created_at))
-    
-    results = query.all()
+        query = query.where(Lead.status == status)
+    
+    # Only the first page pays for the count estimate
+    total_estimate = await _estimate_count(db, query) if cursor is None else None
+    
+    # Resume after the last row of the previous page; leads without
+    # created_at sort first, so a cursor among them still has every dated lead ahead
+    if cursor:
+        cursor_created_at, cursor_id = _decode_cursor(cursor)
+        if cursor_created_at is None:
+            query = query.where(or_(
+                Lead.created_at.isnot(None),
+                and_(Lead.created_at.is_(None), Lead.id < cursor_id)
+            ))
+        else:
+            query = query.where(
+                Lead.created_at.isnot(None),
+                tuple_(Lead.created_at, Lead.id) < tuple_(cursor_created_at, cursor_id)
+            )
+    
+    # Order by newest first, id breaks ties so the keyset is total
+    query = query.outerjoin(latest_message, true()).add_columns(
+        latest_message.c.subject,
+        latest_message.c.body,
+        latest_message.c.sent
+    ).order_by(desc(Lead.created_at).nulls_first(), desc(Lead.id))
+    
+    # One extra row tells us whether there is another page
+    results = (await db.execute(query.limit(limit + 1))).all()
+    has_more = len(results) > limit
+    results = results[:limit]
     
     # Format response
     leads = []
-    for lead, listing in results:
-        # Get latest message
-        latest_message = db.query(Message).filter(
-            Message.lead_id == lead.id
-        ).order_by(desc(Message.created_at)).first()
-        
+    for lead, listing, message_subject, message_body, message_sent in results:
         leads.append({
             "lead_id": lead.id,
             "status": lead.status.value,
-            "created_at": lead.created_at.isoformat(),
+            "created_at": lead.created_at.isoformat() if lead.created_at else None,
             "listing": {
                 "id": listing.id,
                 "title": listing.title,
@@ -108,56 +169,57 @@ def get_dealer_leads(
                 "last_contact_at": lead.last_contact_at.isoformat() if lead.last_contact_at else None,
                 "next_followup_at": lead.next_followup_at.isoformat() if lead.next_followup_at else None,
                 "latest_message": {
-                    "subject": latest_message.subject if latest_message else None,
-                    "body": latest_message.body if latest_message else None,
-                    "sent": latest_message.sent if latest_message else False
-                } if latest_message else None
+                    "subject": message_subject,
+                    "body": message_body,
+                    "sent": message_sent
+                } if message_body is not None else None
             }
         })
     
+    next_cursor = None
+    if has_more:
+        last_lead = results[-1][0]
+        next_cursor = _encode_cursor(last_lead.created_at, last_lead.id)
+    
     return {
-        "total": len(leads),
+        "total": total_estimate,
+        "count": len(leads),
+        "next_cursor": next_cursor,
         "leads": leads
     }
 
 @router.get("/{lead_id}")
-def get_lead_details(
+async def get_lead_details(
     lead_id: int,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    dealer: Principal = Depends(get_current_dealer_async),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get detailed information about a specific lead"""
     
-    # Get dealer profile
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
-    if not dealer:
-        raise HTTPException(status_code=404, detail="Dealer profile not found")
-    
     # Get lead with listing
-    lead = db.query(Lead).filter(
-        Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
-    ).first()
+    row = (await db.execute(
+        select(Lead, CarListing).join(
+            CarListing, Lead.listing_id == CarListing.id
+        ).where(
+            Lead.id == lead_id,
+            Lead.dealer_id == dealer.dealer_id
+        )
+    )).first()
     
-    if not lead:
+    if not row:
         raise HTTPException(status_code=404, detail="Lead not found")
     
-    listing = db.query(CarListing).filter(
-        CarListing.id == lead.listing_id
-    ).first()
+    lead, listing = row
     
     # Get all messages for this lead
-    messages = db.query(Message).filter(
-        Message.lead_id == lead_id
-    ).order_by(Message.created_at).all()
+    messages = (await db.execute(
+        select(Message).where(Message.lead_id == lead_id).order_by(Message.created_at)
+    )).scalars().all()
     
     return {
         "lead_id": lead.id,
         "status": lead.status.value,
-        "created_at": lead.created_at.isoformat(),
+        "created_at": lead.created_at.isoformat() if lead.created_at else None,
         "listing": {
             "id": listing.id,
             "title": listing.title,
@@ -205,7 +267,7 @@ def get_lead_details(
             "sent": msg.sent,
             "sent_at": msg.sent_at.isoformat() if msg.sent_at else None,
             "channel": msg.channel,
-            "created_at": msg.created_at.isoformat()
+            "created_at": msg.created_at.isoformat() if msg.created_at else None
         } for msg in messages]
     }
 
@@ -213,18 +275,15 @@ def get_lead_details(
 def generate_message(
     lead_id: int,
     message_type: str,  # "initial_contact" or "follow_up_1", etc.
-    current_user: User = Depends(get_current_user),
+    tone: str = "friendly",  # "friendly", "professional" or "casual"
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Generate AI message for a lead"""
     
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
     lead = db.query(Lead).filter(
         Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
+        Lead.dealer_id == dealer.dealer_id
     ).first()
     
     if not lead:
@@ -263,16 +322,17 @@ def generate_message(
             "offer": {
                 "amount": lead.ai_offer_fair or lead.dealer_offer_amount
             },
-            "dealer_name": f"{current_user.first_name} {current_user.last_name}",
+            "dealer_name": f"{dealer.first_name} {dealer.last_name}",
             "dealership_name": dealer.company_name
         },
-        tone="friendly"
+        tone=tone,
+        dealer_id=dealer.dealer_id
     )
     
     # Save message
     new_message = Message(
         lead_id=lead_id,
-        dealer_id=dealer.id,
+        dealer_id=dealer.dealer_id,
         message_type=message_type,
         subject=message_data.get("subject", ""),
         body=message_data.get("body", ""),
@@ -291,23 +351,119 @@ def generate_message(
         "generated_by_ai": new_message.generated_by_ai
     }
 
+@router.post("/generate-messages")
+def generate_messages(
+    request: GenerateMessagesRequest,
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Draft a message for every matching lead that has no unsent draft of this type
+    
+    One query loads the leads with their listings (skipping leads that
+    already have a draft), the messages are rendered with a single
+    template lookup and stored with one multi-row INSERT.
+    """
+    
+    started = time.perf_counter()
+    
+    existing_draft = select(Message.id).where(
+        Message.lead_id == Lead.id,
+        Message.message_type == request.message_type,
+        Message.sent == False
+    ).exists()
+    
+    query = select(
+        Lead.id,
+        Lead.ai_offer_fair,
+        Lead.dealer_offer_amount,
+        CarListing.year,
+        CarListing.make,
+        CarListing.model,
+        CarListing.mileage,
+        CarListing.seller_name
+    ).join(
+        CarListing, Lead.listing_id == CarListing.id
+    ).where(
+        Lead.dealer_id == dealer.dealer_id,
+        ~existing_draft
+    )
+    
+    if request.status:
+        try:
+            query = query.where(Lead.status == LeadStatus(request.status.lower()))
+        except ValueError:
+            raise HTTPException(status_code=422, detail=f"Unknown lead status: {request.status}")
+    
+    if request.source == "hot_lead":
+        query = query.where(CarListing.source == LeadSource.HOT_LEAD)
+    elif request.source == "marketplace":
+        query = query.where(CarListing.source != LeadSource.HOT_LEAD)
+    
+    if request.lead_ids is not None:
+        query = query.where(Lead.id.in_(request.lead_ids))
+    
+    rows = db.execute(query.order_by(Lead.id).limit(request.limit)).all()
+    
+    dealer_name = f"{dealer.first_name} {dealer.last_name}"
+    rendered = message_templates.render_many(
+        [{
+            "listing": {
+                "year": row.year,
+                "make": row.make,
+                "model": row.model,
+                "mileage": row.mileage
+            },
+            "seller_name": row.seller_name or "there",
+            "offer": {
+                "amount": row.ai_offer_fair or row.dealer_offer_amount
+            },
+            "dealer_name": dealer_name,
+            "dealership_name": dealer.company_name
+        } for row in rows],
+        request.message_type,
+        tone=request.tone,
+        dealer_id=dealer.dealer_id
+    )
+    
+    created = []
+    if rows:
+        # (message id, lead id) pairs - one draft per lead, so no need to keep parameter order
+        created = db.execute(
+            insert(Message).returning(Message.id, Message.lead_id),
+            [{
+                "lead_id": row.id,
+                "dealer_id": dealer.dealer_id,
+                "message_type": request.message_type,
+                "subject": message["subject"],
+                "body": message["body"],
+                "generated_by_ai": True,
+                "channel": "email"
+            } for row, message in zip(rows, rendered)]
+        ).all()
+        db.commit()
+    
+    return {
+        "created": len(created),
+        "messages": [
+            {"lead_id": lead_id, "message_id": message_id}
+            for message_id, lead_id in sorted(created, key=lambda pair: pair[1])
+        ],
+        "seconds": round(time.perf_counter() - started, 3)
+    }
+
 @router.post("/{lead_id}/send-message")
 def send_message(
     lead_id: int,
     message_id: int,
     updated_body: Optional[str] = None,
-    current_user: User = Depends(get_current_user),
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Send a message to the seller (dealer clicks 'Send')"""
     
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
     lead = db.query(Lead).filter(
         Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
+        Lead.dealer_id == dealer.dealer_id
     ).first()
     
     if not lead:
@@ -334,37 +490,39 @@ def send_message(
     if not lead.first_contact_sent:
         lead.first_contact_sent = True
         lead.first_contact_at = datetime.utcnow()
+        lead.followup_stage, lead.next_followup_at = next_stage(
+            db.get(DealerProfile, dealer.dealer_id), lead.first_contact_at
+        )
     
     lead.last_contact_at = datetime.utcnow()
     lead.status = LeadStatus.CONTACTED
     
-    # TODO: Actually send email/SMS here using SendGrid, Twilio, etc.
-    logger.info(f"Message sent to seller for lead {lead_id}")
+    # Delivered by the outbox workers once this commits (app.delivery.outbox)
+    listing = db.get(CarListing, lead.listing_id)
+    enqueue_delivery(db, message, listing)
+    logger.info(f"Message queued for delivery to seller for lead {lead_id}")
     
     db.commit()
     
     return {
         "success": True,
         "message": "Message sent successfully",
-        "sent_at": message.sent_at.isoformat()
+        "sent_at": message.sent_at.isoformat(),
+        "delivery_status": message.delivery_status
     }
 
 @router.put("/{lead_id}/update-offer")
 def update_offer(
     lead_id: int,
     offer_amount: float,
-    current_user: User = Depends(get_current_user),
+    dealer: Principal = Depends(get_current_dealer),
     db: Session = Depends(get_db)
 ):
     """Dealer updates the offer amount"""
     
-    dealer = db.query(DealerProfile).filter(
-        DealerProfile.user_id == current_user.id
-    ).first()
-    
     lead = db.query(Lead).filter(
         Lead.id == lead_id,
-        Lead.dealer_id == dealer.id
+        Lead.dealer_id == dealer.dealer_id
     ).first()
     
     if not lead:
@@ -381,88 +539,92 @@ def update_offer(
         "dealer_offer_amount": offer_amount
     }
 
-@router.post("/webhook/lead_received")
+@router.post("/webhook/lead_received", status_code=202)
 def receive_lead_webhook(payload: dict, db: Session = Depends(get_db)):
-    """Webhook to receive new car listings (from marketplaces or direct submissions)"""
+    """Webhook to receive new car listings (from marketplaces or direct submissions)
+    
+    The payload is validated and queued; ingestion workers create the listing
+    and dealer leads (see app.ingestion).
+    """
     
+    started = time.perf_counter()
     logger.info(f"Received lead webhook: {payload}")
     
-    # Determine source
-    source = LeadSource.HOT_LEAD
-    if payload.get("marketplace"):
-        source = LeadSource[payload["marketplace"].upper()] if payload["marketplace"].upper() in LeadSource.__members__ else LeadSource.HOT_LEAD
-    
-    # Create car listing
-    listing = CarListing(
-        title=payload.get("title", f"{payload['year']} {payload['make']} {payload['model']}"),
-        year=payload["year"],
-        make=payload["make"],
-        model=payload["model"],
-        trim=payload.get("trim"),
-        mileage=payload["mileage"],
-        condition=payload.get("condition", "good"),
-        vin=payload.get("vin"),
-        color=payload.get("color"),
-        transmission=payload.get("transmission"),
-        fuel_type=payload.get("fuel_type"),
-        asking_price=payload.get("price") or payload.get("asking_price"),
-        region=payload.get("region"),
-        city=payload.get("city"),
-        state=payload.get("state"),
-        zip_code=payload.get("zip_code"),
-        source=source,
-        external_listing_id=payload.get("external_id"),
-        external_url=payload.get("url"),
-        seller_name=payload.get("seller_contact_name"),
-        seller_email=payload.get("seller_contact_email"),
-        seller_phone=payload.get("seller_contact_phone"),
-        description=payload.get("description"),
-        photos=payload.get("photos", [])
-    )
+    try:
+        validate_payload(payload)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
     
-    db.add(listing)
-    db.flush()
-    
-    # Generate AI estimate
-    ai_estimate = ai_provider.estimate_offer(
-        year=listing.year,
-        make=listing.make,
-        model=listing.model,
-        mileage=listing.mileage,
-        condition=listing.condition or "good",
-        region=listing.region or "normal"
-    )
+    job = enqueue(db, payload)
+    db.commit()
     
-    # Find matching dealers (simplified - match all verified dealers for now)
-    # TODO: Implement proper filter matching
-    dealers = db.query(DealerProfile).filter(
-        DealerProfile.verification_status == "verified"
-    ).all()
-    
-    created_leads = []
-    
-    for dealer in dealers:
-        # Create lead for each matching dealer
-        lead = Lead(
-            listing_id=listing.id,
-            dealer_id=dealer.id,
-            status=LeadStatus.NEW,
-            ai_estimated_value=ai_estimate.get("fair"),
-            ai_offer_low=ai_estimate.get("low"),
-            ai_offer_fair=ai_estimate.get("fair"),
-            ai_offer_high=ai_estimate.get("max"),
-            ai_rationale=ai_estimate.get("rationale", "")
-        )
-        db.add(lead)
-        db.flush()
-        
-        created_leads.append(lead.id)
+    # Draft offer for the submitter from what this process already has in memory
+    ai_estimate = draft_estimate(listing_from_payload(payload))
     
-    db.commit()
+    webhook_timer.observe(time.perf_counter() - started)
     
     return {
-        "status": "received",
-        "listing_id": listing.id,
-        "leads_created": len(created_leads),
+        "status": "queued",
+        "ingestion_id": job.id,
         "ai_draft_offer": ai_estimate
-    }
\ No newline at end of file
+    }
+
+@router.post("/webhook/bulk")
+async def receive_bulk_webhook(request: Request, format: Optional[str] = None):
+    """Bulk listing feed: NDJSON (default) or CSV (format=csv / text/csv), streamed row by row
+    
+    Rows are validated against LeadWebhookPayload and inserted in chunks;
+    the response streams one NDJSON result per row ("ok", "duplicate" or
+    "error") followed by a summary.
+    """
+    is_csv = format == "csv" or "csv" in request.headers.get("content-type", "")
+    return StreamingResponse(
+        bulk_ingest(request.stream(), is_csv),
+        media_type="application/x-ndjson"
+    )
+
+@router.get("/ingestion/stats")
+def get_ingestion_stats(
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Queue depth, drain rate and queue-to-lead latency across all workers"""
+    return queue_stats(db)
+
+@router.get("/followups/stats")
+def get_followup_stats(
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Scheduled and overdue follow-ups, queueing rate and scheduler lag"""
+    return followup_stats(db)
+
+@router.get("/delivery/stats")
+def get_delivery_stats(
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Outbox depth, per-channel send rate and this worker's connection pools"""
+    return delivery_stats(db)
+
+@router.get("/ingestion/{ingestion_id}")
+def get_ingestion_status(
+    ingestion_id: int,
+    dealer: Principal = Depends(get_current_dealer),
+    db: Session = Depends(get_db)
+):
+    """Status of a queued webhook payload"""
+    job = db.query(IngestionJob).filter(IngestionJob.id == ingestion_id).first()
+    
+    if not job:
+        raise HTTPException(status_code=404, detail="Ingestion job not found")
+    
+    return {
+        "ingestion_id": job.id,
+        "status": job.status,
+        "attempts": job.attempts,
+        "listing_id": job.listing_id,
+        "last_error": job.last_error,
+        "created_at": job.created_at.isoformat(),
+        "processed_at": job.processed_at.isoformat() if job.processed_at else None
+    }
@@ -1,6 +1,30 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException
+
+from app.schemas import OfferEstimateBatchRequest, OfferEstimateBatch
+from app.ai_provider.mock_provider import MockAIProvider
+
 router = APIRouter()
+ai_provider = MockAIProvider()
 
 @router.get('/')
 def get_offers():
-    return []
\ No newline at end of file
+    return []
+
+@router.post('/estimate/batch', response_model=OfferEstimateBatch)
+def estimate_offers_batch(request: OfferEstimateBatchRequest):
+    """Price a whole inventory in one vectorized pass; columns in, columns out"""
+    columns = [request.year, request.mileage, request.condition]
+    if request.region is not None:
+        columns.append(request.region)
+    if len({len(column) for column in columns}) > 1:
+        raise HTTPException(status_code=422, detail="year, mileage, condition and region must have the same length")
+
+    offers = ai_provider.estimate_offers_batch(
+        request.year, request.mileage, request.condition, request.region
+    )
+    return {
+        "count": len(request.year),
+        "low": offers["low"].tolist(),
+        "fair": offers["fair"].tolist(),
+        "max": offers["max"].tolist()
+    }
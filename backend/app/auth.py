@@ -1,12 +1,18 @@
 from fastapi import APIRouter, HTTPException, Depends
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+from collections import OrderedDict, namedtuple
 from datetime import datetime, timedelta
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 import os
 import logging
-from app.database import get_db
+import threading
+import time
+from app.database import get_db, get_async_db
 from app.models import User, UserRole, DealerProfile, SellerProfile
 from app import schemas
 
@@ -15,6 +21,8 @@ logger = logging.getLogger(__name__)
 
 SECRET_KEY = os.getenv("JWT_SECRET", "your-secret-key-change-in-prod")
 ALGORITHM = "HS256"
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = int(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
@@ -40,22 +48,185 @@ def verify_password(plain: str, hashed: str):
         logger.error(f"Password verification error: {e}")
         return False
 
-def create_token(user_id, role):
+def create_token(user_id, role, dealer_id=None):
     expire = datetime.utcnow() + timedelta(days=30)
-    payload = {"sub": str(user_id), "role": role, "exp": expire}
+    payload = {"sub": str(user_id), "role": role, "dealer_id": dealer_id, "exp": expire}
     return jwt.encode(payload, SECRET_KEY, algorithm=ALGORITHM)
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+def _token_claims(token):
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        user_id = int(payload.get("sub"))
-    except JWTError:
+        payload["sub"] = int(payload.get("sub"))
+        return payload
+    except (JWTError, TypeError, ValueError):
         raise HTTPException(status_code=401, detail="Invalid token")
-    user = db.query(User).filter(User.id == user_id).first()
+
+def _token_user_id(token):
+    return _token_claims(token)["sub"]
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    user = db.query(User).filter(User.id == _token_user_id(token)).first()
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
     return user
 
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """get_current_user for async def routes, on the route's AsyncSession"""
+    user = await db.get(User, _token_user_id(token))
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return user
+
+
+# What request handlers need to know about the caller, detached from any session
+Principal = namedtuple("Principal", "user_id role dealer_id first_name last_name company_name")
+
+
+class PrincipalCache:
+    """Per-process TTL + LRU cache of user id -> Principal
+
+    Workers do not share it: a change committed by another worker reaches
+    this one within PRINCIPAL_CACHE_TTL seconds. Commits in this process
+    invalidate the affected users right away (see _invalidate_principals).
+    """
+
+    def __init__(self, max_size=PRINCIPAL_CACHE_SIZE, ttl=PRINCIPAL_CACHE_TTL):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.entries = OrderedDict()   # user id -> (expires_at, principal)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, user_id):
+        with self.lock:
+            entry = self.entries.get(user_id)
+            if entry is not None and entry[0] > time.monotonic():
+                self.entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self.entries[user_id]
+            self.misses += 1
+            return None
+
+    def put(self, principal):
+        with self.lock:
+            self.entries[principal.user_id] = (time.monotonic() + self.ttl, principal)
+            self.entries.move_to_end(principal.user_id)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, user_ids=None):
+        """Forget some users (an iterable of ids), or everyone"""
+        with self.lock:
+            if user_ids is None:
+                self.invalidations += len(self.entries)
+                self.entries.clear()
+                return
+            for user_id in user_ids:
+                if self.entries.pop(user_id, None) is not None:
+                    self.invalidations += 1
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
+
+
+principal_cache = PrincipalCache()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_principal_changes(session, flush_context):
+    # ORM changes only - bulk UPDATE statements on users / dealer_profiles
+    # must call principal_cache.invalidate themselves
+    changed = session.info.setdefault("principal_user_ids", set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, User):
+            changed.add(obj.id)
+        elif isinstance(obj, DealerProfile):
+            changed.add(obj.user_id)
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_principals(session):
+    changed = session.info.pop("principal_user_ids", None)
+    if changed:
+        principal_cache.invalidate(changed)
+
+@event.listens_for(Session, "after_rollback")
+def _discard_principal_changes(session):
+    session.info.pop("principal_user_ids", None)
+
+
+def _principal_query(user_id):
+    return select(
+        User.id, User.role, DealerProfile.id,
+        User.first_name, User.last_name, DealerProfile.company_name
+    ).outerjoin(DealerProfile, DealerProfile.user_id == User.id).where(User.id == user_id)
+
+def _checked(principal, claims):
+    """The principal for a token, rejecting tokens whose claims it contradicts
+
+    Runs on every resolution, cached or not: the cache holds what the
+    database says about a user, not that a given token still matches it.
+    """
+    # Tokens issued before the dealer_id claim carry only sub and role
+    if claims.get("role", principal.role.value) != principal.role.value or \
+            claims.get("dealer_id", principal.dealer_id) != principal.dealer_id:
+        raise HTTPException(status_code=401, detail="Token is out of date, sign in again")
+    return principal
+
+def get_principal(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+    """Caller of a def route; no database round trip while cached"""
+    claims = _token_claims(token)
+    principal = principal_cache.get(claims["sub"])
+    if principal is None:
+        row = db.execute(_principal_query(claims["sub"])).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal(*row)
+        principal_cache.put(principal)
+    return _checked(principal, claims)
+
+async def get_principal_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)):
+    """get_principal for async def routes, on the route's AsyncSession"""
+    claims = _token_claims(token)
+    principal = principal_cache.get(claims["sub"])
+    if principal is None:
+        row = (await db.execute(_principal_query(claims["sub"]))).first()
+        if row is None:
+            raise HTTPException(status_code=404, detail="User not found")
+        principal = Principal(*row)
+        principal_cache.put(principal)
+    return _checked(principal, claims)
+
+def _require_dealer(principal):
+    if principal.role != UserRole.DEALER:
+        raise HTTPException(status_code=403, detail="Only dealers can access leads")
+    if principal.dealer_id is None:
+        raise HTTPException(status_code=404, detail="Dealer profile not found")
+    return principal
+
+def get_current_dealer(principal: Principal = Depends(get_principal)):
+    """Principal of a dealer with a profile (403 / 404 otherwise)"""
+    return _require_dealer(principal)
+
+async def get_current_dealer_async(principal: Principal = Depends(get_principal_async)):
+    return _require_dealer(principal)
+
 @router.post("/signup", response_model=schemas.TokenResponse)
 def signup(req: schemas.SignupRequest, db: Session = Depends(get_db)):
     try:
@@ -87,8 +258,12 @@ def signup(req: schemas.SignupRequest, db: Session = Depends(get_db)):
         db.flush()
         
         # Create profile based on role
+        dealer_id = None
         if user.role == UserRole.DEALER:
-            db.add(DealerProfile(user_id=user.id, company_name=req.first_name))
+            dealer = DealerProfile(user_id=user.id, company_name=req.first_name)
+            db.add(dealer)
+            db.flush()
+            dealer_id = dealer.id
         else:
             db.add(SellerProfile(user_id=user.id))
         
@@ -98,7 +273,7 @@ def signup(req: schemas.SignupRequest, db: Session = Depends(get_db)):
         logger.info(f"User created successfully with ID: {user.id}")
         
         # Generate token
-        token = create_token(user.id, user.role.value)
+        token = create_token(user.id, user.role.value, dealer_id)
         
         return {
             "access_token": token,
@@ -114,23 +289,29 @@ def signup(req: schemas.SignupRequest, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Signup failed: {str(e)}")
 
 @router.post("/login", response_model=schemas.TokenResponse)
-def login(form: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login(form: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     try:
         logger.info(f"Login attempt for email: {form.username}")
         
         # Find user by email
-        user = db.query(User).filter(User.email == form.username).first()
+        row = (await db.execute(
+            select(User, DealerProfile.id)
+            .outerjoin(DealerProfile, DealerProfile.user_id == User.id)
+            .where(User.email == form.username)
+        )).first()
         
-        if not user:
+        if not row:
             raise HTTPException(status_code=401, detail="Invalid email or password")
+        user, dealer_id = row
         
-        if not verify_password(form.password, user.hashed_password):
+        # bcrypt is deliberately slow - keep it off the event loop
+        if not await run_in_threadpool(verify_password, form.password, user.hashed_password):
             raise HTTPException(status_code=401, detail="Invalid email or password")
         
         logger.info(f"Login successful for user ID: {user.id}")
         
         # Generate token
-        token = create_token(user.id, user.role.value)
+        token = create_token(user.id, user.role.value, dealer_id)
         
         return {
             "access_token": token,
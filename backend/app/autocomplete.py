@@ -0,0 +1,144 @@
+"""
+Make / model autocomplete for /api/cars/search (the list-car form's keystroke path)
+Built with every catalog snapshot (app.catalog) from its (make, model)
+pairs and immutable afterwards. Names are normalized to lowercase
+alphanumerics, so "cr-v", "CR V" and "crv" are the same query.
+
+- Prefix index: sorted tuple of the label compacted from every word start
+  ("chevroletsilverado1500", "silverado1500", "1500") - a flattened trie
+  searched with bisect
+- Trigram index: trigram -> entries, for substring matches (what the
+  ILIKE '%q%' scans used to find) and for typo tolerance with pg_trgm's
+  similarity (shared / union of padded word trigrams); every query word
+  has to resemble a word of the label
+
+Ranking: make prefix, model prefix, every query word prefixes a label
+word, substring, then typos by similarity; ties by label. Substring and
+typo matching start at three characters.
+"""
+
+import re
+from bisect import bisect_left
+from collections import defaultdict
+
+SEARCH_LIMIT = 20
+MIN_SIMILARITY = 0.3
+
+MAKE_PREFIX, MODEL_PREFIX, WORD_PREFIX, SUBSTRING, SIMILAR = range(5)
+
+_non_alnum = re.compile(r"[^a-z0-9]+")
+
+
+def words(text):
+    return [word for word in _non_alnum.split(str(text).lower()) if word]
+
+
+def trigrams(word):
+    """pg_trgm style: two spaces before the word, one after"""
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class AutocompleteIndex:
+    def __init__(self, pairs):
+        pairs = sorted(pairs, key=lambda pair: f"{pair[0]} {pair[1]}".lower())
+        self.results = tuple(
+            {"make": make, "model": model, "label": f"{make} {model}"} for make, model in pairs
+        )
+        self.compact = tuple("".join(words(result["label"])) for result in self.results)
+
+        keys = []
+        word_trigrams = defaultdict(set)   # word -> entries using it
+        substrings = defaultdict(set)      # trigram of a compact label -> entries
+        for entry, (make, model) in enumerate(pairs):
+            make_words, model_words = words(make), words(model)
+            label_words = make_words + model_words
+            for start in range(len(label_words)):
+                rank = MAKE_PREFIX if start == 0 else MODEL_PREFIX if start == len(make_words) else WORD_PREFIX
+                keys.append(("".join(label_words[start:]), rank, entry))
+            for word in label_words:
+                word_trigrams[word].add(entry)
+            compact = self.compact[entry]
+            for i in range(len(compact) - 2):
+                substrings[compact[i:i + 3]].add(entry)
+
+        keys.sort()
+        self.keys = tuple(key for key, _, _ in keys)
+        self.key_entries = tuple((rank, entry) for _, rank, entry in keys)
+        self.substrings = {gram: frozenset(entries) for gram, entries in substrings.items()}
+        self.words = tuple(word_trigrams)
+        self.word_entries = tuple(frozenset(entries) for entries in word_trigrams.values())
+        self.word_sizes = tuple(len(trigrams(word)) for word in self.words)
+        postings = defaultdict(list)
+        for index, word in enumerate(self.words):
+            for gram in trigrams(word):
+                postings[gram].append(index)
+        self.word_postings = {gram: tuple(indexes) for gram, indexes in postings.items()}
+
+    def __len__(self):
+        return len(self.results)
+
+    def _prefixed(self, prefix):
+        """(rank, entry) for every key starting with prefix"""
+        i = bisect_left(self.keys, prefix)
+        while i < len(self.keys) and self.keys[i].startswith(prefix):
+            yield self.key_entries[i]
+            i += 1
+
+    def _similar(self, query_words):
+        """entry -> similarity, the worst over query words of each word's best match in the label"""
+        combined = None
+        for query_word in query_words:
+            grams = trigrams(query_word)
+            shared = defaultdict(int)
+            for gram in grams:
+                for index in self.word_postings.get(gram, ()):
+                    shared[index] += 1
+            best = {}
+            for index, count in shared.items():
+                similarity = count / (len(grams) + self.word_sizes[index] - count)
+                if similarity >= MIN_SIMILARITY:
+                    for entry in self.word_entries[index]:
+                        if similarity > best.get(entry, 0):
+                            best[entry] = similarity
+            if combined is None:
+                combined = best
+            else:
+                combined = {entry: min(value, best[entry]) for entry, value in combined.items() if entry in best}
+        return combined or {}
+
+    def search(self, query, limit=SEARCH_LIMIT):
+        """Ranked suggestion dicts ({make, model, label}) for a partial query, limit=None for all"""
+        query_words = words(query)
+        compact = "".join(query_words)
+        if not compact:
+            return []
+
+        ranks = {}
+        for rank, entry in self._prefixed(compact):
+            if rank < ranks.get(entry, SIMILAR + 1):
+                ranks[entry] = rank
+
+        if len(query_words) > 1:
+            matching = None
+            for word in query_words:
+                found = {entry for _, entry in self._prefixed(word)}
+                matching = found if matching is None else matching & found
+            for entry in matching:
+                ranks.setdefault(entry, WORD_PREFIX)
+
+        if len(compact) >= 3 and (limit is None or len(ranks) < limit):
+            grams = [compact[i:i + 3] for i in range(len(compact) - 2)]
+            candidates = min((self.substrings.get(gram, frozenset()) for gram in grams), key=len)
+            for entry in candidates:
+                if entry not in ranks and compact in self.compact[entry]:
+                    ranks[entry] = SUBSTRING
+
+        similarity = {}
+        if len(compact) >= 3 and (limit is None or len(ranks) < limit):
+            similarity = self._similar(query_words)
+            for entry in similarity:
+                ranks.setdefault(entry, SIMILAR)
+
+        ordered = sorted(ranks, key=lambda entry: (ranks[entry], -similarity.get(entry, 0), entry))
+        return [self.results[entry] for entry in ordered[:limit]]
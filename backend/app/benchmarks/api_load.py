@@ -0,0 +1,114 @@
+"""
+Load test: async def routes (AsyncSession) vs the same routes as sync def
+Serves the API with one uvicorn worker, plus twins of the catalog routes
+that still run their queries: under /bench/sync through get_db in def
+handlers - how every route was served before the async port, on FastAPI's
+40-thread pool and the sync engine's pool - and under /bench/async on the
+AsyncSession, as they were before the in-memory catalog (app.catalog).
+The /api routes themselves answer from the catalog snapshot. Each route
+is driven by CLIENTS concurrent keep-alive connections for SECONDS;
+prints requests/sec, p50/p99 latency and errors.
+
+Needs DATABASE_URL pointing at a database with the car catalog seeded.
+
+Run with: python -m app.benchmarks.api_load [clients] [seconds]
+"""
+
+import os
+import subprocess
+import sys
+from urllib.parse import quote
+
+from fastapi import Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.benchmarks.catalog_snapshot import db_details, db_makes
+from app.benchmarks.http_load import drive, percentile, wait_for_port
+from app.database import SessionLocal, get_async_db, get_db, Make, Model, MODEL_DETAILS
+from app.main import app
+
+PORT = 8765
+CLIENTS = 500
+SECONDS = 15
+
+
+@app.get("/bench/sync/cars/makes", include_in_schema=False)
+def sync_makes(db: Session = Depends(get_db)):
+    return {"makes": sorted(db.execute(select(Make.name)).scalars().all())}
+
+
+@app.get("/bench/sync/cars/details", include_in_schema=False)
+def sync_details(make: str = Query(...), model: str = Query(...), db: Session = Depends(get_db)):
+    model_obj = db.execute(
+        select(Model).join(Make, Model.make_id == Make.id).where(
+            Make.name == make,
+            Model.name == model
+        ).options(*MODEL_DETAILS)
+    ).scalars().first()
+    if not model_obj:
+        return {"error": "Model not found"}
+    return {
+        "make": make,
+        "model": model,
+        "years": list(range(model_obj.year_max, model_obj.year_min - 1, -1)),
+        "trims": sorted(trim.name for trim in model_obj.trims),
+        "body_types": sorted(bt.name for bt in model_obj.body_types),
+        "transmissions": sorted(t.name for t in model_obj.transmissions),
+        "fuel_types": sorted(ft.name for ft in model_obj.fuel_types)
+    }
+
+
+@app.get("/bench/async/cars/makes", include_in_schema=False)
+async def async_makes(db: AsyncSession = Depends(get_async_db)):
+    return await db_makes(db)
+
+
+@app.get("/bench/async/cars/details", include_in_schema=False)
+async def async_details(make: str = Query(...), model: str = Query(...), db: AsyncSession = Depends(get_async_db)):
+    return await db_details(db, make, model)
+
+
+def run(clients=CLIENTS, seconds=SECONDS):
+    db = SessionLocal()
+    try:
+        sample = db.execute(
+            select(Make.name, Model.name).join(Model, Model.make_id == Make.id).limit(1)
+        ).first()
+    finally:
+        db.close()
+    if sample is None:
+        raise SystemExit("❌ Car catalog is empty - seed it first (python -m app.migrate_data)")
+    details = f"/cars/details?make={quote(sample[0])}&model={quote(sample[1])}"
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.benchmarks.api_load:app", "--port", str(PORT),
+         "--log-level", "warning", "--no-access-log", "--backlog", str(clients * 2)],
+        env={**os.environ, "MIGRATE_ON_STARTUP": "false"}
+    )
+    try:
+        wait_for_port(PORT)
+        print(f"📊 {clients} concurrent clients, {seconds}s per route, 1 uvicorn worker")
+        print("=" * 78)
+        print(f"{'route':<32} {'mode':<8} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+        print("=" * 78)
+        for route in ("/cars/makes", details):
+            for mode, path in (
+                ("sync", f"/bench/sync{route}"), ("async", f"/bench/async{route}"), ("snapshot", f"/api{route}")
+            ):
+                latencies, errors = drive(PORT, path, clients, seconds)
+                print(
+                    f"{route.split('?')[0]:<32} {mode:<8} {len(latencies) / seconds:>9.0f} "
+                    f"{percentile(latencies, 0.5):>9.1f} {percentile(latencies, 0.99):>9.1f} {errors:>7}"
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else CLIENTS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else SECONDS
+    )
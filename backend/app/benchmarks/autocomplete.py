@@ -0,0 +1,109 @@
+"""
+Benchmark: /api/cars/search on ILIKE scans vs the in-memory autocomplete index
+Replays typing every catalog label keystroke by keystroke (from two
+characters), plus misspelled makes and models, through the previous
+handler body - ILIKE '%q%' over makes and models, then an O(n^2) dedup -
+and through AutocompleteIndex.search. Prints p50 / p99 per query and
+checks every make/model the ILIKE path found (from three characters)
+is also suggested by the index.
+
+Needs DATABASE_URL pointing at a database with the car catalog seeded.
+
+Run with: python -m app.benchmarks.autocomplete [labels]
+"""
+
+import asyncio
+import random
+import sys
+import time
+
+from sqlalchemy import select
+
+from app.catalog import build_snapshot
+from app.database import AsyncSessionLocal, SessionLocal, async_engine, Make, Model, MAKE_MODELS, MODEL_MAKE
+
+
+async def ilike_search(db, query):
+    """search_vehicles before the autocomplete index, without the top-20 cut"""
+    query_lower = query.lower()
+    results = []
+    makes = (await db.execute(
+        select(Make).where(Make.name.ilike(f"%{query_lower}%")).options(*MAKE_MODELS)
+    )).scalars().all()
+    for make in makes:
+        for model in make.models:
+            results.append({"make": make.name, "model": model.name, "label": f"{make.name} {model.name}"})
+    models = (await db.execute(
+        select(Model).where(Model.name.ilike(f"%{query_lower}%")).options(*MODEL_MAKE)
+    )).scalars().all()
+    for model in models:
+        already_found = any(r["make"] == model.make.name and r["model"] == model.name for r in results)
+        if not already_found:
+            results.append({"make": model.make.name, "model": model.name, "label": f"{model.make.name} {model.name}"})
+    return results
+
+
+def misspell(word, rng):
+    """Drop, double or swap one letter"""
+    i = rng.randrange(1, len(word) - 1)
+    return rng.choice([word[:i] + word[i + 1:], word[:i] + word[i] + word[i:], word[:i - 1] + word[i] + word[i - 1] + word[i + 1:]])
+
+
+def _percentiles(samples):
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[min(len(samples) - 1, int(0.99 * len(samples)))] * 1e6
+
+
+async def _run(labels):
+    db = SessionLocal()
+    try:
+        snapshot = build_snapshot(db)
+    finally:
+        db.close()
+    if not snapshot.details:
+        raise SystemExit("❌ Car catalog is empty - seed it first (python -m app.migrate_data)")
+    index = snapshot.autocomplete
+
+    rng = random.Random(7)
+    pairs = rng.sample(list(snapshot.details), min(labels, len(snapshot.details)))
+    keystrokes = [label[:n] for label in (f"{make} {model}" for make, model in pairs) for n in range(2, len(label) + 1)]
+    typos = [misspell(word, rng) for make, model in pairs for word in (make, model) if len(word) >= 5]
+
+    print(f"📊 {len(index)} make/model pairs, {len(keystrokes)} keystroke queries, {len(typos)} misspellings")
+    print("=" * 72)
+    print(f"{'queries':<12} {'ilike p50 µs':>13} {'ilike p99 µs':>13} {'index p50 µs':>13} {'index p99 µs':>13}")
+    print("=" * 72)
+    missing = 0
+    async with AsyncSessionLocal() as session:
+        for name, queries in (("keystrokes", keystrokes), ("misspelled", typos)):
+            ilike_times, index_times = [], []
+            for query in queries:
+                started = time.perf_counter()
+                expected = await ilike_search(session, query)
+                ilike_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                index.search(query)
+                index_times.append(time.perf_counter() - started)
+                if len(query) >= 3:
+                    found = {(result["make"], result["model"]) for result in index.search(query, limit=None)}
+                    missing += sum((result["make"], result["model"]) not in found for result in expected)
+            ilike_p50, ilike_p99 = _percentiles(ilike_times)
+            index_p50, index_p99 = _percentiles(index_times)
+            print(f"{name:<12} {ilike_p50:>13.0f} {ilike_p99:>13.0f} {index_p50:>13.1f} {index_p99:>13.1f}")
+    await async_engine.dispose()
+
+    found = sum(
+        (make, model) in {(r["make"], r["model"]) for r in index.search(misspell(model, rng) if len(model) >= 5 else model)}
+        for make, model in pairs
+    )
+    print("=" * 72)
+    print(f"🎯 Misspelled model found in the top 20: {found}/{len(pairs)}")
+    print(f"{'✅' if not missing else '❌'} ILIKE matches missing from the index: {missing}")
+
+
+def run(labels=100):
+    asyncio.run(_run(labels))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 100)
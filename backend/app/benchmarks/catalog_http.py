@@ -0,0 +1,105 @@
+"""
+Load test: catalog responses encoded per request vs precomputed bytes vs 304
+Serves the API with one uvicorn worker, plus /bench/encoded twins of the
+catalog routes that return the payload dict for FastAPI to encode on every
+request (how they answered before responses were precomputed). Drives
+each route with CLIENTS keep-alive connections for SECONDS three ways:
+encoded, precomputed, and revalidating with If-None-Match (304, no body).
+Checks the precomputed bodies are byte-identical to the encoded ones and
+carry the catalog ETag.
+
+Needs DATABASE_URL pointing at a database with the car catalog seeded.
+
+Run with: python -m app.benchmarks.catalog_http [clients] [seconds]
+"""
+
+import os
+import subprocess
+import sys
+import urllib.request
+from urllib.parse import quote
+
+from fastapi import Query
+
+from app.benchmarks.http_load import drive, percentile, wait_for_port
+from app.catalog import catalog
+from app.main import app
+
+PORT = 8768
+CLIENTS = 200
+SECONDS = 10
+
+
+@app.get("/bench/encoded/cars/makes", include_in_schema=False)
+async def encoded_makes():
+    return (await catalog.get_async()).payload("makes")
+
+
+@app.get("/bench/encoded/cars/details", include_in_schema=False)
+async def encoded_details(make: str = Query(...), model: str = Query(...)):
+    return (await catalog.get_async()).payload("details", make, model)
+
+
+@app.get("/bench/encoded/cars/all-body-types", include_in_schema=False)
+async def encoded_body_types():
+    return (await catalog.get_async()).payload("body_types")
+
+
+def fetch(path, headers=None):
+    request = urllib.request.Request(f"http://127.0.0.1:{PORT}{path}", headers=headers or {})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, response.headers, response.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, e.read()
+
+
+def run(clients=CLIENTS, seconds=SECONDS):
+    snapshot = catalog.get()
+    if not snapshot.details:
+        raise SystemExit("❌ Car catalog is empty - seed it first (python -m app.migrate_data)")
+    make, model = next(iter(snapshot.details))
+    routes = ("/cars/makes", f"/cars/details?make={quote(make)}&model={quote(model)}", "/cars/all-body-types")
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.benchmarks.catalog_http:app", "--port", str(PORT),
+         "--log-level", "warning", "--no-access-log", "--backlog", str(clients * 2)],
+        env={**os.environ, "MIGRATE_ON_STARTUP": "false"}
+    )
+    try:
+        wait_for_port(PORT)
+        mismatches = 0
+        for route in routes:
+            _, _, encoded = fetch(f"/bench/encoded{route}")
+            _, headers, precomputed = fetch(f"/api{route}")
+            status, _, empty = fetch(f"/api{route}", {"If-None-Match": snapshot.etag})
+            mismatches += encoded != precomputed or headers["ETag"] != snapshot.etag or status != 304 or empty != b""
+
+        print(f"📊 {clients} concurrent clients, {seconds}s per run, 1 uvicorn worker, catalog {snapshot.etag}")
+        print("=" * 76)
+        print(f"{'route':<22} {'mode':<12} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'bytes':>7} {'errors':>7}")
+        print("=" * 76)
+        for route in routes:
+            for mode, path, headers in (
+                ("encoded", f"/bench/encoded{route}", None),
+                ("precomputed", f"/api{route}", None),
+                ("304", f"/api{route}", {"If-None-Match": snapshot.etag})
+            ):
+                size = len(fetch(path, headers)[2])
+                latencies, errors = drive(PORT, path, clients, seconds, headers=headers)
+                print(
+                    f"{route.split('?')[0]:<22} {mode:<12} {len(latencies) / seconds:>9.0f} "
+                    f"{percentile(latencies, 0.5):>9.1f} {percentile(latencies, 0.99):>9.1f} {size:>7} {errors:>7}"
+                )
+        print("=" * 76)
+        print(f"{'✅' if not mismatches else '❌'} Precomputed / 304 responses differing from encoded: {mismatches}")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else CLIENTS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else SECONDS
+    )
@@ -0,0 +1,165 @@
+"""
+Benchmark: car catalog seeding, row by row vs set-based (app.migrate_data)
+Writes a synthetic trim catalog CSV (one row per make / model / year / trim
+with body type, transmission and fuel type) and loads it into a scratch
+database twice:
+
+- Row by row, as seed_database did before CatalogLoader: a SELECT per make,
+  model and name, then an ORM insert, for the first LEGACY_ROWS rows
+- CatalogLoader on the same rows, then on the whole file, then the whole
+  file again (must not add anything)
+
+Prints rows/sec and checks both paths end with the same table counts.
+
+The scratch database is a temporary SQLite file unless a URL is given; it
+gets the catalog tables created and its catalog overwritten, so never
+point it at a real database.
+
+Run with: python -m app.benchmarks.catalog_seed [rows] [scratch database URL]
+"""
+
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+from itertools import islice
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import sessionmaker
+
+from app.database import (
+    Base, Make, Model, Trim, BodyType, Transmission, FuelType,
+    model_trims, model_body_types, model_transmissions, model_fuel_types
+)
+from app.migrate_data import CAR_DATABASE, CatalogLoader, normalize_row, read_catalog
+
+DEFAULT_ROWS = 100_000
+LEGACY_ROWS = 2_000
+
+TRIM_NAMES = ["Base", "S", "SE", "SEL", "LE", "XLE", "Sport", "Touring", "Limited", "Platinum",
+              "EX", "EX-L", "LX", "GT", "Premium", "Luxury", "Titanium", "Lariat", "Denali", "Trail"]
+BODY_TYPES = ["Sedan", "SUV", "Coupe", "Hatchback", "Pickup", "Convertible", "Wagon", "Minivan", "Van"]
+TRANSMISSIONS = ["Automatic", "Manual", "CVT", "Dual-Clutch"]
+FUEL_TYPES = ["Gasoline", "Diesel", "Hybrid", "Plug-in Hybrid", "Electric"]
+TABLES = [Make.__table__, Model.__table__, Trim.__table__, BodyType.__table__, Transmission.__table__,
+          FuelType.__table__, model_trims, model_body_types, model_transmissions, model_fuel_types]
+
+
+def write_catalog(path, rows, seed=7):
+    """Synthetic trim catalog: distinct (make, model, year, trim) rows cycling over the built-in models"""
+    rng = random.Random(seed)
+    pairs = [(make, model) for make, models in CAR_DATABASE.items() for model in models]
+    trims = [f"{name} {package}" for package in ("", "Plus", "Pro", "Edition", "Hybrid") for name in TRIM_NAMES]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["make", "model", "year", "trim", "body_type", "transmission", "fuel_type"])
+        for i in range(rows):
+            make, model = pairs[i % len(pairs)]
+            combination = i // len(pairs)
+            writer.writerow([
+                make, model, 2026 - combination // len(trims) % 37, trims[combination % len(trims)].strip(),
+                rng.choice(BODY_TYPES), rng.choice(TRANSMISSIONS), rng.choice(FUEL_TYPES)
+            ])
+
+
+def legacy_seed(db, rows):
+    """The per-row path: look every name up, add what is missing, commit once"""
+    def get_or_add(cls, **fields):
+        obj = db.query(cls).filter_by(**fields).first()
+        if not obj:
+            obj = cls(**fields)
+            db.add(obj)
+            db.flush()
+        return obj
+
+    for row in filter(None, map(normalize_row, rows)):
+        make = get_or_add(Make, name=row["make"])
+        model = db.query(Model).filter(Model.name == row["model"], Model.make_id == make.id).first()
+        if not model:
+            model = Model(name=row["model"], make_id=make.id, year_min=row["year_min"], year_max=row["year_max"])
+            db.add(model)
+            db.flush()
+        model.year_min = min(model.year_min, row["year_min"])
+        model.year_max = max(model.year_max, row["year_max"])
+        for field, cls, relation in (("trim", Trim, "trims"), ("body_type", BodyType, "body_types"),
+                                     ("transmission", Transmission, "transmissions"),
+                                     ("fuel_type", FuelType, "fuel_types")):
+            if row[field]:
+                obj = get_or_add(cls, name=row[field])
+                linked = getattr(model, relation)
+                if obj not in linked:
+                    linked.append(obj)
+    db.commit()
+
+
+def table_counts(db):
+    return {table.name: db.execute(select(func.count()).select_from(table)).scalar() for table in TABLES}
+
+
+def reset(engine):
+    Base.metadata.drop_all(bind=engine, tables=TABLES)
+    Base.metadata.create_all(bind=engine, tables=TABLES)
+
+
+def timed(label, rows, load):
+    started = time.perf_counter()
+    load()
+    elapsed = time.perf_counter() - started
+    print(f"{label:<44} {rows:>9,} {elapsed:>9.2f}s {rows / elapsed:>12,.0f}")
+    return elapsed
+
+
+def run(rows=DEFAULT_ROWS, url=None):
+    workdir = tempfile.mkdtemp(prefix="catalog_seed_")
+    path = os.path.join(workdir, "trims.csv")
+    engine = create_engine(url or f"sqlite:///{os.path.join(workdir, 'catalog.db')}")
+    Session = sessionmaker(bind=engine)
+
+    write_catalog(path, rows)
+    legacy_rows = min(rows, LEGACY_ROWS)
+    print(f"📊 Catalog seeding: {rows:,} trim rows ({os.path.getsize(path) / 1e6:.1f} MB CSV) "
+          f"into {engine.dialect.name}")
+    print("=" * 78)
+    print(f"{'load':<44} {'rows':>9} {'time':>10} {'rows/sec':>12}")
+    print("=" * 78)
+
+    counts = {}
+    for label, load in (
+        ("row by row (SELECT per name)", lambda db: legacy_seed(db, islice(read_catalog(path), legacy_rows))),
+        ("CatalogLoader", lambda db: CatalogLoader(db).load(islice(read_catalog(path), legacy_rows))),
+    ):
+        reset(engine)
+        db = Session()
+        try:
+            timed(f"{label}, first {legacy_rows:,}", legacy_rows, lambda: load(db))
+            counts[label] = table_counts(db)
+        finally:
+            db.close()
+
+    reset(engine)
+    db = Session()
+    try:
+        first = timed("CatalogLoader, whole file", rows, lambda: CatalogLoader(db).load(read_catalog(path)))
+        loaded = table_counts(db)
+        timed("CatalogLoader, whole file again (no-op)", rows, lambda: CatalogLoader(db).load(read_catalog(path)))
+        reloaded = table_counts(db)
+    finally:
+        db.close()
+        engine.dispose()
+    print("=" * 78)
+
+    legacy, bulk = counts.values()
+    mismatches = [name for name in legacy if legacy[name] != bulk[name]]
+    if reloaded != loaded:
+        mismatches.append("second load changed row counts")
+    print(f"✓ Loaded {loaded['makes']:,} makes, {loaded['models']:,} models, {loaded['trims']:,} trims, "
+          f"{loaded['model_trims']:,} model trims in {first:.2f}s")
+    print("✅ Same tables either way, reload idempotent" if not mismatches else f"❌ Mismatch: {mismatches}")
+    return not mismatches
+
+
+if __name__ == "__main__":
+    ok = run(int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS, sys.argv[2] if len(sys.argv) > 2 else None)
+    sys.exit(0 if ok else 1)
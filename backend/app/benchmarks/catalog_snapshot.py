@@ -0,0 +1,178 @@
+"""
+Benchmark: /api/cars/* handlers on the database vs the in-memory catalog snapshot
+Runs every catalog endpoint's queries as they were before app.catalog (an
+AsyncSession per call, selectinload, sorting in Python) and the snapshot
+lookups that replaced them, for a sample of makes / models. Prints p50 /
+p99 per call and checks both return the same payloads.
+
+Needs DATABASE_URL pointing at a database with the car catalog seeded.
+
+Run with: python -m app.benchmarks.catalog_snapshot [iterations]
+"""
+
+import asyncio
+import sys
+import time
+
+from sqlalchemy import select
+
+from app.catalog import build_snapshot
+from app.database import (
+    AsyncSessionLocal, SessionLocal, async_engine,
+    Make, Model, BodyType, Transmission, FuelType, MAKE_MODELS, MODEL_DETAILS
+)
+
+SAMPLE_MODELS = 50
+
+
+async def _find_model(db, make, model, *options):
+    return (await db.execute(
+        select(Model).join(Make, Model.make_id == Make.id).where(
+            Make.name == make,
+            Model.name == model
+        ).options(*options)
+    )).scalars().first()
+
+
+# The handlers' database path before the snapshot, payload for payload
+
+async def db_makes(db):
+    return {"makes": sorted((await db.execute(select(Make.name))).scalars().all())}
+
+
+async def db_models(db, make):
+    make_obj = (await db.execute(
+        select(Make).where(Make.name == make).options(*MAKE_MODELS)
+    )).scalars().first()
+    return {"make": make, "models": sorted(model.name for model in make_obj.models) if make_obj else []}
+
+
+async def db_trims(db, make, model):
+    model_obj = await _find_model(db, make, model, MODEL_DETAILS[0])
+    return {"make": make, "model": model, "trims": sorted(trim.name for trim in model_obj.trims) if model_obj else []}
+
+
+async def db_years(db, make, model):
+    model_obj = await _find_model(db, make, model)
+    years = list(range(model_obj.year_max, model_obj.year_min - 1, -1)) if model_obj else []
+    return {"make": make, "model": model, "years": years}
+
+
+async def db_details(db, make, model):
+    model_obj = await _find_model(db, make, model, *MODEL_DETAILS)
+    if not model_obj:
+        make_exists = (await db.execute(select(Make.id).where(Make.name == make))).first()
+        return {"error": "Model not found" if make_exists else "Make not found"}
+    return {
+        "make": make,
+        "model": model,
+        "years": list(range(model_obj.year_max, model_obj.year_min - 1, -1)),
+        "trims": sorted(trim.name for trim in model_obj.trims),
+        "body_types": sorted(bt.name for bt in model_obj.body_types),
+        "transmissions": sorted(t.name for t in model_obj.transmissions),
+        "fuel_types": sorted(ft.name for ft in model_obj.fuel_types)
+    }
+
+
+async def db_names(db, column, key):
+    return {key: sorted((await db.execute(select(column))).scalars().all())}
+
+
+def snapshot_endpoints(snapshot):
+    def details(make, model):
+        found = snapshot.find(make, model)
+        if not found:
+            return {"error": "Model not found" if make in snapshot.models else "Make not found"}
+        return {"make": make, "model": model, **{field: list(getattr(found, field)) for field in (
+            "years", "trims", "body_types", "transmissions", "fuel_types"
+        )}}
+
+    def by_model(field):
+        return lambda make, model: {
+            "make": make, "model": model,
+            field: list(getattr(snapshot.find(make, model), field, ()))
+        }
+
+    return {
+        "makes": lambda: {"makes": list(snapshot.makes)},
+        "models": lambda make: {"make": make, "models": list(snapshot.models_for(make))},
+        "trims": by_model("trims"),
+        "years": by_model("years"),
+        "details": details,
+        "all-body-types": lambda: {"body_types": list(snapshot.body_types)},
+        "all-transmissions": lambda: {"transmissions": list(snapshot.transmissions)},
+        "all-fuel-types": lambda: {"fuel_types": list(snapshot.fuel_types)}
+    }
+
+
+def database_endpoints(db):
+    return {
+        "makes": lambda: db_makes(db),
+        "models": lambda make: db_models(db, make),
+        "trims": lambda make, model: db_trims(db, make, model),
+        "years": lambda make, model: db_years(db, make, model),
+        "details": lambda make, model: db_details(db, make, model),
+        "all-body-types": lambda: db_names(db, BodyType.name, "body_types"),
+        "all-transmissions": lambda: db_names(db, Transmission.name, "transmissions"),
+        "all-fuel-types": lambda: db_names(db, FuelType.name, "fuel_types")
+    }
+
+
+def _percentiles(samples):
+    samples.sort()
+    return samples[len(samples) // 2] * 1e6, samples[min(len(samples) - 1, int(0.99 * len(samples)))] * 1e6
+
+
+async def _run(iterations):
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        snapshot = build_snapshot(db)
+        build_ms = (time.perf_counter() - started) * 1000
+    finally:
+        db.close()
+    if not snapshot.details:
+        raise SystemExit("❌ Car catalog is empty - seed it first (python -m app.migrate_data)")
+
+    pairs = list(snapshot.details)[:SAMPLE_MODELS]
+    calls = {
+        "makes": [()], "all-body-types": [()], "all-transmissions": [()], "all-fuel-types": [()],
+        "models": [(make,) for make in dict.fromkeys(make for make, _ in pairs)] + [("No Such Make",)],
+        "trims": pairs, "years": pairs,
+        "details": pairs + [(pairs[0][0], "No Such Model"), ("No Such Make", "X")]
+    }
+    fast = snapshot_endpoints(snapshot)
+
+    print(f"📊 Snapshot v{snapshot.version} ({snapshot.digest}): {len(snapshot.makes)} makes, "
+          f"{len(snapshot.details)} models, built in {build_ms:.0f} ms; {iterations} rounds")
+    print("=" * 78)
+    print(f"{'endpoint':<18} {'db p50 µs':>10} {'db p99 µs':>10} {'snap p50 µs':>12} {'snap p99 µs':>12} {'speedup':>8}  ok")
+    print("=" * 78)
+    async with AsyncSessionLocal() as session:
+        slow = database_endpoints(session)
+        for name, arguments in calls.items():
+            db_times, snapshot_times, mismatches = [], [], 0
+            for _ in range(iterations):
+                for args in arguments:
+                    started = time.perf_counter()
+                    expected = await slow[name](*args)
+                    db_times.append(time.perf_counter() - started)
+                    started = time.perf_counter()
+                    actual = fast[name](*args)
+                    snapshot_times.append(time.perf_counter() - started)
+                    mismatches += expected != actual
+            db_p50, db_p99 = _percentiles(db_times)
+            snap_p50, snap_p99 = _percentiles(snapshot_times)
+            print(
+                f"{name:<18} {db_p50:>10.0f} {db_p99:>10.0f} {snap_p50:>12.2f} {snap_p99:>12.2f} "
+                f"{db_p50 / snap_p50:>7.0f}x  {'✅' if not mismatches else '❌'} {mismatches}"
+            )
+    await async_engine.dispose()
+
+
+def run(iterations=20):
+    asyncio.run(_run(iterations))
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
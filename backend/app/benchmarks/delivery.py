@@ -0,0 +1,112 @@
+"""
+Benchmark: pooled, batched delivery providers vs a connection per message
+Runs the fake SMTP/SMS sinks in-process with a simulated connect
+(handshake) and per-request latency, and sends the same messages with
+SMTP_POOL_SIZE threads both ways: opening a connection per message, as a
+send inside the request handler would, and through SmtpProvider /
+SmsProvider. Checks the sinks received every message exactly once.
+
+Run with: python -m app.benchmarks.delivery [messages]
+"""
+
+import http.client
+import json
+import smtplib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.message import EmailMessage
+
+from app.delivery import sinks
+from app.delivery.outbox import Delivery
+from app.delivery.providers import SMTP_FROM, SMTP_POOL_SIZE, SmsProvider, SmtpProvider
+
+CONNECT_DELAY = 0.02
+REQUEST_DELAY = 0.002
+
+
+def deliveries(count, channel):
+    return [
+        Delivery(
+            i, i, channel,
+            f"seller{i}@example.com" if channel == "email" else f"+1555{i:07d}",
+            "Interest in Your 2018 Honda Civic",
+            "Hi there,\n\nWe'd love to make an offer on your car.\n",
+            1, None
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def send_email_unpooled(port, delivery):
+    with smtplib.SMTP("127.0.0.1", port) as conn:
+        message = EmailMessage()
+        message["From"] = SMTP_FROM
+        message["To"] = delivery.recipient
+        message["Subject"] = delivery.subject
+        message.set_content(delivery.body)
+        conn.send_message(message)
+
+
+def send_sms_unpooled(port, delivery):
+    conn = http.client.HTTPConnection("127.0.0.1", port)
+    try:
+        conn.request("POST", "/messages", body=json.dumps({"messages": [
+            {"reference": str(delivery.id), "to": delivery.recipient, "body": delivery.body}
+        ]}), headers={"Content-Type": "application/json", "Connection": "close"})
+        conn.getresponse().read()
+    finally:
+        conn.close()
+
+
+def timed(fn, items):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(SMTP_POOL_SIZE) as pool:
+        results = list(pool.map(fn, items))
+    return time.perf_counter() - started, results
+
+
+def compare(name, sink, items, unpooled, provider):
+    sink.counters = sinks.SinkCounters()
+    unpooled_s, _ = timed(lambda delivery: unpooled(sink.server_address[1], delivery), items)
+    unpooled_counts = sink.counters.snapshot()
+
+    sink.counters = sinks.SinkCounters()
+    chunks = [items[i:i + provider.batch_size] for i in range(0, len(items), provider.batch_size)]
+    pooled_s, results = timed(provider.send_batch, chunks)
+    pooled_counts = sink.counters.snapshot()
+
+    sent = sum(1 for chunk in results for result in chunk if result.status == "sent")
+    mismatches = abs(pooled_counts["messages"] - len(items)) + abs(unpooled_counts["messages"] - len(items))
+    mismatches += len(items) - sent
+    print(
+        f"{name:<6} {len(items) / unpooled_s:>10.0f}/s {unpooled_counts['connections']:>7} "
+        f"{len(items) / pooled_s:>10.0f}/s {pooled_counts['connections']:>7} "
+        f"{unpooled_s / pooled_s:>8.1f}x  {'✅' if not mismatches else '❌'} {mismatches}"
+    )
+
+
+def run(count=2000):
+    smtp_sink = sinks.start(sinks.SmtpSink(port=0, connect_delay=CONNECT_DELAY, request_delay=REQUEST_DELAY))
+    sms_sink = sinks.start(sinks.SmsSink(port=0, connect_delay=CONNECT_DELAY, request_delay=REQUEST_DELAY))
+
+    print(f"📊 {count:,} messages per channel, {SMTP_POOL_SIZE} senders, "
+          f"{CONNECT_DELAY * 1000:.0f} ms connect / {REQUEST_DELAY * 1000:.0f} ms request latency")
+    print("=" * 72)
+    print(f"{'':<6} {'per-message':>12} {'conns':>7} {'pooled':>12} {'conns':>7} {'speedup':>9}  mismatches")
+    print("=" * 72)
+    compare(
+        "email", smtp_sink, deliveries(count, "email"), send_email_unpooled,
+        SmtpProvider(url=f"smtp://127.0.0.1:{smtp_sink.server_address[1]}")
+    )
+    compare(
+        "sms", sms_sink, deliveries(count, "sms"), send_sms_unpooled,
+        SmsProvider(url=f"http://127.0.0.1:{sms_sink.server_address[1]}/messages")
+    )
+
+    smtp_sink.shutdown()
+    sms_sink.shutdown()
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,133 @@
+"""
+Benchmark: FilterIndex vs a naive linear scan over dealer filters
+Builds synthetic filters from the seeded car catalog, checks both
+matchers agree on every listing, and prints per-listing latency.
+
+Run with: python -m app.benchmarks.filter_matching [filter_count]
+"""
+
+import random
+import sys
+import time
+from types import SimpleNamespace
+
+from app.migrate_data import CAR_DATABASE
+from app.matching.filter_index import (
+    FilterIndex, MARKETPLACE_TOGGLES, ALL_SOURCES, _normalize, _source_name
+)
+
+
+def random_filter(rng, filter_id, dealer_count):
+    make = rng.choice(list(CAR_DATABASE))
+    makes = rng.sample(list(CAR_DATABASE), rng.randint(1, 3)) if rng.random() < 0.8 else None
+    models = None
+    if makes and rng.random() < 0.5:
+        models = rng.sample(CAR_DATABASE[makes[0]], min(2, len(CAR_DATABASE[makes[0]])))
+    year_min = rng.choice([None, 2005, 2010, 2012, 2015, 2018])
+    return SimpleNamespace(
+        id=filter_id,
+        dealer_id=rng.randint(1, dealer_count),
+        makes=makes or ([make] if rng.random() < 0.1 else None),
+        models=models,
+        year_min=year_min,
+        year_max=rng.choice([None, 2020, 2023, 2025]),
+        mileage_max=rng.choice([None, 50000, 75000, 100000, 150000]),
+        price_min=rng.choice([None, 2000, 5000, 10000]),
+        price_max=rng.choice([None, 15000, 25000, 40000, 60000]),
+        facebook_enabled=rng.random() < 0.9,
+        offerup_enabled=rng.random() < 0.8,
+        craigslist_enabled=rng.random() < 0.8,
+        autotrader_enabled=rng.random() < 0.3,
+        carscom_enabled=rng.random() < 0.3,
+        is_active=True
+    )
+
+
+def random_listing(rng):
+    make = rng.choice(list(CAR_DATABASE))
+    return SimpleNamespace(
+        make=make,
+        model=rng.choice(CAR_DATABASE[make]),
+        year=rng.randint(2000, 2025),
+        mileage=rng.randint(5000, 200000),
+        asking_price=rng.choice([None, rng.randint(1500, 80000)]),
+        source=rng.choice(ALL_SOURCES)
+    )
+
+
+def naive_match(filters, verified_dealers, listing):
+    """Reference implementation: test every filter against the listing"""
+    source = _source_name(listing.source)
+    make = _normalize(listing.make)
+    model = _normalize(listing.model)
+    price = listing.asking_price
+    dealers = set()
+    filtered_dealers = set()
+    for f in filters:
+        if not f.is_active:
+            continue
+        filtered_dealers.add(f.dealer_id)
+        if source in MARKETPLACE_TOGGLES and not getattr(f, MARKETPLACE_TOGGLES[source]):
+            continue
+        if f.makes and make not in {_normalize(m) for m in f.makes}:
+            continue
+        if f.models and model not in {_normalize(m) for m in f.models}:
+            continue
+        if f.year_min is not None and listing.year < f.year_min:
+            continue
+        if f.year_max is not None and listing.year > f.year_max:
+            continue
+        if f.mileage_max is not None and listing.mileage > f.mileage_max:
+            continue
+        if price is not None and f.price_min is not None and price < f.price_min:
+            continue
+        if price is not None and f.price_max is not None and price > f.price_max:
+            continue
+        dealers.add(f.dealer_id)
+    return (dealers & verified_dealers) | (verified_dealers - filtered_dealers)
+
+
+def run(filter_count=10000, listing_count=2000):
+    rng = random.Random(42)
+    dealer_count = max(1, filter_count // 3)
+    filters = [random_filter(rng, i, dealer_count) for i in range(1, filter_count + 1)]
+    verified = set(range(1, dealer_count + 1, 1))
+    listings = [random_listing(rng) for _ in range(listing_count)]
+
+    index = FilterIndex()
+    started = time.perf_counter()
+    index.rebuild(filters, verified)
+    build_ms = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    indexed = [index.match(listing) for listing in listings]
+    indexed_us = (time.perf_counter() - started) / listing_count * 1e6
+
+    started = time.perf_counter()
+    naive = [naive_match(filters, verified, listing) for listing in listings]
+    naive_us = (time.perf_counter() - started) / listing_count * 1e6
+
+    mismatches = sum(1 for a, b in zip(indexed, naive) if a != b)
+
+    # Incremental maintenance: replace 1% of the filters one at a time
+    started = time.perf_counter()
+    updates = max(1, filter_count // 100)
+    for i in range(updates):
+        index.upsert(random_filter(rng, rng.randint(1, filter_count), dealer_count))
+    update_us = (time.perf_counter() - started) / updates * 1e6
+
+    avg_dealers = sum(len(d) for d in indexed) / listing_count
+    print("=" * 50)
+    print(f"📊 {filter_count:,} filters, {dealer_count:,} dealers, {listing_count:,} listings")
+    print("=" * 50)
+    print(f"Index build:        {build_ms:10.1f} ms")
+    print(f"Indexed match:      {indexed_us:10.1f} µs/listing")
+    print(f"Naive linear scan:  {naive_us:10.1f} µs/listing")
+    print(f"Speedup:            {naive_us / indexed_us:10.1f}x")
+    print(f"Incremental upsert: {update_us:10.1f} µs/filter")
+    print(f"Avg dealers/listing:{avg_dealers:10.1f}")
+    print(f"{'✅' if not mismatches else '❌'} {mismatches} mismatches against the naive scan")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
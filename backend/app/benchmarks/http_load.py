@@ -0,0 +1,89 @@
+"""
+Minimal HTTP/1.1 load generator shared by the API benchmarks
+Each client is one keep-alive connection issuing GETs back to back until
+the deadline; drive() spreads clients over several processes so the load
+generator is not the bottleneck on multi-core machines.
+"""
+
+import asyncio
+import socket
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+
+async def _client(port, path, headers, deadline, latencies, errors):
+    reader = writer = None
+    extra = "".join(f"{name}: {value}\r\n" for name, value in (headers or {}).items())
+    request = f"GET {path} HTTP/1.1\r\nHost: localhost\r\n{extra}\r\n".encode()
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.write(request)
+            status = int((await reader.readline()).split()[1])
+            length = 0
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                if name.lower() == "content-length":
+                    length = int(value)
+            await reader.readexactly(length)
+        except (OSError, ValueError, IndexError, asyncio.IncompleteReadError):
+            errors.append(time.perf_counter() - started)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+            continue
+        if status in (200, 304):
+            latencies.append(time.perf_counter() - started)
+        else:
+            errors.append(status)
+    if writer is not None:
+        writer.close()
+
+
+async def _drive(port, path, clients, seconds, headers=None):
+    latencies, errors = [], []
+    deadline = time.perf_counter() + seconds
+    await asyncio.gather(*(_client(port, path, headers, deadline, latencies, errors) for _ in range(clients)))
+    return latencies, len(errors)
+
+
+def _drive_process(port, path, clients, seconds, headers=None):
+    return asyncio.run(_drive(port, path, clients, seconds, headers))
+
+
+def drive(port, path, clients, seconds, processes=1, headers=None):
+    """(sorted latencies of 200 / 304 responses, error count) for clients connections over seconds"""
+    if processes <= 1:
+        latencies, errors = _drive_process(port, path, clients, seconds, headers)
+    else:
+        shares = [clients // processes + (i < clients % processes) for i in range(processes)]
+        with ProcessPoolExecutor(processes) as pool:
+            parts = list(pool.map(_drive_process, *zip(*[(port, path, share, seconds, headers) for share in shares])))
+        latencies = [latency for part, _ in parts for latency in part]
+        errors = sum(count for _, count in parts)
+    latencies.sort()
+    return latencies, errors
+
+
+def percentile(latencies, p):
+    """p-th percentile of sorted latencies in ms (nan without samples)"""
+    if not latencies:
+        return float("nan")
+    return latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000
+
+
+def wait_for_port(port, timeout=30):
+    """Block until something accepts connections on localhost:port"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server did not start on port {port}")
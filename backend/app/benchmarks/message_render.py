@@ -0,0 +1,160 @@
+"""
+Benchmark: compiled message templates vs the old per-call f-string dict
+Renders every template for synthetic leads through both implementations,
+checks the friendly output is identical and prints per-render cost for
+render, render_many and the legacy path.
+
+Run with: python -m app.benchmarks.message_render [lead_count]
+"""
+
+import random
+import sys
+import time
+
+from app.ai_provider.templates import TONES, message_templates
+
+# Templates the legacy implementation knew; anything else fell back to initial_contact
+LEGACY_TEMPLATES = ("initial_contact", "follow_up_1", "follow_up_2", "request_more_info")
+
+
+def legacy_generate_message(template, lead_data):
+    """Reference: the per-call f-string implementation the registry replaced"""
+
+    listing = lead_data.get("listing", {})
+    seller_name = lead_data.get("seller_name", "there")
+    offer = lead_data.get("offer", {})
+    dealer_name = lead_data.get("dealer_name", "Our Team")
+    dealership_name = lead_data.get("dealership_name", "Our Dealership")
+
+    vehicle = f"{listing.get('year')} {listing.get('make')} {listing.get('model')}"
+    offer_amount = offer.get("amount", 0)
+
+    messages = {
+        "initial_contact": {
+            "subject": f"Interest in Your {vehicle}",
+            "body": f"""Hi {seller_name},
+
+I hope this message finds you well! My name is {dealer_name} from {dealership_name}, and I came across your {vehicle} listing.
+
+We're actively looking for quality vehicles like yours, and after reviewing the details, I'd love to discuss a potential purchase.
+
+Based on our initial assessment:
+• Vehicle: {vehicle}
+• Mileage: {listing.get('mileage', 'N/A'):,} miles
+• Our preliminary offer: ${offer_amount:,.0f}
+
+Would you be available for a quick chat to discuss this further? I'd be happy to answer any questions and provide more details about our offer.
+
+Looking forward to hearing from you!
+
+Best regards,
+{dealer_name}
+{dealership_name}
+{lead_data.get('dealer_phone', '')}"""
+        },
+        "follow_up_1": {
+            "subject": f"Following up - {vehicle}",
+            "body": f"""Hi {seller_name},
+
+I wanted to follow up on my previous message about your {vehicle}. I understand you're probably busy, so I wanted to reach out again.
+
+We're still very interested in your vehicle and our offer of ${offer_amount:,.0f} still stands. We can make the process quick and easy:
+
+✓ Fast, hassle-free transaction
+✓ Same-day payment available
+✓ We handle all paperwork
+✓ No hidden fees
+
+Would you be open to discussing this further? Feel free to call or text me anytime.
+
+Best,
+{dealer_name}
+{dealership_name}"""
+        },
+        "follow_up_2": {
+            "subject": f"Final follow-up - {vehicle}",
+            "body": f"""Hi {seller_name},
+
+This is my final follow-up about your {vehicle}. I completely understand if you've already sold it or decided to keep it.
+
+If you're still interested in selling, our offer of ${offer_amount:,.0f} remains available. We've had great success with similar vehicles and would love to add yours to our inventory.
+
+No pressure at all - just wanted to make sure you had all the information you need to make the best decision.
+
+Wishing you all the best,
+{dealer_name}
+{dealership_name}"""
+        },
+        "request_more_info": {
+            "subject": f"Quick questions about your {vehicle}",
+            "body": f"""Hi {seller_name},
+
+Thank you for listing your {vehicle}! We're definitely interested, but I'd love to gather a bit more information to provide you with our best offer:
+
+• Service history - do you have maintenance records?
+• Any accidents or damage history?
+• Current mechanical condition?
+• Reason for selling?
+• Timeline - when are you looking to sell?
+
+Once I have these details, I can provide you with a comprehensive offer within 24 hours.
+
+Thanks!
+{dealer_name}
+{dealership_name}"""
+        }
+    }
+
+    return messages.get(template, messages["initial_contact"])
+
+
+def random_lead(rng):
+    return {
+        "listing": {
+            "year": rng.randint(2000, 2025),
+            "make": rng.choice(["Toyota", "Honda", "Ford", "BMW"]),
+            "model": rng.choice(["Camry", "Civic", "F-150", "X5"]),
+            "mileage": rng.randint(1000, 250000)
+        },
+        "seller_name": rng.choice(["Alex", "Sam", "there"]),
+        "offer": {"amount": rng.uniform(3000, 40000)},
+        "dealer_name": "Jordan Lee",
+        "dealership_name": "Revo Motors",
+        "dealer_phone": "555-0100"
+    }
+
+
+def run(lead_count=20000):
+    rng = random.Random(3)
+    leads = [random_lead(rng) for _ in range(lead_count)]
+
+    mismatches = 0
+    for name in LEGACY_TEMPLATES + ("unknown_template",):
+        for lead in leads[:200]:
+            if message_templates.render(name, lead) != legacy_generate_message(name, lead):
+                mismatches += 1
+
+    print("=" * 50)
+    print(f"📊 {lead_count:,} leads x {len(LEGACY_TEMPLATES)} templates, {len(TONES)} tones")
+    print("=" * 50)
+    for name in LEGACY_TEMPLATES:
+        started = time.perf_counter()
+        for lead in leads:
+            legacy_generate_message(name, lead)
+        legacy_us = (time.perf_counter() - started) / lead_count * 1e6
+
+        started = time.perf_counter()
+        for lead in leads:
+            message_templates.render(name, lead)
+        render_us = (time.perf_counter() - started) / lead_count * 1e6
+
+        started = time.perf_counter()
+        message_templates.render_many(leads, name)
+        many_us = (time.perf_counter() - started) / lead_count * 1e6
+
+        print(f"{name:<18} legacy {legacy_us:6.2f} µs  render {render_us:6.2f} µs  render_many {many_us:6.2f} µs")
+    print(f"{'✅' if not mismatches else '❌'} {mismatches} friendly renders differ from the legacy output")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 20000)
@@ -0,0 +1,120 @@
+"""
+Load test: GET /api/leads/ with the cached JWT principal vs a user lookup per request
+Serves the API with one uvicorn worker, plus /bench/legacy/leads: the same
+handler behind the previous dependencies - SELECT the user for the token,
+then SELECT the dealer profile for the user - on every request. Both are
+driven by CLIENTS keep-alive connections for SECONDS with a dealer token;
+prints requests/sec, p50/p99 latency and SQL statements per request
+(counted in the server on the async engine).
+
+Needs DATABASE_URL pointing at a database with a dealer that has leads.
+
+Run with: python -m app.benchmarks.principal_cache [clients] [seconds]
+"""
+
+import json
+import os
+import subprocess
+import sys
+import urllib.request
+
+from fastapi import Depends, Query
+from sqlalchemy import event, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.leads import get_dealer_leads
+from app.auth import Principal, create_token, get_current_user_async
+from app.benchmarks.http_load import drive, percentile, wait_for_port
+from app.database import SessionLocal, async_engine, get_async_db
+from app.main import app
+from app.models import DealerProfile, Lead, User
+
+PORT = 8767
+CLIENTS = 200
+SECONDS = 15
+LIMIT = 20
+
+statements = 0
+
+
+@event.listens_for(async_engine.sync_engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    global statements
+    statements += 1
+
+
+@app.get("/bench/statements", include_in_schema=False)
+def statement_count():
+    return {"statements": statements}
+
+
+@app.get("/bench/legacy/leads", include_in_schema=False)
+async def legacy_leads(
+    limit: int = Query(50, ge=1, le=200),
+    current_user: User = Depends(get_current_user_async),
+    db: AsyncSession = Depends(get_async_db)
+):
+    dealer = (await db.execute(
+        select(DealerProfile).where(DealerProfile.user_id == current_user.id)
+    )).scalars().first()
+    principal = Principal(
+        current_user.id, current_user.role, dealer.id,
+        current_user.first_name, current_user.last_name, dealer.company_name
+    )
+    return await get_dealer_leads(source=None, status=None, limit=limit, cursor=None, dealer=principal, db=db)
+
+
+def server_statements():
+    with urllib.request.urlopen(f"http://127.0.0.1:{PORT}/bench/statements") as response:
+        return json.load(response)["statements"]
+
+
+def run(clients=CLIENTS, seconds=SECONDS):
+    db = SessionLocal()
+    try:
+        sample = db.execute(
+            select(DealerProfile.user_id, DealerProfile.id)
+            .join(Lead, Lead.dealer_id == DealerProfile.id)
+            .group_by(DealerProfile.user_id, DealerProfile.id)
+            .order_by(func.count(Lead.id).desc())
+            .limit(1)
+        ).first()
+    finally:
+        db.close()
+    if sample is None:
+        raise SystemExit("❌ No dealer has leads - post some to /api/leads/webhook/lead_received first")
+    headers = {"Authorization": f"Bearer {create_token(sample[0], 'dealer', sample[1])}"}
+
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.benchmarks.principal_cache:app", "--port", str(PORT),
+         "--log-level", "warning", "--no-access-log", "--backlog", str(clients * 2)],
+        env={**os.environ, "MIGRATE_ON_STARTUP": "false"}
+    )
+    try:
+        wait_for_port(PORT)
+        print(f"📊 GET /api/leads/?limit={LIMIT}, {clients} concurrent clients, {seconds}s per mode, 1 uvicorn worker")
+        print("=" * 72)
+        print(f"{'mode':<16} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'stmts/req':>10} {'errors':>7}")
+        print("=" * 72)
+        rates = {}
+        for mode, path in (("lookup/request", "/bench/legacy/leads"), ("cached principal", "/api/leads/")):
+            before = server_statements()
+            latencies, errors = drive(PORT, f"{path}?limit={LIMIT}", clients, seconds, headers=headers)
+            per_request = (server_statements() - before) / max(len(latencies) + errors, 1)
+            rates[mode] = len(latencies) / seconds
+            print(
+                f"{mode:<16} {rates[mode]:>9.0f} {percentile(latencies, 0.5):>9.1f} "
+                f"{percentile(latencies, 0.99):>9.1f} {per_request:>10.2f} {errors:>7}"
+            )
+        print("=" * 72)
+        print(f"🚀 {rates['cached principal'] / rates['lookup/request']:.2f}x requests/sec with the principal cache")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else CLIENTS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else SECONDS
+    )
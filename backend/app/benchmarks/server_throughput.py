@@ -0,0 +1,70 @@
+"""
+Benchmark: throughput per core of the production server (gunicorn.conf.py)
+Serves GET /health first from a single plain uvicorn process (asyncio loop,
+h11 parser - the old Dockerfile CMD), then from gunicorn with 1..N uvicorn
+workers (uvloop + httptools), N = CPUs available. The load generator runs
+in its own processes so it does not starve the server of a core it is
+measured against. Prints requests/sec, per-core req/s and p99 latency.
+
+Run with: python -m app.benchmarks.server_throughput [clients] [seconds]
+"""
+
+import os
+import subprocess
+import sys
+
+from app.benchmarks.http_load import drive, percentile, wait_for_port
+from app.server import cpu_count
+
+PORT = 8766
+CLIENTS = 256
+SECONDS = 10
+PATH = "/health"
+
+
+def measure(name, command, workers, clients, seconds):
+    env = {**os.environ, "MIGRATE_ON_STARTUP": "false", "PORT": str(PORT), "WEB_CONCURRENCY": str(workers)}
+    server = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(PORT)
+        latencies, errors = drive(PORT, PATH, clients, seconds, processes=max(1, cpu_count() // 2))
+    finally:
+        server.terminate()
+        server.wait()
+    rate = len(latencies) / seconds
+    print(
+        f"{name:<22} {workers:>7} {rate:>10.0f} {rate / workers:>10.0f} "
+        f"{percentile(latencies, 0.99):>9.1f} {errors:>7}"
+    )
+    return rate
+
+
+def run(clients=CLIENTS, seconds=SECONDS):
+    cpus = cpu_count()
+    print(f"📊 GET {PATH}, {clients} concurrent clients, {seconds}s per run, {cpus} CPUs")
+    print("=" * 72)
+    print(f"{'server':<22} {'workers':>7} {'req/s':>10} {'req/s/core':>10} {'p99 ms':>9} {'errors':>7}")
+    print("=" * 72)
+    baseline = measure(
+        "uvicorn (asyncio/h11)",
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(PORT), "--loop", "asyncio",
+         "--http", "h11", "--log-level", "warning", "--no-access-log"],
+        1, clients, seconds
+    )
+    counts = sorted({1, *range(2, cpus + 1, max(1, cpus // 4)), cpus})
+    best = max(
+        measure(
+            "gunicorn + uvicorn", [sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "app.main:app"],
+            workers, clients, seconds
+        )
+        for workers in counts
+    )
+    print("=" * 72)
+    print(f"🚀 Best gunicorn run: {best / baseline:.1f}x the single uvicorn process")
+
+
+if __name__ == "__main__":
+    run(
+        int(sys.argv[1]) if len(sys.argv) > 1 else CLIENTS,
+        int(sys.argv[2]) if len(sys.argv) > 2 else SECONDS
+    )
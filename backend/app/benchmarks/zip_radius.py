@@ -0,0 +1,84 @@
+"""
+Benchmark: RadiusIndex vs haversine against every dealer disk
+Uses a synthetic centroid table (random points over the continental US)
+written in the same mmap format as the real one.
+
+Run with: python -m app.benchmarks.zip_radius [filter_count]
+"""
+
+import os
+import random
+import sys
+import tempfile
+import time
+
+from app.matching.zip_index import (
+    RadiusIndex, ZipCentroids, build, haversine_miles, DEFAULT_RADIUS_MILES
+)
+
+
+def synthetic_centroids(rng, directory, count=33000):
+    csv_path = os.path.join(directory, "zips.csv")
+    with open(csv_path, "w") as f:
+        f.write("zip,lat,lon\n")
+        for zip_code in rng.sample(range(1000, 99999), count):
+            f.write(f"{zip_code:05d},{rng.uniform(25, 49):.6f},{rng.uniform(-124, -67):.6f}\n")
+    bin_path = os.path.join(directory, "zips.bin")
+    build(csv_path, bin_path)
+    return ZipCentroids(bin_path)
+
+
+def run(filter_count=10000, listing_count=5000):
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as directory:
+        centroids = synthetic_centroids(rng, directory)
+        zips = [f"{z:05d}" for z in centroids.zips]
+
+        disks = []
+        for slot in range(filter_count):
+            centers = [centroids.lookup(z) for z in rng.sample(zips, rng.randint(1, 3))]
+            disks.append((centers, rng.choice([25, DEFAULT_RADIUS_MILES, 100, 200])))
+
+        index = RadiusIndex()
+        started = time.perf_counter()
+        for slot, (centers, radius) in enumerate(disks):
+            index.add(slot, centers, radius)
+        build_ms = (time.perf_counter() - started) * 1000
+
+        points = [centroids.lookup(rng.choice(zips)) for _ in range(listing_count)]
+
+        started = time.perf_counter()
+        indexed = [index.match(point) for point in points]
+        indexed_us = (time.perf_counter() - started) / listing_count * 1e6
+
+        def naive(point):
+            mask = 0
+            for slot, (centers, radius) in enumerate(disks):
+                if any(haversine_miles(point[0], point[1], lat, lon) <= radius for lat, lon in centers):
+                    mask |= 1 << slot
+            return mask
+
+        sample = points[:200]
+        started = time.perf_counter()
+        expected = [naive(point) for point in sample]
+        naive_us = (time.perf_counter() - started) / len(sample) * 1e6
+
+        mismatches = sum(1 for a, b in zip(indexed, expected) if a != b)
+        lookup_started = time.perf_counter()
+        for z in zips[:10000]:
+            centroids.lookup(z)
+        lookup_us = (time.perf_counter() - lookup_started) / 10000 * 1e6
+
+        print("=" * 50)
+        print(f"📊 {filter_count:,} filters, {len(centroids):,} ZIPs, {listing_count:,} listings")
+        print("=" * 50)
+        print(f"ZIP lookup (mmap):  {lookup_us:10.2f} µs")
+        print(f"Index build:        {build_ms:10.1f} ms ({len(index.cells):,} cells)")
+        print(f"Indexed radius:     {indexed_us:10.1f} µs/listing")
+        print(f"Naive haversine:    {naive_us:10.1f} µs/listing")
+        print(f"Speedup:            {naive_us / indexed_us:10.1f}x")
+        print(f"{'✅' if not mismatches else '❌'} {mismatches} mismatches against the naive scan")
+
+
+if __name__ == "__main__":
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
@@ -0,0 +1,212 @@
+"""
+In-memory car catalog for /api/cars/*
+The catalog (makes, models, trims, body types, transmissions, fuel types)
+only changes when app.migrate_data reseeds it, so each process holds an
+immutable snapshot built with one query per table and every catalog
+endpoint is a dict lookup.
+
+- Names are sorted tuples and indexes are read-only mappings; a reload
+  builds a new snapshot and swaps the reference, so readers never see a
+  partial one
+- version counts loads in this process, digest identifies the content and
+  is the same in every worker
+- Built in the gunicorn master before forking (app.server.warm_up), so
+  workers share it copy-on-write. After a reseed, kill -HUP the master:
+  gunicorn.conf.py reloads it there before starting fresh workers
+- Each snapshot serializes every response body once (response()), so a
+  catalog request costs a dict lookup and no JSON encoding; etag is the
+  digest as a strong validator
+- listeners are called with each new snapshot, e.g. to rebuild derived
+  indexes
+- A process that starts without a snapshot (the database was down at
+  boot) loads it on first use: once, behind a lock, and off the event
+  loop for async routes (get_async)
+"""
+
+import hashlib
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, namedtuple
+from types import MappingProxyType
+
+from sqlalchemy import select
+from starlette.concurrency import run_in_threadpool
+
+from app.autocomplete import AutocompleteIndex
+from app.database import (
+    SessionLocal, Make, Model, Trim, BodyType, Transmission, FuelType,
+    model_trims, model_body_types, model_transmissions, model_fuel_types
+)
+
+logger = logging.getLogger(__name__)
+
+# years are newest first, every other field is sorted by name
+ModelDetails = namedtuple("ModelDetails", "make model years trims body_types transmissions fuel_types")
+
+
+class CatalogSnapshot:
+    __slots__ = (
+        "version", "digest", "loaded_at", "makes", "models", "details",
+        "body_types", "transmissions", "fuel_types", "autocomplete", "etag", "responses"
+    )
+
+    def __init__(self, version, makes, models, details, body_types, transmissions, fuel_types):
+        self.version = version
+        self.loaded_at = time.time()
+        self.makes = makes                  # (make, ...)
+        self.models = models                # make -> (model, ...), every make
+        self.details = details              # (make, model) -> ModelDetails
+        self.body_types = body_types
+        self.transmissions = transmissions
+        self.fuel_types = fuel_types
+        self.autocomplete = AutocompleteIndex(details)   # /api/cars/search
+        content = repr((makes, sorted(details.items()), body_types, transmissions, fuel_types))
+        self.digest = hashlib.sha1(content.encode("utf-8")).hexdigest()[:16]
+        self.etag = f'"{self.digest}"'
+        self.responses = MappingProxyType(self._render())  # (endpoint, *params) -> JSON bytes
+
+    def models_for(self, make):
+        return self.models.get(make, ())
+
+    def find(self, make, model):
+        return self.details.get((make, model))
+
+    def payload(self, endpoint, *params):
+        """Response body of a /api/cars endpoint, found or not"""
+        if endpoint in ("makes", "body_types", "transmissions", "fuel_types"):
+            return {endpoint: getattr(self, endpoint)}
+        if endpoint == "models":
+            return {"make": params[0], "models": self.models_for(params[0])}
+        make, model = params
+        details = self.find(make, model)
+        if endpoint == "details":
+            if not details:
+                return {"error": "Model not found" if make in self.models else "Make not found"}
+            return {"make": make, "model": model, **{field: getattr(details, field) for field in (
+                "years", "trims", "body_types", "transmissions", "fuel_types"
+            )}}
+        return {"make": make, "model": model, endpoint: getattr(details, endpoint) if details else ()}
+
+    def _render(self):
+        keys = [("makes",), ("body_types",), ("transmissions",), ("fuel_types",)]
+        keys += [("models", make) for make in self.models]
+        keys += [(endpoint, *pair) for pair in self.details for endpoint in ("trims", "years", "details")]
+        return {key: _json(self.payload(*key)) for key in keys}
+
+    def response(self, endpoint, *params):
+        """Serialized body for endpoint(params); unknown makes / models are rendered on demand"""
+        body = self.responses.get((endpoint, *params))
+        if body is None:
+            body = _json(self.payload(endpoint, *params))
+        return body
+
+    def stats(self):
+        return {
+            "version": self.version,
+            "digest": self.digest,
+            "loaded_at": self.loaded_at,
+            "makes": len(self.makes),
+            "models": len(self.details)
+        }
+
+
+def _json(payload):
+    # Byte for byte what FastAPI's JSONResponse would send
+    return json.dumps(payload, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _names_by_model(db, association, target):
+    """model id -> sorted tuple of target names linked through association"""
+    names = defaultdict(list)
+    for model_id, name in db.execute(select(association.c.model_id, target.name).join_from(association, target)):
+        names[model_id].append(name)
+    return {model_id: tuple(sorted(values)) for model_id, values in names.items()}
+
+
+def build_snapshot(db, version=1):
+    """Read the whole catalog (one query per table) into a CatalogSnapshot"""
+    make_names = dict(db.execute(select(Make.id, Make.name)).all())
+    trims = _names_by_model(db, model_trims, Trim)
+    body_types = _names_by_model(db, model_body_types, BodyType)
+    transmissions = _names_by_model(db, model_transmissions, Transmission)
+    fuel_types = _names_by_model(db, model_fuel_types, FuelType)
+
+    models = defaultdict(list)
+    details = {}
+    rows = db.execute(select(Model.id, Model.make_id, Model.name, Model.year_min, Model.year_max))
+    for model_id, make_id, name, year_min, year_max in rows:
+        make = make_names.get(make_id)
+        if make is None:
+            continue
+        models[make].append(name)
+        details[(make, name)] = ModelDetails(
+            make, name,
+            tuple(range(year_max, year_min - 1, -1)) if year_min and year_max else (),
+            trims.get(model_id, ()),
+            body_types.get(model_id, ()),
+            transmissions.get(model_id, ()),
+            fuel_types.get(model_id, ())
+        )
+
+    return CatalogSnapshot(
+        version,
+        tuple(sorted(make_names.values())),
+        MappingProxyType({make: tuple(sorted(models[make])) for make in make_names.values()}),
+        MappingProxyType(details),
+        tuple(sorted(db.execute(select(BodyType.name)).scalars())),
+        tuple(sorted(db.execute(select(Transmission.name)).scalars())),
+        tuple(sorted(db.execute(select(FuelType.name)).scalars()))
+    )
+
+
+class Catalog:
+    def __init__(self):
+        self.snapshot = None
+        self.lock = threading.Lock()
+        self.first_load = threading.Lock()
+        self.listeners = []
+
+    def load(self, db):
+        """Build a new snapshot from db and swap it in"""
+        with self.lock:
+            version = self.snapshot.version + 1 if self.snapshot else 1
+            started = time.perf_counter()
+            snapshot = build_snapshot(db, version)
+            self.snapshot = snapshot
+        logger.info(
+            f"🚗 Car catalog v{snapshot.version} ({snapshot.digest}): {len(snapshot.makes)} makes, "
+            f"{len(snapshot.details)} models in {(time.perf_counter() - started) * 1000:.0f} ms"
+        )
+        for listener in self.listeners:
+            listener(snapshot)
+        return snapshot
+
+    def reload(self):
+        """Reload hook: rebuild the snapshot from the database"""
+        db = SessionLocal()
+        try:
+            return self.load(db)
+        finally:
+            db.close()
+
+    def get(self):
+        """Current snapshot; loaded on first use when nothing preloaded it (blocks, see get_async)"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            # Concurrent first requests wait for one load instead of each running their own
+            with self.first_load:
+                snapshot = self.snapshot or self.reload()
+        return snapshot
+
+    async def get_async(self):
+        """get() for async def routes: a first-use load runs in the threadpool"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            snapshot = await run_in_threadpool(self.get)
+        return snapshot
+
+
+# Process-wide catalog served by app.api.car_database
+catalog = Catalog()
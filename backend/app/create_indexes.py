@@ -0,0 +1,55 @@
+"""
+Index migration: build the marketplace indexes declared in app.models
+Uses CREATE INDEX CONCURRENTLY IF NOT EXISTS so it is safe to re-run at
+deploy time against live tables without blocking writes. Applied once by
+migration 3 in app.migrations; this script re-runs it by hand.
+
+Run with: python -m app.create_indexes
+"""
+
+import re
+from sqlalchemy import text
+from sqlalchemy.schema import CreateIndex
+
+from app.database import engine
+from app.models import Base
+
+
+def _create_index_sql(index):
+    """Render the CREATE INDEX statement for an index as CONCURRENTLY / IF NOT EXISTS"""
+    ddl = str(CreateIndex(index, if_not_exists=True).compile(dialect=engine.dialect))
+    return re.sub(r"^CREATE (UNIQUE )?INDEX", r"CREATE \1INDEX CONCURRENTLY", ddl.strip())
+
+
+def create_indexes(conn=None, names=None):
+    """Create every declared index (or only those in names) that does not exist yet"""
+    if conn is None:
+        # CONCURRENTLY cannot run inside a transaction block
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            return create_indexes(conn, names)
+
+    indexes = [
+        index for table in Base.metadata.sorted_tables for index in table.indexes
+        if names is None or index.name in names
+    ]
+
+    for index in indexes:
+        # A failed concurrent build leaves an INVALID index behind that
+        # IF NOT EXISTS would happily skip - drop it so it gets rebuilt
+        invalid = conn.execute(text("""
+            SELECT 1 FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND NOT i.indisvalid
+        """), {"name": index.name}).first()
+        if invalid:
+            print(f"⚠️  Dropping invalid index {index.name}")
+            conn.execute(text(f'DROP INDEX CONCURRENTLY IF EXISTS "{index.name}"'))
+
+        print(f"✏️  {index.table.name}.{index.name}")
+        conn.execute(text(_create_index_sql(index)))
+
+    print(f"✅ {len(indexes)} indexes verified!")
+
+
+if __name__ == "__main__":
+    create_indexes()
@@ -1,12 +1,24 @@
 """
 Database configuration and models for car data
-Uses PostgreSQL with SQLAlchemy ORM
+Uses PostgreSQL with SQLAlchemy ORM: a sync engine (psycopg2) for def routes,
+workers and scripts, and an async engine (asyncpg) for async def routes
+
+Each engine has its own pool sized by the DB_POOL_* settings, so one
+process opens at most 2 x (DB_POOL_SIZE + DB_MAX_OVERFLOW) connections.
+Checkout waits and timeouts are recorded per pool (see pool_stats).
 """
 
-from sqlalchemy import create_engine, Column, Integer, String, ForeignKey, Table, Boolean, UniqueConstraint
+from sqlalchemy import create_engine, event, Column, Integer, String, ForeignKey, Table, Boolean, UniqueConstraint
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, relationship
+from sqlalchemy.orm import Session, joinedload, relationship, selectinload, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 import os
+import time
+import uuid
+
+from app import metrics
 
 # Database URL - use environment variable for security
 DATABASE_URL = os.getenv(
@@ -18,8 +30,124 @@ DATABASE_URL = os.getenv(
 if DATABASE_URL.startswith("postgresql://"):
     DATABASE_URL = DATABASE_URL.replace("postgresql://", "postgresql+psycopg2://", 1)
 
-engine = create_engine(DATABASE_URL, echo=False)
+
+def async_url(url):
+    """Same database through its asyncio driver: asyncpg for Postgres, aiosqlite for SQLite (requirements-dev.txt)"""
+    driver, _, rest = url.partition("://")
+    if driver.startswith("postgresql"):
+        return f"postgresql+asyncpg://{rest}"
+    if driver.startswith("sqlite"):
+        return f"sqlite+aiosqlite://{rest}"
+    return url
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(DATABASE_URL)
+
+# Per engine and process; size the fleet total below Postgres max_connections
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Replace connections older than this, before a server / firewall idle timeout drops them
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+# PgBouncer in transaction mode: no server-side prepared statement cache
+DB_PGBOUNCER = os.getenv("DB_PGBOUNCER", "false").lower() == "true"
+
+
+class _TimedPool:
+    """Pool mixin recording how long each checkout waits (incl. connect and pre-ping)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_timer = metrics.tracker(f"db_checkout_{self.label}")
+        self.timeouts = 0
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.checkout_timer.observe(time.perf_counter() - started)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.timeouts = self.timeouts
+        return pool
+
+    def stats(self):
+        return {
+            "size": self.size(),
+            "max_overflow": self._max_overflow,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "timeouts": self.timeouts,
+            "checkout_wait": self.checkout_timer.snapshot()
+        }
+
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    label = "sync"
+
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    label = "async"
+
+
+def _pool_options(poolclass):
+    return {
+        "poolclass": poolclass,
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING
+    }
+
+
+def _async_connect_args(url):
+    """asyncpg prepares and caches statements per connection; a pooled
+    PgBouncer server connection may not have them, so disable both caches
+    and give every statement a unique name"""
+    if not DB_PGBOUNCER or not url.startswith("postgresql+asyncpg"):
+        return {}
+    return {
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__"
+    }
+
+
+# psycopg2 never uses server-side prepared statements, so it needs no PgBouncer tweaks
+engine = create_engine(DATABASE_URL, echo=False, **_pool_options(TimedQueuePool))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+# Objects stay usable after commit: an async session cannot lazy-load expired attributes
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL, echo=False,
+    connect_args=_async_connect_args(ASYNC_DATABASE_URL),
+    **_pool_options(TimedAsyncQueuePool)
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+def pool_stats():
+    """In-use / idle / overflow counts, timeouts and checkout waits of this process's pools"""
+    return {
+        "sync": engine.pool.stats(),
+        "async": async_engine.pool.stats(),
+        "settings": {
+            "pool_size": DB_POOL_SIZE,
+            "max_overflow": DB_MAX_OVERFLOW,
+            "pool_timeout": DB_POOL_TIMEOUT,
+            "pool_recycle": DB_POOL_RECYCLE,
+            "pre_ping": DB_POOL_PRE_PING,
+            "pgbouncer": DB_PGBOUNCER
+        }
+    }
 Base = declarative_base()
 
 
@@ -110,6 +238,23 @@ class FuelType(Base):
     name = Column(String, unique=True, index=True)
 
 
+# Loader options for reading the catalog through the ORM: collections load
+# with one SELECT IN per relationship for the whole result, the many-to-one
+# make rides along in a JOIN. Relationships are lazy by default (one SELECT
+# per row and attribute), which async sessions cannot do at all. No request
+# path reads the catalog through the ORM since app.catalog (the snapshot
+# selects plain columns); these serve scripts and the benchmarks, and
+# tests/test_query_budgets.py pins their statement counts.
+MAKE_MODELS = (selectinload(Make.models),)
+MODEL_MAKE = (joinedload(Model.make),)
+MODEL_DETAILS = (
+    selectinload(Model.trims),
+    selectinload(Model.body_types),
+    selectinload(Model.transmissions),
+    selectinload(Model.fuel_types),
+)
+
+
 def get_db():
     """Dependency for getting database session"""
     db = SessionLocal()
@@ -119,6 +264,61 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    """Dependency for getting an async database session (async def routes)"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def after_commit(session, callback, *args):
+    """Call callback(*args) once session's outermost transaction commits
+
+    For process-local state derived from rows written in the transaction
+    (caches, in-memory indexes): dropped when the transaction, or a
+    savepoint open at the time of the call, rolls back.
+    """
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    session.info.setdefault("after_commit", []).append((transaction, callback, args, False))
+
+def after_commit_batch(session, callback, item):
+    """Like after_commit, but callback(items) runs once per commit with every item that survived
+
+    For callbacks with a per-call cost (a notification, a round trip)
+    that would otherwise be paid once per row of a batch.
+    """
+    transaction = session.get_nested_transaction() or session.get_transaction()
+    session.info.setdefault("after_commit", []).append((transaction, callback, (item,), True))
+
+@event.listens_for(Session, "after_commit")
+def _run_after_commit(session):
+    # Also fired when a savepoint is released - wait for the outermost commit
+    if session.in_nested_transaction():
+        return
+    batches = {}
+    for _, callback, args, batched in session.info.pop("after_commit", ()):
+        if batched:
+            batches.setdefault(callback, []).extend(args)
+        else:
+            callback(*args)
+    for callback, items in batches.items():
+        callback(items)
+
+@event.listens_for(Session, "after_soft_rollback")
+def _discard_after_commit(session, previous_transaction):
+    pending = session.info.get("after_commit")
+    if not pending:
+        return
+
+    def rolled_back(transaction):
+        while transaction is not None:
+            if transaction is previous_transaction:
+                return True
+            transaction = transaction.parent
+        return False
+
+    session.info["after_commit"] = [entry for entry in pending if not rolled_back(entry[0])]
+
+
 def init_db():
     """Create all tables"""
     Base.metadata.create_all(bind=engine)
\ No newline at end of file
@@ -0,0 +1,277 @@
+"""
+Outbox for seller messages: send-message only writes a row here, in the
+same transaction that marks the Message sent; delivery workers hand the
+rows to the channel's provider (app.delivery.providers).
+
+- Rows are claimed with SELECT ... FOR UPDATE SKIP LOCKED and leased by
+  pushing next_attempt_at DELIVERY_LEASE_SECONDS ahead, then committed,
+  so no transaction or row lock is held while talking to a provider
+- A claimed batch is grouped per channel, paced by the channel's rate
+  limiter and sent in provider-sized batches over pooled connections
+- Results go back in one bulk UPDATE each for outbox and messages
+  (Message.delivery_status queued -> delivered / failed); transport
+  errors retry with exponential backoff up to DELIVERY_MAX_ATTEMPTS
+- A provider that raises fails only its own chunk, as a retry; rows whose
+  leases keep running out (a worker dying mid-send) are parked as dead
+  when claimed with DELIVERY_MAX_ATTEMPTS used up
+- A worker that dies mid-send leaves its rows due again when the lease
+  runs out, so delivery is at-least-once
+
+Run workers with: python -m app.delivery.outbox
+"""
+
+import logging
+import os
+import random
+import threading
+import time
+from collections import defaultdict, namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import func, update
+
+from app.database import SessionLocal
+from app.models import Message, OutboxMessage
+from app.delivery.providers import RATE_LIMITS, Result, get_provider, pool_stats, rate_limiters
+from app import metrics
+
+logger = logging.getLogger(__name__)
+send_timer = metrics.tracker("delivery_send")
+delivery_timer = metrics.tracker("delivery_latency")
+
+DELIVERY_WORKERS = int(os.getenv("DELIVERY_WORKERS", "4"))
+DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "200"))
+DELIVERY_POLL_SECONDS = float(os.getenv("DELIVERY_POLL_SECONDS", "1"))
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "8"))
+DELIVERY_LEASE_SECONDS = 300
+BACKOFF_BASE_SECONDS = 5
+BACKOFF_MAX_SECONDS = 3600
+
+# Snapshot of a claimed outbox row, used once the session has committed
+Delivery = namedtuple("Delivery", "id message_id channel recipient subject body attempts created_at")
+
+
+def recipient_for(channel, listing):
+    """Seller address of a listing for a channel, None when it has none"""
+    if channel == "sms":
+        return listing.seller_phone
+    if channel == "email":
+        return listing.seller_email
+    return None
+
+
+def enqueue(db, message, listing):
+    """Queue a sent Message for delivery in the caller's transaction
+
+    Marks the message failed instead when the seller has no address for
+    its channel. Returns the OutboxMessage, or None.
+    """
+    channel = message.channel or "email"
+    recipient = recipient_for(channel, listing)
+    if not recipient:
+        message.delivery_status = "failed"
+        message.delivery_error = f"Seller has no {channel} address"
+        return None
+
+    message.delivery_status = "queued"
+    message.delivery_error = None
+    outbox = OutboxMessage(
+        message_id=message.id,
+        channel=channel,
+        recipient=recipient,
+        subject=message.subject,
+        body=message.body
+    )
+    db.add(outbox)
+    return outbox
+
+
+def backoff_seconds(attempts):
+    """Exponential backoff with jitter: 5s, 10s, 20s ... capped at an hour"""
+    delay = min(BACKOFF_BASE_SECONDS * 2 ** (attempts - 1), BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def send(deliveries):
+    """Results for deliveries, batched per channel provider and rate limited"""
+    by_channel = defaultdict(list)
+    for delivery in deliveries:
+        by_channel[delivery.channel].append(delivery)
+
+    results = {}
+    for channel, pending in by_channel.items():
+        try:
+            provider = get_provider(channel)
+        except ValueError as e:
+            results.update((delivery.id, Result("failed", None, str(e))) for delivery in pending)
+            continue
+        for start in range(0, len(pending), provider.batch_size):
+            chunk = pending[start:start + provider.batch_size]
+            rate_limiters[channel].acquire(len(chunk))
+            try:
+                with send_timer.time():
+                    chunk_results = provider.send_batch(chunk)
+            except Exception as e:
+                # Keep the rest of the batch's results; this chunk goes again after backoff
+                logger.error(f"❌ {channel} provider raised on a chunk of {len(chunk)}: {e}", exc_info=True)
+                chunk_results = [Result("retry", None, f"Provider error: {e!r}")] * len(chunk)
+            results.update(zip((delivery.id for delivery in chunk), chunk_results))
+    return results
+
+
+def process_batch(db, batch_size=DELIVERY_BATCH_SIZE):
+    """Claim, send and record up to batch_size due outbox rows; returns the number claimed"""
+    now = datetime.utcnow()
+    rows = db.query(OutboxMessage).filter(
+        OutboxMessage.status == "pending",
+        OutboxMessage.next_attempt_at <= now
+    ).order_by(OutboxMessage.next_attempt_at).limit(batch_size).with_for_update(skip_locked=True).all()
+    if not rows:
+        return 0
+
+    deliveries = []
+    exhausted = []
+    for row in rows:
+        if row.attempts >= DELIVERY_MAX_ATTEMPTS:
+            # Every attempt ended with the lease running out, no result recorded
+            row.status = "dead"
+            row.last_error = row.last_error or f"No result after {row.attempts} attempts"
+            exhausted.append({
+                "id": row.message_id,
+                "delivery_status": "failed",
+                "delivery_error": row.last_error
+            })
+            logger.error(f"❌ Delivery {row.id} ({row.channel}) dead after {row.attempts} attempts")
+            continue
+        row.attempts += 1
+        row.next_attempt_at = now + timedelta(seconds=DELIVERY_LEASE_SECONDS)
+        deliveries.append(Delivery(
+            row.id, row.message_id, row.channel, row.recipient, row.subject, row.body,
+            row.attempts, row.created_at
+        ))
+    if exhausted:
+        db.execute(update(Message), exhausted)
+    db.commit()
+    if not deliveries:
+        return len(rows)
+
+    results = send(deliveries)
+
+    now = datetime.utcnow()
+    outbox_updates = []
+    message_updates = []
+    for delivery in deliveries:
+        result = results[delivery.id]
+        if result.status == "sent":
+            outbox_updates.append({
+                "id": delivery.id,
+                "status": "sent",
+                "sent_at": now,
+                "provider_message_id": result.provider_message_id,
+                "last_error": None
+            })
+            message_updates.append({
+                "id": delivery.message_id,
+                "delivery_status": "delivered",
+                "delivered_at": now,
+                "delivery_error": None
+            })
+            delivery_timer.observe((now - delivery.created_at).total_seconds())
+        elif result.status == "retry" and delivery.attempts < DELIVERY_MAX_ATTEMPTS:
+            outbox_updates.append({
+                "id": delivery.id,
+                "next_attempt_at": now + timedelta(seconds=backoff_seconds(delivery.attempts)),
+                "last_error": result.error[:2000]
+            })
+        else:
+            outbox_updates.append({"id": delivery.id, "status": "dead", "last_error": result.error[:2000]})
+            message_updates.append({
+                "id": delivery.message_id,
+                "delivery_status": "failed",
+                "delivery_error": result.error[:2000]
+            })
+            logger.error(f"❌ Delivery {delivery.id} ({delivery.channel}) failed: {result.error}")
+
+    db.execute(update(OutboxMessage), outbox_updates)
+    if message_updates:
+        db.execute(update(Message), message_updates)
+    db.commit()
+    return len(rows)
+
+
+def delivery_stats(db, window_seconds=300):
+    """Fleet-wide outbox depth and send rate per channel, plus this process's pools and timings"""
+    now = datetime.utcnow()
+    since = now - timedelta(seconds=window_seconds)
+
+    depth, due, oldest = db.query(
+        func.count(OutboxMessage.id),
+        func.count(OutboxMessage.id).filter(OutboxMessage.next_attempt_at <= now),
+        func.min(OutboxMessage.created_at)
+    ).filter(OutboxMessage.status == "pending").one()
+
+    dead = db.query(func.count(OutboxMessage.id)).filter(OutboxMessage.status == "dead").scalar()
+
+    sent = dict(db.query(OutboxMessage.channel, func.count(OutboxMessage.id)).filter(
+        OutboxMessage.status == "sent",
+        OutboxMessage.sent_at >= since
+    ).group_by(OutboxMessage.channel).all())
+
+    return {
+        "pending": depth,
+        "due": due,
+        "dead": dead,
+        "oldest_pending_age_seconds": round((now - oldest).total_seconds(), 1) if oldest else None,
+        "sent_last_window": sent,
+        "send_rate_per_second": {
+            channel: round(count / window_seconds, 2) for channel, count in sent.items()
+        },
+        "rate_limits_per_second": RATE_LIMITS,
+        "window_seconds": window_seconds,
+        "pools": pool_stats(),
+        "send": send_timer.snapshot(),
+        "latency": delivery_timer.snapshot()
+    }
+
+
+def _worker_loop(stop):
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            claimed = process_batch(db)
+        except Exception as e:
+            logger.error(f"❌ Delivery worker error: {e}", exc_info=True)
+            db.rollback()
+            claimed = 0
+        finally:
+            db.close()
+        if claimed < DELIVERY_BATCH_SIZE:
+            stop.wait(DELIVERY_POLL_SECONDS)
+
+
+def run_workers(count=DELIVERY_WORKERS):
+    """Run count delivery threads until interrupted"""
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_worker_loop, args=(stop,), name=f"deliver-{i}", daemon=True)
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info(f"🚀 {count} delivery workers draining the outbox")
+
+    try:
+        while True:
+            time.sleep(60)
+            logger.info(
+                f"📊 Delivery send: {send_timer.snapshot()}, latency: {delivery_timer.snapshot()}, "
+                f"pools: {pool_stats()}"
+            )
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_workers()
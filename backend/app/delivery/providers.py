@@ -0,0 +1,268 @@
+"""
+Outbound delivery providers with pooled, keep-alive connections
+A provider sends a batch of deliveries over one pooled connection and
+returns a Result per delivery: "sent", "retry" (transport trouble,
+throttling) or "failed" (rejected by the provider, never retried).
+
+- email: SMTP (SMTP_URL, smtp:// or smtps://, user:password@ for AUTH);
+  one session delivers a whole batch, STARTTLS when the server offers it
+- sms: HTTP batch API (SMS_API_URL): POST {"messages": [{"reference",
+  "to", "body"}]} -> {"results": [{"reference", "id"} or {"reference",
+  "error"}]}, up to SMS_BATCH_SIZE messages per request
+- Connections are kept alive between batches and dropped after
+  POOL_IDLE_SECONDS unused, before the server times them out
+- RateLimiter paces each channel per process (token bucket)
+
+python -m app.delivery.sinks runs local fake SMTP/SMS endpoints.
+"""
+
+import http.client
+import json
+import logging
+import os
+import queue
+import smtplib
+import threading
+import time
+from collections import namedtuple
+from email.message import EmailMessage
+from email.utils import make_msgid
+from urllib.parse import unquote, urlsplit
+
+logger = logging.getLogger(__name__)
+
+SMTP_URL = os.getenv("SMTP_URL", "smtp://localhost:1025")
+SMTP_FROM = os.getenv("SMTP_FROM", "no-reply@revomotors.com")
+SMTP_POOL_SIZE = int(os.getenv("SMTP_POOL_SIZE", "4"))
+SMTP_BATCH_SIZE = int(os.getenv("SMTP_BATCH_SIZE", "50"))
+SMS_API_URL = os.getenv("SMS_API_URL", "http://localhost:8025/messages")
+SMS_API_KEY = os.getenv("SMS_API_KEY", "")
+SMS_POOL_SIZE = int(os.getenv("SMS_POOL_SIZE", "4"))
+SMS_BATCH_SIZE = int(os.getenv("SMS_BATCH_SIZE", "100"))
+EMAIL_RATE_PER_SECOND = float(os.getenv("EMAIL_RATE_PER_SECOND", "50"))
+SMS_RATE_PER_SECOND = float(os.getenv("SMS_RATE_PER_SECOND", "10"))
+POOL_IDLE_SECONDS = 30
+CONNECT_TIMEOUT_SECONDS = 10
+
+# status: sent | retry | failed
+Result = namedtuple("Result", "status provider_message_id error")
+
+
+class RateLimiter:
+    """Token bucket shared by a process's workers; rate 0 means unlimited"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst or max(rate, 1)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, count=1):
+        """Take count tokens, sleeping while the bucket is in debt"""
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            self.tokens -= count
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait:
+            time.sleep(wait)
+
+
+class ConnectionPool:
+    """Up to size connections from connect(), reused most-recently-idle first"""
+
+    def __init__(self, connect, close, size):
+        self.connect = connect
+        self.close = close
+        self.idle = queue.LifoQueue()
+        self.slots = threading.BoundedSemaphore(size)
+        self.created = 0
+        self.reused = 0
+
+    def acquire(self):
+        self.slots.acquire()
+        while True:
+            try:
+                conn, idle_since = self.idle.get_nowait()
+            except queue.Empty:
+                break
+            if time.monotonic() - idle_since < POOL_IDLE_SECONDS:
+                self.reused += 1
+                return conn
+            self._close(conn)
+        try:
+            conn = self.connect()
+        except Exception:
+            self.slots.release()
+            raise
+        self.created += 1
+        return conn
+
+    def release(self, conn, broken=False):
+        if broken:
+            self._close(conn)
+        else:
+            self.idle.put((conn, time.monotonic()))
+        self.slots.release()
+
+    def _close(self, conn):
+        try:
+            self.close(conn)
+        except Exception:
+            pass
+
+    def stats(self):
+        return {"created": self.created, "reused": self.reused, "idle": self.idle.qsize()}
+
+
+class SmtpProvider:
+    channel = "email"
+
+    def __init__(self, url=SMTP_URL, sender=SMTP_FROM, pool_size=SMTP_POOL_SIZE, batch_size=SMTP_BATCH_SIZE):
+        self.url = urlsplit(url)
+        self.sender = sender
+        self.batch_size = batch_size
+        self.pool = ConnectionPool(self._connect, lambda conn: conn.quit(), pool_size)
+
+    def _connect(self):
+        url = self.url
+        if url.scheme == "smtps":
+            conn = smtplib.SMTP_SSL(url.hostname, url.port or 465, timeout=CONNECT_TIMEOUT_SECONDS)
+        else:
+            conn = smtplib.SMTP(url.hostname, url.port or 25, timeout=CONNECT_TIMEOUT_SECONDS)
+            conn.ehlo()
+            if conn.has_extn("starttls"):
+                conn.starttls()
+                conn.ehlo()
+        if url.username:
+            conn.login(unquote(url.username), unquote(url.password or ""))
+        return conn
+
+    def send_batch(self, deliveries):
+        """Send every delivery over one pooled SMTP session"""
+        try:
+            conn = self.pool.acquire()
+        except (smtplib.SMTPException, OSError) as e:
+            return [Result("retry", None, f"SMTP connect failed: {e}")] * len(deliveries)
+
+        results = []
+        broken = False
+        try:
+            for delivery in deliveries:
+                if broken:
+                    results.append(Result("retry", None, "SMTP connection lost"))
+                    continue
+                message = EmailMessage()
+                message["From"] = self.sender
+                message["To"] = delivery.recipient
+                message["Subject"] = delivery.subject or ""
+                message["Message-ID"] = make_msgid(domain=self.sender.rpartition("@")[2] or None)
+                message.set_content(delivery.body)
+                try:
+                    conn.send_message(message)
+                    results.append(Result("sent", message["Message-ID"], None))
+                except smtplib.SMTPRecipientsRefused as e:
+                    results.append(Result("failed", None, f"Recipient refused: {e.recipients}"))
+                except smtplib.SMTPResponseException as e:
+                    # 5xx is permanent, 4xx (greylisting, throttling) is worth another attempt
+                    status = "failed" if e.smtp_code >= 500 else "retry"
+                    results.append(Result(status, None, f"SMTP {e.smtp_code}: {e.smtp_error!r}"))
+                    try:
+                        conn.rset()
+                    except (smtplib.SMTPException, OSError):
+                        broken = True
+                except (smtplib.SMTPServerDisconnected, OSError) as e:
+                    broken = True
+                    results.append(Result("retry", None, f"SMTP connection lost: {e}"))
+        finally:
+            self.pool.release(conn, broken)
+        return results
+
+
+class SmsProvider:
+    channel = "sms"
+
+    def __init__(self, url=SMS_API_URL, api_key=SMS_API_KEY, pool_size=SMS_POOL_SIZE, batch_size=SMS_BATCH_SIZE):
+        self.url = urlsplit(url)
+        self.api_key = api_key
+        self.batch_size = batch_size
+        self.pool = ConnectionPool(self._connect, lambda conn: conn.close(), pool_size)
+
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.url.scheme == "https" else http.client.HTTPConnection
+        return connection_class(self.url.hostname, self.url.port, timeout=CONNECT_TIMEOUT_SECONDS)
+
+    def send_batch(self, deliveries):
+        """Send up to batch_size deliveries with one request on a pooled keep-alive connection"""
+        payload = json.dumps({"messages": [
+            {"reference": str(delivery.id), "to": delivery.recipient, "body": delivery.body}
+            for delivery in deliveries
+        ]})
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+
+        try:
+            conn = self.pool.acquire()
+        except OSError as e:
+            return [Result("retry", None, f"SMS connect failed: {e}")] * len(deliveries)
+
+        broken = True
+        try:
+            conn.request("POST", self.url.path or "/", body=payload, headers=headers)
+            response = conn.getresponse()
+            # The body must be read in full before the connection can be reused
+            body = response.read()
+            broken = response.will_close
+        except (http.client.HTTPException, OSError) as e:
+            return [Result("retry", None, f"SMS request failed: {e}")] * len(deliveries)
+        finally:
+            self.pool.release(conn, broken)
+
+        if response.status == 429 or response.status >= 500:
+            return [Result("retry", None, f"SMS API {response.status}")] * len(deliveries)
+        if response.status >= 400:
+            return [Result("failed", None, f"SMS API {response.status}: {body[:200]!r}")] * len(deliveries)
+
+        by_reference = {item.get("reference"): item for item in json.loads(body).get("results", [])}
+        results = []
+        for delivery in deliveries:
+            item = by_reference.get(str(delivery.id))
+            if item is None:
+                results.append(Result("retry", None, "Missing from SMS API response"))
+            elif item.get("error"):
+                results.append(Result("failed", None, str(item["error"])))
+            else:
+                results.append(Result("sent", item.get("id"), None))
+        return results
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+RATE_LIMITS = {"email": EMAIL_RATE_PER_SECOND, "sms": SMS_RATE_PER_SECOND}
+rate_limiters = {channel: RateLimiter(rate) for channel, rate in RATE_LIMITS.items()}
+
+
+def get_provider(channel):
+    """Process-wide provider for a channel, created on first use"""
+    with _providers_lock:
+        provider = _providers.get(channel)
+        if provider is None:
+            if channel == "email":
+                provider = SmtpProvider()
+            elif channel == "sms":
+                provider = SmsProvider()
+            else:
+                raise ValueError(f"Unknown delivery channel: {channel}")
+            _providers[channel] = provider
+        return provider
+
+
+def pool_stats():
+    with _providers_lock:
+        return {channel: provider.pool.stats() for channel, provider in _providers.items()}
@@ -0,0 +1,185 @@
+"""
+Local fake delivery endpoints for development, tests and load benchmarks
+- SMTP sink: accepts EHLO/MAIL/RCPT/DATA sessions and counts messages;
+  recipients at REJECT_DOMAIN get a permanent 550
+- SMS sink: the HTTP batch API SmsProvider speaks, over HTTP/1.1
+  keep-alive; numbers ending in REJECT_NUMBER_SUFFIX are rejected
+- connect_delay / request_delay add latency (TLS handshake, provider
+  round trip) so pooled and unpooled senders compare realistically
+
+Point SMTP_URL=smtp://localhost:1025 and SMS_API_URL=http://localhost:8025/messages at them.
+
+Run with: python -m app.delivery.sinks
+"""
+
+import json
+import logging
+import socketserver
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger(__name__)
+
+SMTP_SINK_PORT = 1025
+SMS_SINK_PORT = 8025
+REJECT_DOMAIN = "bounce.invalid"
+REJECT_NUMBER_SUFFIX = "0000"
+
+
+class SinkCounters:
+    def __init__(self):
+        self.connections = 0
+        self.requests = 0
+        self.messages = 0
+        self.rejected = 0
+        self.lock = threading.Lock()
+
+    def add(self, **counts):
+        with self.lock:
+            for name, count in counts.items():
+                setattr(self, name, getattr(self, name) + count)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "connections": self.connections,
+                "requests": self.requests,
+                "messages": self.messages,
+                "rejected": self.rejected
+            }
+
+
+class _SmtpHandler(socketserver.StreamRequestHandler):
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode("ascii"))
+
+    def handle(self):
+        server = self.server
+        server.counters.add(connections=1)
+        if server.connect_delay:
+            time.sleep(server.connect_delay)
+        self.reply("220 sink ESMTP")
+
+        recipients = []
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            command = line.decode("utf-8", "replace").strip()
+            verb = command[:4].upper()
+
+            if verb == "EHLO":
+                self.wfile.write(b"250-sink\r\n250-8BITMIME\r\n250 SMTPUTF8\r\n")
+            elif verb == "HELO":
+                self.reply("250 sink")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.partition(":")[2].strip().strip("<>")
+                if address.lower().endswith("@" + REJECT_DOMAIN):
+                    server.counters.add(rejected=1)
+                    self.reply("550 No such user")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                if not recipients:
+                    self.reply("503 No valid recipients")
+                    continue
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                while True:
+                    data = self.rfile.readline()
+                    if not data or data in (b".\r\n", b".\n"):
+                        break
+                if server.request_delay:
+                    time.sleep(server.request_delay)
+                server.counters.add(messages=1)
+                self.reply("250 OK queued")
+            elif verb == "RSET":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "NOOP":
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("502 Command not implemented")
+
+
+class SmtpSink(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host="127.0.0.1", port=SMTP_SINK_PORT, connect_delay=0.0, request_delay=0.0):
+        super().__init__((host, port), _SmtpHandler)
+        self.connect_delay = connect_delay
+        self.request_delay = request_delay
+        self.counters = SinkCounters()
+
+
+class _SmsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def setup(self):
+        super().setup()
+        self.server.counters.add(connections=1)
+        if self.server.connect_delay:
+            time.sleep(self.server.connect_delay)
+
+    def do_POST(self):
+        server = self.server
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if server.request_delay:
+            time.sleep(server.request_delay)
+
+        results = []
+        for item in payload.get("messages", []):
+            if str(item.get("to", "")).endswith(REJECT_NUMBER_SUFFIX):
+                results.append({"reference": item.get("reference"), "error": "Invalid destination number"})
+            else:
+                results.append({"reference": item.get("reference"), "id": f"sms-{item.get('reference')}"})
+        rejected = sum(1 for result in results if "error" in result)
+        server.counters.add(requests=1, messages=len(results) - rejected, rejected=rejected)
+
+        body = json.dumps({"results": results}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SmsSink(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=SMS_SINK_PORT, connect_delay=0.0, request_delay=0.0):
+        super().__init__((host, port), _SmsHandler)
+        self.connect_delay = connect_delay
+        self.request_delay = request_delay
+        self.counters = SinkCounters()
+
+
+def start(sink):
+    """Serve a sink from a daemon thread; returns it (port 0 picks a free port, see sink.server_address)"""
+    threading.Thread(target=sink.serve_forever, name=type(sink).__name__, daemon=True).start()
+    return sink
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    smtp_sink = start(SmtpSink(host="0.0.0.0"))
+    sms_sink = start(SmsSink(host="0.0.0.0"))
+    logger.info(f"📭 SMTP sink on :{SMTP_SINK_PORT}, SMS sink on :{SMS_SINK_PORT}")
+    try:
+        while True:
+            time.sleep(30)
+            logger.info(f"📊 SMTP {smtp_sink.counters.snapshot()}, SMS {sms_sink.counters.snapshot()}")
+    except KeyboardInterrupt:
+        smtp_sink.shutdown()
+        sms_sink.shutdown()
@@ -0,0 +1,89 @@
+"""
+Print EXPLAIN plans for the hot endpoint queries in leads.py / dealers.py
+Use after create_indexes to confirm the planner picks the new indexes
+instead of sequential scans.
+
+Run with: python -m app.explain_queries [dealer_id]
+"""
+
+import sys
+from sqlalchemy import select, desc, text, true, func
+
+from app.database import SessionLocal
+from app.models import Lead, CarListing, DealerProfile, Message, Offer, LeadSource, LeadStatus
+
+
+def endpoint_queries(dealer_id, lead_id, listing_id):
+    """Statements equivalent to what each endpoint sends to Postgres"""
+    latest_message = (
+        select(Message.subject, Message.body, Message.sent)
+        .where(Message.lead_id == Lead.id)
+        .order_by(desc(Message.created_at))
+        .limit(1)
+        .lateral("latest_message")
+    )
+    inbox = (
+        select(Lead, CarListing, latest_message.c.subject)
+        .join(CarListing, Lead.listing_id == CarListing.id)
+        .outerjoin(latest_message, true())
+        .where(Lead.dealer_id == dealer_id)
+        .order_by(desc(Lead.created_at), desc(Lead.id))
+        .limit(51)
+    )
+
+    return {
+        "GET /api/leads/": inbox,
+        "GET /api/leads/?status=new": inbox.where(Lead.status == LeadStatus.NEW),
+        "GET /api/leads/?source=marketplace": inbox.where(CarListing.source != LeadSource.HOT_LEAD),
+        "GET /api/leads/{id} (lead)": select(Lead).where(Lead.id == lead_id, Lead.dealer_id == dealer_id),
+        "GET /api/leads/{id} (messages)": (
+            select(Message).where(Message.lead_id == lead_id).order_by(Message.created_at)
+        ),
+        "POST /api/leads/{id}/generate-message (draft lookup)": select(Message).where(
+            Message.lead_id == lead_id,
+            Message.message_type == "initial_contact",
+            Message.sent == False
+        ),
+        "POST /api/leads/webhook/lead_received (dealers)": select(DealerProfile).where(
+            DealerProfile.verification_status == "verified"
+        ),
+        "Offers for lead": select(Offer).where(Offer.lead_id == lead_id),
+        "Leads for listing": select(func.count()).select_from(Lead).where(Lead.listing_id == listing_id),
+    }
+
+
+def explain_all(dealer_id=None):
+    """Print the plan of every endpoint query and flag sequential scans"""
+    db = SessionLocal()
+    try:
+        if dealer_id is None:
+            dealer_id = db.query(DealerProfile.id).order_by(DealerProfile.id).limit(1).scalar() or 1
+        lead = db.query(Lead.id, Lead.listing_id).filter(Lead.dealer_id == dealer_id).first()
+        lead_id, listing_id = lead if lead else (1, 1)
+
+        print(f"📊 Explaining endpoint queries for dealer {dealer_id}, lead {lead_id}")
+        seq_scans = 0
+        for name, statement in endpoint_queries(dealer_id, lead_id, listing_id).items():
+            compiled = statement.compile(dialect=db.bind.dialect, compile_kwargs={"literal_binds": True})
+            plan = [row[0] for row in db.execute(text(f"EXPLAIN {compiled}"))]
+
+            print()
+            print("=" * 70)
+            print(name)
+            print("=" * 70)
+            for line in plan:
+                print(line)
+                if "Seq Scan" in line:
+                    seq_scans += 1
+
+        print()
+        if seq_scans:
+            print(f"⚠️  {seq_scans} sequential scan(s) found (expected on small or unanalyzed tables)")
+        else:
+            print("✅ No sequential scans")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    explain_all(int(sys.argv[1]) if len(sys.argv) > 1 else None)
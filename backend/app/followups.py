@@ -0,0 +1,286 @@
+"""
+Follow-up scheduler: send follow-ups to contacted leads when due
+The first message a dealer sends schedules the lead's first follow-up
+(Lead.next_followup_at, Lead.followup_stage = index into
+FOLLOWUP_SCHEDULE). Scheduler workers drain due leads in batches.
+
+- Due leads are claimed with SELECT ... FOR UPDATE SKIP LOCKED on the
+  partial ix_leads_next_followup_at index, so any number of workers can
+  run concurrently without queueing a follow-up twice
+- A batch loads its listings, dealers and messages in one query each,
+  renders the follow-ups per template, stores them as sent Messages and
+  queues them in the delivery outbox (app.delivery.outbox) in the same
+  transaction, so a follow-up is delivered exactly when its lead advances
+- Leads the seller replied to, leads no longer contacted / following up
+  and dealers with auto follow-up off are unscheduled; a stage that already
+  has a message of its type (a dealer's draft, or sent) gets no second one; stages whose
+  DealerProfile.followup_day_N flag is off are skipped, and a lead that
+  fell several stages behind only gets the latest one
+- A crashed worker simply rolls back, leaving its leads due
+
+Run workers with: python -m app.followups
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func, or_, select, update
+
+from app.database import SessionLocal
+from app.models import CarListing, DealerProfile, Lead, LeadStatus, Message, User
+from app.ai_provider.mock_provider import FOLLOWUP_SCHEDULE
+from app.ai_provider.templates import message_templates
+from app.delivery.outbox import enqueue as enqueue_delivery
+from app import metrics
+
+logger = logging.getLogger(__name__)
+lag_timer = metrics.tracker("followup_lag")
+tick_timer = metrics.tracker("followup_tick")
+
+FOLLOWUP_WORKERS = int(os.getenv("FOLLOWUP_WORKERS", "2"))
+FOLLOWUP_BATCH_SIZE = int(os.getenv("FOLLOWUP_BATCH_SIZE", "500"))
+FOLLOWUP_POLL_SECONDS = float(os.getenv("FOLLOWUP_POLL_SECONDS", "5"))
+
+# Leads still waiting on the seller; anything else is no longer followed up
+ELIGIBLE_STATUSES = (LeadStatus.CONTACTED, LeadStatus.FOLLOW_UP)
+FOLLOWUP_TYPES = tuple(message_type for _, message_type in FOLLOWUP_SCHEDULE)
+
+
+def next_stage(dealer, first_contact_at, after=-1):
+    """(stage, due) of the first follow-up after stage `after` the dealer has enabled
+
+    Returns (len(FOLLOWUP_SCHEDULE), None) once nothing is left to schedule.
+    """
+    if dealer.auto_followup_enabled is not False and first_contact_at is not None:
+        for stage in range(after + 1, len(FOLLOWUP_SCHEDULE)):
+            days, _ = FOLLOWUP_SCHEDULE[stage]
+            if getattr(dealer, f"followup_day_{days}", None) is not False:
+                return stage, first_contact_at + timedelta(days=days)
+    return len(FOLLOWUP_SCHEDULE), None
+
+
+def process_due(db, batch_size=FOLLOWUP_BATCH_SIZE):
+    """Claim up to batch_size due leads, queue their follow-ups for delivery; returns the number claimed"""
+    started = time.perf_counter()
+    now = datetime.utcnow()
+
+    leads = db.execute(
+        select(
+            Lead.id,
+            Lead.dealer_id,
+            Lead.listing_id,
+            Lead.status,
+            Lead.followup_stage,
+            Lead.first_contact_at,
+            Lead.next_followup_at,
+            Lead.ai_offer_fair,
+            Lead.dealer_offer_amount
+        ).where(
+            Lead.next_followup_at <= now
+        ).order_by(Lead.next_followup_at).limit(batch_size).with_for_update(skip_locked=True)
+    ).all()
+    if not leads:
+        return 0
+
+    lead_ids = [lead.id for lead in leads]
+    listings = {
+        row.id: row for row in db.execute(
+            select(
+                CarListing.id,
+                CarListing.year,
+                CarListing.make,
+                CarListing.model,
+                CarListing.mileage,
+                CarListing.seller_name,
+                CarListing.seller_email,
+                CarListing.seller_phone
+            ).where(CarListing.id.in_({lead.listing_id for lead in leads}))
+        )
+    }
+    dealers = {
+        dealer.id: (dealer, f"{first_name} {last_name}")
+        for dealer, first_name, last_name in db.execute(
+            select(DealerProfile, User.first_name, User.last_name)
+            .join(User, User.id == DealerProfile.user_id)
+            .where(DealerProfile.id.in_({lead.dealer_id for lead in leads}))
+        )
+    }
+
+    replied = set()
+    existing = set()  # (lead id, message type) of unsent drafts and follow-ups already sent
+    for lead_id, message_type, seller_replied in db.execute(
+        select(Message.lead_id, Message.message_type, Message.seller_replied).where(
+            Message.lead_id.in_(lead_ids),
+            or_(
+                Message.seller_replied == True,
+                Message.sent == False,
+                Message.message_type.in_(FOLLOWUP_TYPES)
+            )
+        )
+    ):
+        if seller_replied:
+            replied.add(lead_id)
+        existing.add((lead_id, message_type))
+
+    updates = []
+    pending = defaultdict(list)  # (dealer id, message type) -> leads to draft
+    for lead in leads:
+        dealer, dealer_name = dealers.get(lead.dealer_id, (None, None))
+        stage = lead.followup_stage or 0
+        if (
+            dealer is None
+            or lead.id in replied
+            or lead.status not in ELIGIBLE_STATUSES
+            or stage >= len(FOLLOWUP_SCHEDULE)
+            or lead.listing_id not in listings
+        ):
+            updates.append({"id": lead.id, "next_followup_at": None})
+            continue
+
+        lag_timer.observe((now - lead.next_followup_at).total_seconds())
+        following, due = next_stage(dealer, lead.first_contact_at, after=stage)
+        # Catching up after downtime: only the latest overdue follow-up goes out
+        while due is not None and due <= now:
+            stage = following
+            following, due = next_stage(dealer, lead.first_contact_at, after=stage)
+
+        update_values = {
+            "id": lead.id,
+            "followup_stage": following,
+            "next_followup_at": due,
+            "status": LeadStatus.FOLLOW_UP
+        }
+        message_type = FOLLOWUP_SCHEDULE[stage][1]
+        if (lead.id, message_type) not in existing:
+            pending[(dealer.id, message_type)].append(lead)
+            update_values["last_contact_at"] = now
+        updates.append(update_values)
+
+    messages = []  # (Message, listing row)
+    for (dealer_id, message_type), batch in pending.items():
+        dealer, dealer_name = dealers[dealer_id]
+        rendered = message_templates.render_many(
+            [{
+                "listing": {
+                    "year": listings[lead.listing_id].year,
+                    "make": listings[lead.listing_id].make,
+                    "model": listings[lead.listing_id].model,
+                    "mileage": listings[lead.listing_id].mileage
+                },
+                "seller_name": listings[lead.listing_id].seller_name or "there",
+                "offer": {
+                    "amount": lead.ai_offer_fair or lead.dealer_offer_amount
+                },
+                "dealer_name": dealer_name,
+                "dealership_name": dealer.company_name,
+                "dealer_phone": dealer.phone or ""
+            } for lead in batch],
+            message_type,
+            dealer_id=dealer_id
+        )
+        messages.extend((
+            Message(
+                lead_id=lead.id,
+                dealer_id=dealer_id,
+                message_type=message_type,
+                subject=message["subject"],
+                body=message["body"],
+                generated_by_ai=True,
+                channel="email",
+                sent=True,
+                sent_at=now
+            ),
+            listings[lead.listing_id]
+        ) for lead, message in zip(batch, rendered))
+
+    if messages:
+        # One batched INSERT ... RETURNING for the ids the outbox rows point at
+        db.add_all(message for message, _ in messages)
+        db.flush()
+        queued = sum(enqueue_delivery(db, message, listing) is not None for message, listing in messages)
+    else:
+        queued = 0
+    db.execute(update(Lead), updates)
+    db.commit()
+
+    elapsed = time.perf_counter() - started
+    tick_timer.observe(elapsed)
+    logger.info(
+        f"📬 Follow-up tick: {len(leads)} due, {queued} queued for delivery, "
+        f"{len(messages) - queued} without a seller address "
+        f"in {elapsed:.3f}s ({len(leads) / elapsed:.0f} leads/s)"
+    )
+    return len(leads)
+
+
+def followup_stats(db, window_seconds=300):
+    """Fleet-wide backlog and lag from the leads table, plus this process's tick timings"""
+    now = datetime.utcnow()
+
+    scheduled, due, oldest = db.query(
+        func.count(Lead.id),
+        func.count(Lead.id).filter(Lead.next_followup_at <= now),
+        func.min(Lead.next_followup_at)
+    ).filter(Lead.next_followup_at.isnot(None)).one()
+
+    queued = db.query(func.count(Message.id)).filter(
+        Message.message_type.in_(FOLLOWUP_TYPES),
+        Message.delivery_status.in_(("queued", "delivered")),
+        Message.created_at >= now - timedelta(seconds=window_seconds)
+    ).scalar()
+
+    return {
+        "scheduled": scheduled,
+        "due": due,
+        "oldest_due_lag_seconds": round((now - oldest).total_seconds(), 1) if oldest and oldest <= now else 0,
+        "queued_last_window": queued,
+        "queue_rate_per_second": round(queued / window_seconds, 2),
+        "window_seconds": window_seconds,
+        "lag": lag_timer.snapshot(),
+        "tick": tick_timer.snapshot()
+    }
+
+
+def _worker_loop(stop):
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            claimed = process_due(db)
+        except Exception as e:
+            logger.error(f"❌ Follow-up worker error: {e}", exc_info=True)
+            db.rollback()
+            claimed = 0
+        finally:
+            db.close()
+        if claimed < FOLLOWUP_BATCH_SIZE:
+            stop.wait(FOLLOWUP_POLL_SECONDS)
+
+
+def run_workers(count=FOLLOWUP_WORKERS):
+    """Run count scheduler threads until interrupted"""
+    message_templates.start_sync()
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_worker_loop, args=(stop,), name=f"followup-{i}", daemon=True)
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info(f"🚀 {count} follow-up workers scheduling from leads.next_followup_at")
+
+    try:
+        while True:
+            time.sleep(60)
+            logger.info(f"📊 Follow-up lag: {lag_timer.snapshot()}, tick: {tick_timer.snapshot()}")
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_workers()
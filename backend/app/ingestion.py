@@ -0,0 +1,581 @@
+"""
+Listing ingestion: turn webhook payloads into listings and dealer leads
+The lead_received webhook only validates and enqueues a payload in
+ingestion_jobs; worker processes drain the queue in batches.
+
+- Jobs are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so any number
+  of workers can drain concurrently without double processing
+- Each job runs in its own savepoint; a failure is retried with
+  exponential backoff and parked as "dead" after INGESTION_MAX_ATTEMPTS
+- A crashed worker simply rolls back, leaving its jobs pending
+
+The bulk webhook streams NDJSON/CSV rows straight into chunked
+set-based inserts instead (see bulk_ingest). Both paths upsert: a
+repost or re-delivery updates the listing it duplicates and fans out
+no new leads (see app.matching.dedup).
+
+Run workers with: python -m app.ingestion
+"""
+
+import csv
+import json
+import logging
+import os
+import random
+import re
+import threading
+import time
+from datetime import datetime, timedelta
+from pydantic import ValidationError
+from sqlalchemy import func, insert, literal_column, text, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from starlette.concurrency import run_in_threadpool
+
+from app.database import SessionLocal
+from app.models import CarListing, Lead, LeadSource, LeadStatus, IngestionJob
+from app.schemas import LeadWebhookPayload
+from app.ai_provider.mock_provider import MockAIProvider
+from app.ai_provider.valuation_cache import valuation_cache, valuation_key
+from app.matching import dedup
+from app.matching.comps import comps_index
+from app.matching.filter_index import filter_index
+from app import metrics
+
+logger = logging.getLogger(__name__)
+ai_provider = MockAIProvider()
+ingest_timer = metrics.tracker("lead_ingest")
+
+INGESTION_WORKERS = int(os.getenv("INGESTION_WORKERS", "4"))
+INGESTION_BATCH_SIZE = int(os.getenv("INGESTION_BATCH_SIZE", "50"))
+INGESTION_POLL_SECONDS = float(os.getenv("INGESTION_POLL_SECONDS", "1"))
+INGESTION_MAX_ATTEMPTS = int(os.getenv("INGESTION_MAX_ATTEMPTS", "5"))
+BULK_CHUNK_SIZE = int(os.getenv("BULK_CHUNK_SIZE", "1000"))
+BACKOFF_BASE_SECONDS = 2
+BACKOFF_MAX_SECONDS = 600
+
+# Webhook string fields that feeds send as JSON numbers
+STRING_FIELDS = (
+    "zip_code", "external_id", "seller_contact_phone", "vin", "title", "make", "model", "trim",
+    "color", "region", "condition", "city", "state"
+)
+# Kept as first seen when a duplicate listing is folded into an existing row
+IDENTITY_FIELDS = ("source", "external_listing_id", "fingerprint")
+# True for a row the INSERT created, false for one ON CONFLICT updated
+_INSERTED = literal_column("xmax = 0")
+
+
+def validate_payload(payload):
+    """Raise ValueError unless the payload can become a CarListing"""
+    missing = [key for key in ("year", "make", "model", "mileage") if payload.get(key) in (None, "")]
+    if missing:
+        raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    for key in ("year", "mileage"):
+        try:
+            int(payload[key])
+        except (TypeError, ValueError):
+            raise ValueError(f"{key} must be an integer")
+
+
+def listing_source(payload):
+    """Marketplace name in the payload -> LeadSource, anything unknown is a hot lead"""
+    marketplace = (payload.get("marketplace") or "").upper()
+    return LeadSource[marketplace] if marketplace in LeadSource.__members__ else LeadSource.HOT_LEAD
+
+
+def listing_values(payload):
+    """CarListing column values for a webhook payload"""
+    values = {
+        "title": payload.get("title", f"{payload['year']} {payload['make']} {payload['model']}"),
+        "year": int(payload["year"]),
+        "make": payload["make"],
+        "model": payload["model"],
+        "trim": payload.get("trim"),
+        "mileage": int(payload["mileage"]),
+        "condition": payload.get("condition", "good"),
+        "vin": dedup.normalize_vin(payload.get("vin")),
+        "color": payload.get("color"),
+        "transmission": payload.get("transmission"),
+        "fuel_type": payload.get("fuel_type"),
+        "asking_price": payload.get("price") or payload.get("asking_price"),
+        "region": payload.get("region"),
+        "city": payload.get("city"),
+        "state": payload.get("state"),
+        "zip_code": payload.get("zip_code"),
+        "source": listing_source(payload),
+        "external_listing_id": payload.get("external_id"),
+        "external_url": payload.get("url"),
+        "seller_name": payload.get("seller_contact_name"),
+        "seller_email": payload.get("seller_contact_email"),
+        "seller_phone": payload.get("seller_contact_phone"),
+        "description": payload.get("description"),
+        "photos": payload.get("photos") or []
+    }
+    values["fingerprint"] = dedup.fingerprint(
+        values["make"], values["model"], values["year"], values["mileage"], values["seller_phone"]
+    )
+    return values
+
+
+def listing_from_payload(payload):
+    return CarListing(**listing_values(payload))
+
+
+def _price(listing, condition):
+    return ai_provider.price_offer(
+        listing.year, listing.mileage, condition,
+        comps=comps_index.nearest(listing.make, listing.model, listing.year, listing.mileage)
+    )
+
+
+def estimate_listing(listing):
+    """AI estimate priced against the listing's nearest in-memory comps, through the valuation cache"""
+    condition = listing.condition or "good"
+    region = listing.region or "normal"
+    offer = valuation_cache.get_or_compute(
+        valuation_key(listing.year, listing.make, listing.model, listing.mileage, condition, region),
+        lambda: _price(listing, condition)
+    )
+    return ai_provider.explain_offer(listing.year, listing.make, listing.model, listing.mileage, condition, offer)
+
+
+def draft_estimate(listing):
+    """Draft offer for a webhook submitter: the cached valuation, else priced from the comps already in memory
+
+    Never refreshes the comps index or queries the database, and never
+    fills the valuation cache, since this process's comps may be
+    incomplete; the ingestion worker prices the lead itself.
+    """
+    condition = listing.condition or "good"
+    region = listing.region or "normal"
+    offer = valuation_cache.get(
+        valuation_key(listing.year, listing.make, listing.model, listing.mileage, condition, region)
+    )
+    if offer is None:
+        offer = _price(listing, condition)
+    return ai_provider.explain_offer(listing.year, listing.make, listing.model, listing.mileage, condition, offer)
+
+
+def _update_values(listing_id, values):
+    """ORM bulk UPDATE parameters refreshing an existing listing from a duplicate"""
+    fields = {
+        key: value for key, value in values.items()
+        if key not in IDENTITY_FIELDS and value not in (None, [])
+    }
+    return {**fields, "id": listing_id, "updated_at": datetime.utcnow()}
+
+
+def upsert_listings(db, rows):
+    """Insert new listings and fold duplicates into the rows they repeat
+
+    rows are listing_values dicts; returns (listing_id, inserted) per row.
+    """
+    existing = dedup.find_duplicates(db, rows)
+
+    # Repeats within the batch collapse onto their first occurrence
+    first_seen, repeats, new = {}, {}, []
+    for i, values in enumerate(rows):
+        if existing[i] is not None:
+            continue
+        keys = dedup.batch_keys(values)
+        earlier = next((first_seen[key] for key in keys if key in first_seen), None)
+        if earlier is not None:
+            repeats[i] = earlier
+            continue
+        for key in keys:
+            first_seen[key] = i
+        new.append(i)
+
+    results = [None] * len(rows)
+    if new:
+        # ON CONFLICT covers a concurrent worker inserting the same
+        # (source, external_listing_id) between the lookup and this INSERT
+        stmt = pg_insert(CarListing)
+        table = CarListing.__table__
+        refreshed = {
+            key: func.coalesce(stmt.excluded[key], table.c[key])
+            for key in rows[new[0]] if key not in IDENTITY_FIELDS
+        }
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[CarListing.source, CarListing.external_listing_id],
+            index_where=CarListing.external_listing_id.isnot(None),
+            set_={**refreshed, "updated_at": datetime.utcnow()}
+        ).returning(CarListing.id, _INSERTED, sort_by_parameter_order=True)
+        inserted_rows = db.execute(stmt, [rows[i] for i in new]).all()
+        for i, (listing_id, inserted) in zip(new, inserted_rows):
+            results[i] = (listing_id, bool(inserted))
+
+    updates = []
+    for i, listing_id in enumerate(existing):
+        if listing_id is not None:
+            results[i] = (listing_id, False)
+            updates.append(_update_values(listing_id, rows[i]))
+    for i, earlier in repeats.items():
+        results[i] = (results[earlier][0], False)
+        updates.append(_update_values(results[i][0], rows[i]))
+    if updates:
+        db.execute(update(CarListing), updates)
+
+    for values, (listing_id, _) in zip(rows, results):
+        if values.get("fingerprint"):
+            dedup.remember(db, values["fingerprint"], listing_id)
+
+    return results
+
+
+def ingest_listing(db, payload):
+    """Upsert the listing and fan out leads to matching dealers; the caller commits
+
+    A duplicate of an existing listing updates it and fans out no new leads.
+    """
+    [(listing_id, inserted)] = upsert_listings(db, [listing_values(payload)])
+    listing = db.get(CarListing, listing_id, populate_existing=True)
+
+    # Generate AI estimate once, shared by every dealer's lead
+    comps_index.refresh()
+    ai_estimate = estimate_listing(listing)
+    if not inserted:
+        return listing, ai_estimate, []
+    comps_index.add_after_commit(db, listing)
+
+    # Find matching dealers from the in-memory filter index
+    filter_index.refresh(db)
+    dealer_ids = filter_index.match(listing)
+
+    # Fan out as one multi-row INSERT ... RETURNING id instead of a flush per dealer
+    lead_ids = []
+    if dealer_ids:
+        lead_ids = db.scalars(
+            insert(Lead).returning(Lead.id),
+            lead_rows(listing.id, ai_estimate, dealer_ids)
+        ).all()
+
+    return listing, ai_estimate, lead_ids
+
+
+def lead_rows(listing_id, ai_estimate, dealer_ids):
+    """Lead insert parameters for one listing, one row per dealer"""
+    lead_fields = {
+        "listing_id": listing_id,
+        "status": LeadStatus.NEW,
+        "ai_estimated_value": ai_estimate.get("fair"),
+        "ai_offer_low": ai_estimate.get("low"),
+        "ai_offer_fair": ai_estimate.get("fair"),
+        "ai_offer_high": ai_estimate.get("max"),
+        "ai_rationale": ai_estimate.get("rationale", "")
+    }
+    return [{**lead_fields, "dealer_id": dealer_id} for dealer_id in dealer_ids]
+
+
+def ingest_listings(db, payloads):
+    """Set-based ingest_listing for a chunk; returns (listing_id, inserted) per payload"""
+    values = [listing_values(payload) for payload in payloads]
+    results = upsert_listings(db, values)
+
+    filter_index.refresh(db)
+    comps_index.refresh()
+    leads = []
+    for (listing_id, inserted), listing_fields in zip(results, values):
+        if not inserted:
+            continue
+        # Transient object: gives the estimator and matcher attribute access
+        listing = CarListing(id=listing_id, **listing_fields)
+        leads.extend(lead_rows(listing_id, estimate_listing(listing), filter_index.match(listing)))
+        comps_index.add_after_commit(db, listing)
+
+    if leads:
+        db.execute(insert(Lead), leads)
+
+    return results
+
+
+async def _lines(stream):
+    """Decoded lines from an async byte stream, without buffering the whole body"""
+    buffer = b""
+    async for chunk in stream:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8")
+    if buffer:
+        yield buffer.decode("utf-8")
+
+
+def _coerce(record):
+    """Normalize field types the feeds get wrong: numbers for string fields, CSV photo lists
+
+    ZIPs that arrive as numbers lost their leading zeros and are padded back.
+    """
+    if not isinstance(record, dict):
+        return record
+    for key in STRING_FIELDS:
+        value = record.get(key)
+        if isinstance(value, bool) or not isinstance(value, (int, float)):
+            continue
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        record[key] = f"{value:05d}" if key == "zip_code" and isinstance(value, int) else str(value)
+    photos = record.get("photos")
+    if isinstance(photos, str):
+        photos = photos.strip()
+        if photos.startswith("["):
+            try:
+                photos = json.loads(photos)
+            except json.JSONDecodeError:
+                pass
+        if isinstance(photos, str):
+            photos = [url.strip() for url in re.split(r"[|,\s]+", photos) if url.strip()]
+        record["photos"] = photos
+    return record
+
+
+async def _records(stream, is_csv):
+    """(row number, dict) per NDJSON line or CSV record; unparsable rows yield an exception"""
+    row = 0
+    header = None
+    pending = None
+    async for line in _lines(stream):
+        if not is_csv:
+            line = line.strip()
+            if not line:
+                continue
+            row += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError as e:
+                yield row, ValueError(f"Invalid JSON: {e}")
+                continue
+            yield row, _coerce(record)
+            continue
+
+        # A quoted CSV field may span lines - wait for balanced quotes
+        pending = line if pending is None else f"{pending}\n{line}"
+        if pending.count('"') % 2:
+            continue
+        record, pending = pending.rstrip("\r"), None
+        if not record.strip():
+            continue
+        values = next(csv.reader([record]))
+        if header is None:
+            header = [h.strip() for h in values]
+            continue
+        row += 1
+        yield row, _coerce({key: value or None for key, value in zip(header, values)})
+
+
+def _validate_row(record):
+    """(payload, None) for a valid row, (None, [errors]) otherwise"""
+    if isinstance(record, Exception):
+        return None, [str(record)]
+    if not isinstance(record, dict):
+        return None, ["Row must be an object"]
+    try:
+        validated = LeadWebhookPayload.model_validate(record)
+    except ValidationError as e:
+        return None, [f"{'.'.join(map(str, err['loc']))}: {err['msg']}" for err in e.errors()]
+    return {**record, **validated.model_dump(exclude_none=True)}, None
+
+
+def _result_line(row, status, **fields):
+    return json.dumps({"row": row, "status": status, **fields}) + "\n"
+
+
+def _outcome_lines(outcomes, counts):
+    """NDJSON result lines for committed (row, (listing_id, inserted) or error message) pairs"""
+    lines = []
+    for row, outcome in outcomes:
+        if isinstance(outcome, str):
+            counts["failed"] += 1
+            lines.append(_result_line(row, "error", errors=[outcome]))
+            continue
+        listing_id, inserted = outcome
+        counts["inserted" if inserted else "duplicates"] += 1
+        lines.append(_result_line(row, "ok" if inserted else "duplicate", listing_id=listing_id))
+    return "".join(lines)
+
+
+def _flush_rows(db, chunk, counts):
+    """Insert a chunk one row per savepoint, so only the rows that fail are rejected"""
+    outcomes = []
+    for row, payload in chunk:
+        try:
+            with db.begin_nested():
+                [result] = ingest_listings(db, [payload])
+            outcomes.append((row, result))
+        except Exception as e:
+            outcomes.append((row, str(e)))
+    try:
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ Bulk chunk failed to commit: {e}")
+        outcomes = [(row, str(e)) for row, _ in chunk]
+    return _outcome_lines(outcomes, counts)
+
+
+def _flush_chunk(db, chunk, counts):
+    """Insert one chunk of validated rows; returns its NDJSON result lines
+
+    The whole chunk goes in set-based; when that fails it is retried row
+    by row, so one bad row does not reject the rest.
+    """
+    try:
+        results = ingest_listings(db, [payload for _, payload in chunk])
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        logger.warning(f"⚠️  Bulk chunk of {len(chunk)} rows failed, retrying row by row: {e}")
+        return _flush_rows(db, chunk, counts)
+    return _outcome_lines([(row, result) for (row, _), result in zip(chunk, results)], counts)
+
+
+async def bulk_ingest(stream, is_csv, chunk_size=BULK_CHUNK_SIZE):
+    """Validate and ingest a streamed NDJSON/CSV body, yielding one NDJSON result per row"""
+    started = time.perf_counter()
+    counts = {"rows": 0, "inserted": 0, "duplicates": 0, "failed": 0}
+    chunk = []
+    db = SessionLocal()
+    try:
+        async for row, record in _records(stream, is_csv):
+            counts["rows"] += 1
+            payload, errors = _validate_row(record)
+            if errors:
+                counts["failed"] += 1
+                yield _result_line(row, "error", errors=errors)
+                continue
+
+            chunk.append((row, payload))
+            if len(chunk) >= chunk_size:
+                yield await run_in_threadpool(_flush_chunk, db, chunk, counts)
+                chunk = []
+
+        if chunk:
+            yield await run_in_threadpool(_flush_chunk, db, chunk, counts)
+    finally:
+        db.close()
+
+    elapsed = time.perf_counter() - started
+    yield json.dumps({"summary": {
+        **counts,
+        "seconds": round(elapsed, 3),
+        "rows_per_second": round(counts["rows"] / elapsed, 1) if elapsed else None
+    }}) + "\n"
+
+
+def enqueue(db, payload):
+    """Persist a validated payload for the workers; the caller commits"""
+    job = IngestionJob(payload=payload)
+    db.add(job)
+    db.flush()
+    return job
+
+
+def backoff_seconds(attempts):
+    """Exponential backoff with +/-20% jitter so retries of a burst spread out"""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** attempts)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def process_batch(db, batch_size=INGESTION_BATCH_SIZE):
+    """Claim and ingest up to batch_size due jobs; returns the number claimed"""
+    jobs = db.query(IngestionJob).filter(
+        IngestionJob.status == "pending",
+        IngestionJob.next_attempt_at <= datetime.utcnow()
+    ).order_by(IngestionJob.next_attempt_at).limit(batch_size).with_for_update(skip_locked=True).all()
+
+    for job in jobs:
+        started = time.perf_counter()
+        try:
+            with db.begin_nested():
+                listing, ai_estimate, lead_ids = ingest_listing(db, job.payload)
+            job.status = "done"
+            job.listing_id = listing.id
+            job.last_error = None
+            ingest_timer.observe(time.perf_counter() - started)
+        except Exception as e:
+            job.attempts += 1
+            job.last_error = str(e)[:2000]
+            if job.attempts >= INGESTION_MAX_ATTEMPTS:
+                job.status = "dead"
+                logger.error(f"❌ Ingestion job {job.id} dead after {job.attempts} attempts: {e}")
+            else:
+                job.next_attempt_at = datetime.utcnow() + timedelta(seconds=backoff_seconds(job.attempts))
+                logger.warning(f"⚠️  Ingestion job {job.id} failed (attempt {job.attempts}): {e}")
+        job.processed_at = datetime.utcnow()
+
+    db.commit()
+    return len(jobs)
+
+
+def queue_stats(db, window_seconds=300):
+    """Fleet-wide queue depth, drain rate and ingestion latency from the jobs table"""
+    now = datetime.utcnow()
+    since = now - timedelta(seconds=window_seconds)
+
+    depth, due, oldest = db.query(
+        func.count(IngestionJob.id),
+        func.count(IngestionJob.id).filter(IngestionJob.next_attempt_at <= now),
+        func.min(IngestionJob.created_at)
+    ).filter(IngestionJob.status == "pending").one()
+
+    dead = db.query(func.count(IngestionJob.id)).filter(IngestionJob.status == "dead").scalar()
+
+    drained, p50, p99 = db.execute(text("""
+        SELECT count(*),
+               percentile_cont(0.5) WITHIN GROUP (ORDER BY extract(epoch FROM processed_at - created_at)),
+               percentile_cont(0.99) WITHIN GROUP (ORDER BY extract(epoch FROM processed_at - created_at))
+        FROM ingestion_jobs
+        WHERE status = 'done' AND processed_at >= :since
+    """), {"since": since}).one()
+
+    return {
+        "pending": depth,
+        "due": due,
+        "dead": dead,
+        "oldest_pending_age_seconds": round((now - oldest).total_seconds(), 1) if oldest else None,
+        "drained_last_window": drained,
+        "drain_rate_per_second": round(drained / window_seconds, 2),
+        "latency_p50_seconds": round(p50, 3) if p50 is not None else None,
+        "latency_p99_seconds": round(p99, 3) if p99 is not None else None,
+        "window_seconds": window_seconds
+    }
+
+
+def _worker_loop(stop):
+    while not stop.is_set():
+        db = SessionLocal()
+        try:
+            claimed = process_batch(db)
+        except Exception as e:
+            logger.error(f"❌ Ingestion worker error: {e}", exc_info=True)
+            db.rollback()
+            claimed = 0
+        finally:
+            db.close()
+        if claimed < INGESTION_BATCH_SIZE:
+            stop.wait(INGESTION_POLL_SECONDS)
+
+
+def run_workers(count=INGESTION_WORKERS):
+    """Run count draining threads until interrupted"""
+    stop = threading.Event()
+    threads = [
+        threading.Thread(target=_worker_loop, args=(stop,), name=f"ingest-{i}", daemon=True)
+        for i in range(count)
+    ]
+    for thread in threads:
+        thread.start()
+    logger.info(f"🚀 {count} ingestion workers draining ingestion_jobs")
+
+    try:
+        while True:
+            time.sleep(60)
+            logger.info(f"📊 Ingest latency: {ingest_timer.snapshot()}")
+    except KeyboardInterrupt:
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    run_workers()
@@ -2,14 +2,19 @@ from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
 import logging
-from sqlalchemy import text, inspect
+import os
 
 # CRITICAL: Import models BEFORE importing routers and database
 from app.models import Base, User, DealerProfile, SellerProfile, CarListing, Lead, Offer, Message
-from app.database import engine, SessionLocal, init_db
+from app.migrations import check_schema, migrate
+from app import metrics
+from app.ai_provider.templates import message_templates
+from app.ai_provider.valuation_cache import valuation_cache
+from app.catalog import catalog
+from app.database import async_engine, engine, pool_stats
 
 # Import routers AFTER models
-from app.auth import router as auth_router
+from app.auth import router as auth_router, principal_cache
 from app.api.leads import router as leads_router
 from app.api.offers import router as offers_router
 from app.api.messages import router as messages_router
@@ -19,20 +24,8 @@ from app.api.car_database import router as car_database_router
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Create ALL database tables
-logger.info("Creating database tables...")
-try:
-    # This will now work because all models are imported above
-    Base.metadata.create_all(bind=engine)
-    logger.info("✅ Database tables created successfully!")
-    
-    # Verify tables exist
-    inspector = inspect(engine)
-    tables = inspector.get_table_names()
-    logger.info(f"📋 Available tables: {tables}")
-    
-except Exception as e:
-    logger.error(f"❌ Database error: {e}")
+# Let a booting worker apply pending migrations itself (dev / docker-compose)
+MIGRATE_ON_STARTUP = os.getenv("MIGRATE_ON_STARTUP", "true").lower() == "true"
 
 app = FastAPI(
     title="RevoMotors - Used Car AI Platform", 
@@ -80,135 +73,52 @@ def root():
 def health():
     return {"status": "healthy", "database": "connected"}
 
+@app.get("/metrics")
+def get_metrics():
+    """Per-worker latency percentiles and cache counters"""
+    return {
+        "latency": metrics.snapshot(),
+        "valuation_cache": valuation_cache.stats(),
+        "principal_cache": principal_cache.stats(),
+        "car_catalog": catalog.snapshot.stats() if catalog.snapshot else None,
+        "db_pools": pool_stats()
+    }
+
+@app.get("/metrics/db")
+def get_db_metrics():
+    """This worker's connection pools: in use, idle, overflow, timeouts and checkout waits"""
+    return pool_stats()
+
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Initializing PostgreSQL database...")
+    # Up-to-date schema costs one SELECT; migrations normally run at deploy
+    # time (python -m app.migrations), the advisory lock keeps this safe
+    # when several workers boot at once
+    logger.info("Checking database schema version...")
     try:
-        init_db()
-        logger.info("✅ Car database initialized!")
+        if not check_schema() and MIGRATE_ON_STARTUP:
+            migrate()
     except Exception as e:
-        logger.warning(f"Car database already initialized: {e}")
+        logger.error(f"❌ Database error: {e}")
     
-    # Add missing columns to all tables
-    logger.info("Verifying database columns...")
-    db = None
-    try:
-        db = SessionLocal()
-        
-        # Add missing columns to dealer_profiles table
-        logger.info("Adding dealer_profiles columns...")
-        db.execute(text("""
-            ALTER TABLE dealer_profiles 
-            ADD COLUMN IF NOT EXISTS license_number VARCHAR(100),
-            ADD COLUMN IF NOT EXISTS phone VARCHAR(50),
-            ADD COLUMN IF NOT EXISTS address TEXT,
-            ADD COLUMN IF NOT EXISTS city VARCHAR(100),
-            ADD COLUMN IF NOT EXISTS state VARCHAR(50),
-            ADD COLUMN IF NOT EXISTS zip_code VARCHAR(20),
-            ADD COLUMN IF NOT EXISTS website VARCHAR(255),
-            ADD COLUMN IF NOT EXISTS verification_status VARCHAR(50) DEFAULT 'pending',
-            ADD COLUMN IF NOT EXISTS auto_followup_enabled BOOLEAN DEFAULT true,
-            ADD COLUMN IF NOT EXISTS followup_day_1 BOOLEAN DEFAULT true,
-            ADD COLUMN IF NOT EXISTS followup_day_3 BOOLEAN DEFAULT true,
-            ADD COLUMN IF NOT EXISTS followup_day_7 BOOLEAN DEFAULT true
-        """))
-        db.commit()
-        
-        # Add missing columns to seller_profiles table
-        logger.info("Adding seller_profiles columns...")
-        db.execute(text("""
-            ALTER TABLE seller_profiles 
-            ADD COLUMN IF NOT EXISTS phone VARCHAR(50)
-        """))
-        db.commit()
-        
-        # Add missing columns to leads table (AI capabilities)
-        logger.info("Adding leads columns...")
-        db.execute(text("""
-            ALTER TABLE leads 
-            ADD COLUMN IF NOT EXISTS ai_estimated_value FLOAT,
-            ADD COLUMN IF NOT EXISTS ai_offer_low FLOAT,
-            ADD COLUMN IF NOT EXISTS ai_offer_fair FLOAT,
-            ADD COLUMN IF NOT EXISTS ai_offer_high FLOAT,
-            ADD COLUMN IF NOT EXISTS ai_rationale TEXT
-        """))
-        db.commit()
-        
-        # Add missing columns to car_listings table
-        logger.info("Adding car_listings columns...")
-        db.execute(text("""
-            ALTER TABLE car_listings 
-            ADD COLUMN IF NOT EXISTS photos JSON,
-            ADD COLUMN IF NOT EXISTS external_url TEXT,
-            ADD COLUMN IF NOT EXISTS external_listing_id VARCHAR(255),
-            ADD COLUMN IF NOT EXISTS description TEXT,
-            ADD COLUMN IF NOT EXISTS seller_phone VARCHAR(50),
-            ADD COLUMN IF NOT EXISTS seller_email VARCHAR(255),
-            ADD COLUMN IF NOT EXISTS seller_name VARCHAR(255),
-            ADD COLUMN IF NOT EXISTS region VARCHAR(100),
-            ADD COLUMN IF NOT EXISTS fuel_type VARCHAR(50),
-            ADD COLUMN IF NOT EXISTS transmission VARCHAR(50),
-            ADD COLUMN IF NOT EXISTS color VARCHAR(50),
-            ADD COLUMN IF NOT EXISTS vin VARCHAR(17),
-            ADD COLUMN IF NOT EXISTS condition VARCHAR(50)
-        """))
-        db.commit()
-        
-        # Add missing columns to messages table
-        logger.info("Adding messages columns...")
-        db.execute(text("""
-            ALTER TABLE messages 
-            ADD COLUMN IF NOT EXISTS channel VARCHAR(50),
-            ADD COLUMN IF NOT EXISTS seller_replied BOOLEAN DEFAULT false,
-            ADD COLUMN IF NOT EXISTS read_by_seller BOOLEAN DEFAULT false,
-            ADD COLUMN IF NOT EXISTS sent_at TIMESTAMP,
-            ADD COLUMN IF NOT EXISTS sent BOOLEAN DEFAULT false,
-            ADD COLUMN IF NOT EXISTS modified_by_dealer BOOLEAN DEFAULT false,
-            ADD COLUMN IF NOT EXISTS generated_by_ai BOOLEAN DEFAULT true
-        """))
-        db.commit()
-        
-        # Add missing columns to offers table
-        logger.info("Adding offers columns...")
-        db.execute(text("""
-            ALTER TABLE offers 
-            ADD COLUMN IF NOT EXISTS status VARCHAR(50) DEFAULT 'pending'
-        """))
-        db.commit()
-        
-        # Add missing columns to dealer_documents table
-        logger.info("Adding dealer_documents columns...")
-        db.execute(text("""
-            ALTER TABLE dealer_documents 
-            ADD COLUMN IF NOT EXISTS uploaded_at TIMESTAMP,
-            ADD COLUMN IF NOT EXISTS verified BOOLEAN DEFAULT false,
-            ADD COLUMN IF NOT EXISTS expires_at DATE,
-            ADD COLUMN IF NOT EXISTS file_url TEXT,
-            ADD COLUMN IF NOT EXISTS document_name VARCHAR(255),
-            ADD COLUMN IF NOT EXISTS document_type VARCHAR(100)
-        """))
-        db.commit()
-        
-        logger.info("✅ All table columns verified!")
-        
-    except Exception as e:
-        logger.warning(f"Column verification error: {e}")
-        if db:
-            db.rollback()
-    finally:
-        if db:
-            db.close()
+    # Already built when gunicorn preloaded the app (app.server.warm_up)
+    if catalog.snapshot is None:
+        try:
+            catalog.reload()
+        except Exception as e:
+            logger.error(f"❌ Car catalog not loaded: {e}")
     
-    # Seed car data
-    try:
-        from app.migrate_data import seed_database
-        seed_database()
-        logger.info("✅ Car database seeded!")
-    except Exception as e:
-        logger.info(f"Car database already seeded or error: {e}")
+    # Per worker: a thread started in the preloaded master would not survive the fork
+    message_templates.start_sync()
     
     logger.info("🚀 RevoMotors API is ready!")
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    # Close pooled connections on graceful restarts instead of letting Postgres time them out
+    await async_engine.dispose()
+    engine.dispose()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
\ No newline at end of file
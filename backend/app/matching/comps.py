@@ -0,0 +1,226 @@
+"""
+Comparable listings (comps) for offer estimates
+Keeps the most recent priced listings per (make, model, year bucket) in
+memory, so a valuation gets its comparables from one dict lookup and a
+scan of at most COMPS_PER_BUCKET entries instead of an aggregate query.
+
+- Ingestion adds each new listing once its transaction commits
+  (add_after_commit), so a rolled-back listing never becomes a comp; all
+  listings of one commit are added, and announced, together
+- Listings committed by other workers and processes are picked up by
+  refresh(), at most once per REFRESH_SECONDS. Its id watermark only
+  moves with rows read from the database, and every refresh re-scans the
+  last REFRESH_OVERLAP_IDS ids, because ids are assigned at INSERT and a
+  lower id can commit after a higher one
+- load() and refresh() read through their own session, so they only see
+  committed listings; a listing is indexed once however it arrives
+- Buckets are bounded; comps older than COMPS_WINDOW_DAYS are skipped
+- listeners are called once per insert / refresh / load with the set of
+  bucket keys that got new comps (None after a full load), e.g. to
+  invalidate cached valuations
+"""
+
+import heapq
+import os
+import threading
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timedelta
+
+from app.database import SessionLocal, after_commit_batch
+from app.models import CarListing
+
+COMPS_WINDOW_DAYS = int(os.getenv("COMPS_WINDOW_DAYS", "90"))
+COMPS_PER_BUCKET = int(os.getenv("COMPS_PER_BUCKET", "200"))
+COMPS_TOP_K = 5
+YEAR_BUCKET = 3
+
+# Nearest-neighbour distance: one model year apart weighs as much as this many miles
+MILES_PER_YEAR = 12000
+
+# Pick up listings inserted by other processes at most this often (seconds)
+REFRESH_SECONDS = 30
+# Ids below the watermark re-read by each refresh, for rows that committed late
+REFRESH_OVERLAP_IDS = int(os.getenv("COMPS_REFRESH_OVERLAP_IDS", "1000"))
+
+Comp = namedtuple("Comp", "listing_id year mileage asking_price created_at")
+
+
+def bucket_key(make, model, year):
+    return str(make).strip().lower(), str(model).strip().lower(), int(year) // YEAR_BUCKET
+
+
+class _Bucket:
+    """Most recent comps of one (make, model, year bucket) with running totals"""
+
+    __slots__ = ("comps", "price_total", "mileage_total")
+
+    def __init__(self):
+        self.comps = deque()
+        self.price_total = 0.0
+        self.mileage_total = 0
+
+    def add(self, comp, limit):
+        self.comps.append(comp)
+        self.price_total += comp.asking_price
+        self.mileage_total += comp.mileage
+        if len(self.comps) > limit:
+            evicted = self.comps.popleft()
+            self.price_total -= evicted.asking_price
+            self.mileage_total -= evicted.mileage
+
+
+class CompsIndex:
+    def __init__(self, per_bucket=COMPS_PER_BUCKET, window_days=COMPS_WINDOW_DAYS):
+        self.per_bucket = per_bucket
+        self.window = timedelta(days=window_days)
+        self.buckets = {}
+        self.lock = threading.Lock()
+        self.seen = set()     # listing ids indexed, down to the refresh overlap
+        self.last_id = 0      # highest id read from the database
+        self.loaded = False
+        self.checked_at = None
+        self.listeners = []
+
+    def _comp(self, listing):
+        """(bucket key, Comp) of a listing, None when it is unpriced"""
+        if not listing.asking_price or listing.mileage is None:
+            return None
+        comp = Comp(
+            listing.id, listing.year, listing.mileage, float(listing.asking_price),
+            listing.created_at or datetime.utcnow()
+        )
+        return bucket_key(listing.make, listing.model, listing.year), comp
+
+    def _insert(self, entries):
+        """Add (key, comp) entries not indexed yet; returns the keys that changed"""
+        changed = set()
+        with self.lock:
+            for key, comp in entries:
+                if comp.listing_id is not None:
+                    if comp.listing_id in self.seen:
+                        continue
+                    self.seen.add(comp.listing_id)
+                bucket = self.buckets.get(key)
+                if bucket is None:
+                    bucket = self.buckets[key] = _Bucket()
+                bucket.add(comp, self.per_bucket)
+                changed.add(key)
+        return changed
+
+    def add(self, listing, notify=True):
+        """Record a committed listing (anything with CarListing's attributes); unpriced ones are skipped"""
+        entry = self._comp(listing)
+        if entry is None:
+            return
+        changed = self._insert([entry])
+        if changed and notify:
+            self._notify(changed)
+
+    def add_after_commit(self, db, listing):
+        """add() once db commits; values are captured now, the ORM object may be expired by then
+
+        Every listing added in one transaction is inserted with one
+        notification for all the keys they changed.
+        """
+        entry = self._comp(listing)
+        if entry is not None:
+            after_commit_batch(db, self._insert_and_notify, entry)
+
+    def _insert_and_notify(self, entries):
+        changed = self._insert(entries)
+        if changed:
+            self._notify(changed)
+
+    def _notify(self, keys):
+        for listener in self.listeners:
+            listener(keys)
+
+    def nearest(self, make, model, year, mileage, k=COMPS_TOP_K):
+        """Up to k comps closest in mileage and year from the listing's bucket"""
+        bucket = self.buckets.get(bucket_key(make, model, year))
+        if bucket is None:
+            return []
+        cutoff = datetime.utcnow() - self.window
+        with self.lock:
+            recent = [comp for comp in bucket.comps if comp.created_at >= cutoff]
+        return heapq.nsmallest(
+            k, recent,
+            key=lambda comp: abs(comp.mileage - mileage) + MILES_PER_YEAR * abs(comp.year - year)
+        )
+
+    def summary(self, make, model, year):
+        """Count and average asking price / mileage of a bucket's retained comps"""
+        bucket = self.buckets.get(bucket_key(make, model, year))
+        if bucket is None or not bucket.comps:
+            return {"count": 0, "avg_price": None, "avg_mileage": None}
+        with self.lock:
+            count = len(bucket.comps)
+            return {
+                "count": count,
+                "avg_price": round(bucket.price_total / count, 2),
+                "avg_mileage": round(bucket.mileage_total / count)
+            }
+
+    def _rows(self, db, *criteria):
+        return db.query(CarListing).filter(CarListing.asking_price.isnot(None), *criteria) \
+            .order_by(CarListing.id).yield_per(5000)
+
+    def load(self):
+        """Full rebuild from the committed listings inside the window"""
+        db = SessionLocal()
+        try:
+            entries, last_id = [], 0
+            for listing in self._rows(db, CarListing.created_at >= datetime.utcnow() - self.window):
+                last_id = listing.id
+                entry = self._comp(listing)
+                if entry is not None:
+                    entries.append(entry)
+        finally:
+            db.close()
+
+        with self.lock:
+            self.buckets = {}
+            self.seen = set()
+        self._insert(entries)
+        self._advance(last_id)
+        self.loaded = True
+        self.checked_at = time.monotonic()
+        self._notify(None)
+
+    def refresh(self, max_age=REFRESH_SECONDS):
+        """Add listings committed since the last sync, at most once per max_age seconds"""
+        now = time.monotonic()
+        if self.checked_at and now - self.checked_at < max_age:
+            return
+        self.checked_at = now
+
+        if not self.loaded:
+            return self.load()
+
+        db = SessionLocal()
+        try:
+            entries, last_id = [], self.last_id
+            for listing in self._rows(db, CarListing.id > self.last_id - REFRESH_OVERLAP_IDS):
+                last_id = max(last_id, listing.id)
+                entry = self._comp(listing)
+                if entry is not None:
+                    entries.append(entry)
+        finally:
+            db.close()
+
+        changed = self._insert(entries)
+        self._advance(last_id)
+        if changed:
+            self._notify(changed)
+
+    def _advance(self, last_id):
+        """Move the watermark; ids below the next overlap window are never re-read, forget them"""
+        floor = last_id - REFRESH_OVERLAP_IDS
+        with self.lock:
+            self.last_id = last_id
+            self.seen = {listing_id for listing_id in self.seen if listing_id > floor}
+
+
+# Process-wide index used by ingestion (and read-only by the lead webhook)
+comps_index = CompsIndex()
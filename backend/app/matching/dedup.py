@@ -0,0 +1,177 @@
+"""
+Listing deduplication
+The same car is reposted across marketplaces and re-delivered by webhook
+retries. An incoming listing duplicates an existing one when any of these
+match, strongest first:
+
+    1. (source, external_listing_id) - unique partial index
+    2. normalized VIN                - ix_car_listings_vin
+    3. fingerprint                   - ix_car_listings_fingerprint, fronted by an in-process LRU
+
+The LRU only learns a fingerprint once the transaction that found or
+inserted its listing commits (remember()), so a rolled-back batch or job
+savepoint never leaves ids of rows that do not exist.
+
+The fingerprint hashes make/model/year, a mileage bucket and the seller's
+phone, so a repost on another marketplace with a rounded mileage still
+collapses onto the original. Duplicates are folded into the existing row
+by app.ingestion.upsert_listings instead of inserting and fanning out again.
+"""
+
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from sqlalchemy import select, tuple_
+
+from app.database import after_commit
+from app.models import CarListing
+
+DEDUP_CACHE_SIZE = int(os.getenv("DEDUP_CACHE_SIZE", "100000"))
+MILEAGE_BUCKET = 5000
+
+# VINs never use I, O or Q
+VIN_PATTERN = re.compile(r"^[A-HJ-NPR-Z0-9]{17}$")
+
+
+def normalize_vin(vin):
+    """' 1hgcm-82633a004352 ' -> '1HGCM82633A004352', None unless it is a well-formed VIN"""
+    if not vin:
+        return None
+    vin = re.sub(r"[^A-Za-z0-9]", "", str(vin)).upper()
+    return vin if VIN_PATTERN.match(vin) else None
+
+
+def normalize_phone(phone):
+    """Last 10 digits of a phone number, None when there are fewer"""
+    if not phone:
+        return None
+    digits = re.sub(r"\D", "", str(phone))
+    return digits[-10:] if len(digits) >= 10 else None
+
+
+def fingerprint(make, model, year, mileage, seller_phone):
+    """Fuzzy identity of a listing, None without a usable seller phone"""
+    phone = normalize_phone(seller_phone)
+    if phone is None or mileage is None:
+        return None
+    key = "|".join((
+        str(make).strip().lower(),
+        str(model).strip().lower(),
+        str(year),
+        str(int(mileage) // MILEAGE_BUCKET),
+        phone
+    ))
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def batch_keys(values):
+    """Every dedup key of a listing, used to collapse repeats within one batch"""
+    keys = []
+    if values.get("external_listing_id"):
+        keys.append(("external", values["source"], values["external_listing_id"]))
+    if values.get("vin"):
+        keys.append(("vin", values["vin"]))
+    if values.get("fingerprint"):
+        keys.append(("fingerprint", values["fingerprint"]))
+    return keys
+
+
+class FingerprintCache:
+    """Bounded LRU of fingerprint -> listing id"""
+
+    def __init__(self, max_size=DEDUP_CACHE_SIZE):
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.entries)
+
+    def get(self, key):
+        with self.lock:
+            listing_id = self.entries.get(key)
+            if listing_id is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return listing_id
+
+    def put(self, key, listing_id):
+        with self.lock:
+            self.entries[key] = listing_id
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def stats(self):
+        return {"size": len(self.entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses}
+
+
+fingerprint_cache = FingerprintCache()
+
+
+def remember(db, key, listing_id):
+    """Cache key -> listing_id once db commits; dropped if its transaction or savepoint rolls back"""
+    after_commit(db, fingerprint_cache.put, key, listing_id)
+
+
+def find_duplicates(db, rows):
+    """Existing listing id (or None) for each listing_values dict, one query per key type"""
+    found = [None] * len(rows)
+
+    external = {}
+    for i, values in enumerate(rows):
+        if values.get("external_listing_id"):
+            external.setdefault((values["source"], values["external_listing_id"]), []).append(i)
+    if external:
+        matches = db.execute(
+            select(CarListing.id, CarListing.source, CarListing.external_listing_id).where(
+                tuple_(CarListing.source, CarListing.external_listing_id).in_(list(external))
+            )
+        )
+        for listing_id, source, external_id in matches:
+            for i in external.get((source, external_id), ()):
+                found[i] = listing_id
+
+    vins = {}
+    for i, values in enumerate(rows):
+        if found[i] is None and values.get("vin"):
+            vins.setdefault(values["vin"], []).append(i)
+    if vins:
+        # Oldest listing wins when a VIN was stored more than once before dedup
+        matches = db.execute(
+            select(CarListing.vin, CarListing.id)
+            .where(CarListing.vin.in_(list(vins)))
+            .order_by(CarListing.id.desc())
+        )
+        for vin, listing_id in matches:
+            for i in vins[vin]:
+                found[i] = listing_id
+
+    fingerprints = {}
+    for i, values in enumerate(rows):
+        key = values.get("fingerprint")
+        if found[i] is not None or not key:
+            continue
+        cached = fingerprint_cache.get(key)
+        if cached is not None:
+            found[i] = cached
+        else:
+            fingerprints.setdefault(key, []).append(i)
+    if fingerprints:
+        matches = db.execute(
+            select(CarListing.fingerprint, CarListing.id)
+            .where(CarListing.fingerprint.in_(list(fingerprints)))
+            .order_by(CarListing.id.desc())
+        )
+        for key, listing_id in matches:
+            remember(db, key, listing_id)
+            for i in fingerprints[key]:
+                found[i] = listing_id
+
+    return found
@@ -0,0 +1,406 @@
+"""
+In-memory index of dealer marketplace filters
+Answers "which dealers want this listing?" without scanning every filter.
+Each filter gets a slot number and every index posting is a Python int
+used as a bitset over slots, so matching a listing is a handful of big-int
+ANDs followed by one pass over the surviving bits.
+
+- makes / models / marketplaces: term -> bitset, plus a wildcard bitset
+  for filters that leave the field empty
+- year / mileage / price bounds: sorted distinct thresholds with
+  cumulative bitsets, looked up with bisect
+- zip_codes / radius_miles: grid-bucketed disks (see zip_index); a
+  listing without a resolvable ZIP only matches filters without ZIP codes,
+  and a filter whose ZIP codes all fail to resolve matches nothing
+
+Verified dealers without any active filter keep receiving every listing,
+as they did before filters were evaluated.
+
+refresh() re-reads every filter whose updated_at is within
+FILTER_REFRESH_LAG_SECONDS behind the newest one seen: updated_at is
+stamped when a row is written, not when it commits, so a transaction that
+commits after a newer stamp would otherwise be skipped for good. Rows
+whose updated_at did not move since they were indexed are not re-indexed.
+"""
+
+import os
+import threading
+import time
+from datetime import timedelta
+from bisect import bisect_left, bisect_right
+from collections import Counter
+from sqlalchemy import func
+
+from app.models import DealerMarketplaceFilter, DealerProfile
+from app.matching.zip_index import RadiusIndex, get_zip_centroids, require_zip_centroids
+
+# Re-read changed filters from the database at most this often (seconds)
+REFRESH_SECONDS = 5
+# How far behind the newest updated_at each refresh re-reads, for filters committed out of order
+REFRESH_LAG = timedelta(seconds=int(os.getenv("FILTER_REFRESH_LAG_SECONDS", "300")))
+
+# Listing source -> DealerMarketplaceFilter toggle. Sources without a
+# toggle (hot leads, CarGurus) are delivered to every filter.
+MARKETPLACE_TOGGLES = {
+    "facebook": "facebook_enabled",
+    "offerup": "offerup_enabled",
+    "craigslist": "craigslist_enabled",
+    "autotrader": "autotrader_enabled",
+    "carscom": "carscom_enabled",
+}
+ALL_SOURCES = ("hot_lead", "facebook", "offerup", "craigslist", "autotrader", "carscom", "cargurus")
+
+
+def _normalize(term):
+    return str(term).strip().lower()
+
+
+def _source_name(source):
+    """LeadSource member or raw string -> lower-case source name"""
+    return _normalize(getattr(source, "value", source) or "hot_lead")
+
+
+def _iter_bits(mask):
+    """Slot numbers of the set bits in mask, lowest first"""
+    bits = bin(mask)[:1:-1]
+    i = bits.find("1")
+    while i != -1:
+        yield i
+        i = bits.find("1", i + 1)
+
+
+class _TermIndex:
+    """Exact-match postings for a list-valued filter field"""
+
+    def __init__(self):
+        self.postings = {}
+        self.wildcard = 0
+
+    def add(self, slot, terms):
+        bit = 1 << slot
+        if terms is None:
+            self.wildcard |= bit
+            return
+        for term in terms:
+            self.postings[term] = self.postings.get(term, 0) | bit
+
+    def remove(self, slot, terms):
+        bit = 1 << slot
+        if terms is None:
+            self.wildcard &= ~bit
+            return
+        for term in terms:
+            mask = self.postings.get(term, 0) & ~bit
+            if mask:
+                self.postings[term] = mask
+            else:
+                self.postings.pop(term, None)
+
+    def match(self, term):
+        return self.wildcard | self.postings.get(term, 0)
+
+
+class _RangeIndex:
+    """One-sided numeric bounds as cumulative bitsets over the sorted distinct thresholds
+
+    For a minimum (is_min=True) masks[i] holds every filter whose bound is
+    <= bounds[i]; for a maximum it holds every filter whose bound is >= bounds[i].
+    """
+
+    def __init__(self, is_min):
+        self.is_min = is_min
+        self.bounds = []
+        self.masks = []
+        self.counts = {}
+        self.unbounded = 0
+
+    def build(self, pairs):
+        """Bulk load from (slot, bound) pairs in one sorted pass"""
+        self.__init__(self.is_min)
+        grouped = {}
+        for slot, bound in pairs:
+            if bound is None:
+                self.unbounded |= 1 << slot
+                continue
+            grouped[bound] = grouped.get(bound, 0) | (1 << slot)
+            self.counts[bound] = self.counts.get(bound, 0) + 1
+
+        self.bounds = sorted(grouped)
+        running = 0
+        masks = []
+        for bound in (self.bounds if self.is_min else reversed(self.bounds)):
+            running |= grouped[bound]
+            masks.append(running)
+        self.masks = masks if self.is_min else masks[::-1]
+
+    def add(self, slot, bound):
+        bit = 1 << slot
+        if bound is None:
+            self.unbounded |= bit
+            return
+
+        i = bisect_left(self.bounds, bound)
+        if not self.counts.get(bound):
+            # New threshold starts from the filters already passing at that point
+            if self.is_min:
+                inherited = self.masks[i - 1] if i > 0 else 0
+            else:
+                inherited = self.masks[i] if i < len(self.masks) else 0
+            self.bounds.insert(i, bound)
+            self.masks.insert(i, inherited)
+        self.counts[bound] = self.counts.get(bound, 0) + 1
+
+        for j in (range(i, len(self.masks)) if self.is_min else range(i + 1)):
+            self.masks[j] |= bit
+
+    def remove(self, slot, bound):
+        bit = 1 << slot
+        if bound is None:
+            self.unbounded &= ~bit
+            return
+
+        i = bisect_left(self.bounds, bound)
+        for j in (range(i, len(self.masks)) if self.is_min else range(i + 1)):
+            self.masks[j] &= ~bit
+
+        self.counts[bound] -= 1
+        if not self.counts[bound]:
+            del self.counts[bound]
+            del self.bounds[i]
+            del self.masks[i]
+
+    def match(self, value):
+        if value is None:
+            return -1  # all bits: a missing value never excludes a filter
+        if self.is_min:
+            i = bisect_right(self.bounds, value) - 1
+            return self.unbounded | (self.masks[i] if i >= 0 else 0)
+        i = bisect_left(self.bounds, value)
+        return self.unbounded | (self.masks[i] if i < len(self.masks) else 0)
+
+
+def _filter_centers(zip_codes):
+    """Centroids of a filter's ZIP codes; None (no restriction) only when it has none
+
+    Ignoring the restriction would send the dealer leads from anywhere, so
+    a filter whose ZIP codes all fail to resolve gets no centers and
+    matches nothing, and a missing centroid table raises ZipCentroidsMissing.
+    """
+    if not zip_codes:
+        return None
+    centroids = require_zip_centroids()
+    return [c for c in (centroids.lookup(z) for z in zip_codes) if c is not None]
+
+
+def _listing_point(listing):
+    """Centroid of the listing's ZIP code; None matches only filters without a ZIP restriction"""
+    centroids = get_zip_centroids()
+    if centroids is None:
+        return None
+    return centroids.lookup(getattr(listing, "zip_code", None))
+
+
+def _filter_spec(f):
+    """Index terms and bounds of one DealerMarketplaceFilter (or any object with its attributes)"""
+    makes = {_normalize(m) for m in f.makes} if f.makes else None
+    models = {_normalize(m) for m in f.models} if f.models else None
+    sources = {
+        s for s in ALL_SOURCES
+        if s not in MARKETPLACE_TOGGLES or getattr(f, MARKETPLACE_TOGGLES[s])
+    }
+    return {
+        "dealer_id": f.dealer_id,
+        "makes": makes,
+        "models": models,
+        "sources": sources,
+        "year_min": f.year_min,
+        "year_max": f.year_max,
+        "mileage_max": f.mileage_max,
+        "price_min": f.price_min,
+        "price_max": f.price_max,
+        "centers": _filter_centers(getattr(f, "zip_codes", None)),
+        "radius_miles": getattr(f, "radius_miles", None),
+    }
+
+
+class FilterIndex:
+    """Bitset index over all active dealer marketplace filters"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.loaded = False
+        self.synced_at = None      # newest updated_at read from the database
+        self.versions = {}         # filter id -> updated_at it was indexed at
+        self.checked_at = 0.0
+        self.verified_dealers = frozenset()
+        self._reset()
+
+    def _reset(self):
+        self.slots = {}            # filter id -> slot
+        self.specs = {}            # slot -> filter spec
+        self.slot_dealers = []     # slot -> dealer id
+        self.free_slots = []
+        self.live = 0
+        self.dealer_filters = Counter()
+        self.makes = _TermIndex()
+        self.models = _TermIndex()
+        self.sources = _TermIndex()
+        self.year_min = _RangeIndex(is_min=True)
+        self.year_max = _RangeIndex(is_min=False)
+        self.mileage_max = _RangeIndex(is_min=False)
+        self.price_min = _RangeIndex(is_min=True)
+        self.price_max = _RangeIndex(is_min=False)
+        self.geo = RadiusIndex()
+        self._unfiltered = None
+
+    def _ranges(self):
+        return (
+            (self.year_min, "year_min"),
+            (self.year_max, "year_max"),
+            (self.mileage_max, "mileage_max"),
+            (self.price_min, "price_min"),
+            (self.price_max, "price_max"),
+        )
+
+    def _claim_slot(self, filter_id, spec):
+        slot = self.free_slots.pop() if self.free_slots else len(self.slot_dealers)
+        if slot == len(self.slot_dealers):
+            self.slot_dealers.append(spec["dealer_id"])
+        else:
+            self.slot_dealers[slot] = spec["dealer_id"]
+        self.slots[filter_id] = slot
+        self.specs[slot] = spec
+        self.live |= 1 << slot
+        self.dealer_filters[spec["dealer_id"]] += 1
+        self._unfiltered = None
+
+        self.makes.add(slot, spec["makes"])
+        self.models.add(slot, spec["models"])
+        self.sources.add(slot, spec["sources"])
+        self.geo.add(slot, spec["centers"], spec["radius_miles"])
+        return slot
+
+    def upsert(self, f):
+        """Add or replace one filter; inactive filters are dropped from the index"""
+        with self.lock:
+            self.remove(f.id)
+            if not f.is_active:
+                return
+            spec = _filter_spec(f)
+            slot = self._claim_slot(f.id, spec)
+            for index, field in self._ranges():
+                index.add(slot, spec[field])
+
+    def remove(self, filter_id):
+        with self.lock:
+            slot = self.slots.pop(filter_id, None)
+            if slot is None:
+                return
+            spec = self.specs.pop(slot)
+            self.live &= ~(1 << slot)
+            self.free_slots.append(slot)
+            self.dealer_filters[spec["dealer_id"]] -= 1
+            if not self.dealer_filters[spec["dealer_id"]]:
+                del self.dealer_filters[spec["dealer_id"]]
+            self._unfiltered = None
+
+            self.makes.remove(slot, spec["makes"])
+            self.models.remove(slot, spec["models"])
+            self.sources.remove(slot, spec["sources"])
+            self.geo.remove(slot)
+            for index, field in self._ranges():
+                index.remove(slot, spec[field])
+
+    def rebuild(self, filters, verified_dealers):
+        """Replace the whole index from an iterable of filters"""
+        with self.lock:
+            self._reset()
+            self.verified_dealers = frozenset(verified_dealers)
+            for f in filters:
+                if f.is_active:
+                    self._claim_slot(f.id, _filter_spec(f))
+            for index, field in self._ranges():
+                index.build((slot, spec[field]) for slot, spec in self.specs.items())
+
+    def set_verified_dealers(self, dealer_ids):
+        with self.lock:
+            dealer_ids = frozenset(dealer_ids)
+            if dealer_ids != self.verified_dealers:
+                self.verified_dealers = dealer_ids
+                self._unfiltered = None
+
+    def match(self, listing):
+        """Dealer ids whose filters accept the listing"""
+        with self.lock:
+            mask = (
+                self.live
+                & self.sources.match(_source_name(listing.source))
+                & self.makes.match(_normalize(listing.make))
+                & self.models.match(_normalize(listing.model))
+            )
+            if mask:
+                mask &= self.year_min.match(listing.year) & self.year_max.match(listing.year)
+            if mask:
+                mask &= self.mileage_max.match(listing.mileage)
+            if mask:
+                mask &= self.price_min.match(listing.asking_price) & self.price_max.match(listing.asking_price)
+            if mask:
+                mask &= self.geo.match(_listing_point(listing))
+
+            slot_dealers = self.slot_dealers
+            dealers = {slot_dealers[slot] for slot in _iter_bits(mask)}
+
+            if self._unfiltered is None:
+                self._unfiltered = self.verified_dealers - self.dealer_filters.keys()
+            return (dealers & self.verified_dealers) | self._unfiltered
+
+    def load(self, db):
+        """Full rebuild from the database"""
+        filters = db.query(DealerMarketplaceFilter).filter(
+            DealerMarketplaceFilter.is_active == True
+        ).all()
+        self.rebuild(filters, self._verified_dealer_ids(db))
+        self.versions = {f.id: f.updated_at for f in filters}
+        self.synced_at = max((f.updated_at for f in filters if f.updated_at), default=None)
+        self.loaded = True
+        self.checked_at = time.monotonic()
+
+    def refresh(self, db, max_age=REFRESH_SECONDS):
+        """Apply filter changes made since the last sync, at most once per max_age seconds"""
+        now = time.monotonic()
+        if self.checked_at and now - self.checked_at < max_age:
+            return
+        self.checked_at = now
+
+        if not self.loaded:
+            return self.load(db)
+
+        if self.synced_at is None:
+            since = DealerMarketplaceFilter.updated_at.isnot(None)
+        else:
+            since = DealerMarketplaceFilter.updated_at >= self.synced_at - REFRESH_LAG
+        for f in db.query(DealerMarketplaceFilter).filter(since):
+            if f.id in self.versions and self.versions[f.id] == f.updated_at:
+                continue
+            self.upsert(f)
+            self.versions[f.id] = f.updated_at
+            if self.synced_at is None or f.updated_at > self.synced_at:
+                self.synced_at = f.updated_at
+
+        self.set_verified_dealers(self._verified_dealer_ids(db))
+
+        # Hard-deleted rows leave no updated_at trail - fall back to a rebuild
+        active = db.query(func.count(DealerMarketplaceFilter.id)).filter(
+            DealerMarketplaceFilter.is_active == True
+        ).scalar()
+        if active != len(self.slots):
+            self.load(db)
+
+    def _verified_dealer_ids(self, db):
+        return [row.id for row in db.query(DealerProfile.id).filter(
+            DealerProfile.verification_status == "verified"
+        )]
+
+
+# Process-wide index used by the lead webhook
+filter_index = FilterIndex()
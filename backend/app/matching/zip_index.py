@@ -0,0 +1,244 @@
+"""
+ZIP centroid table and radius index for dealer filter zip_codes / radius_miles
+
+The centroid table is a compact binary file read through mmap, so every
+gunicorn worker shares the same page-cache copy. app/data/zip_centroids.bin
+ships with the code (42,724 US ZIPs, built from the MIT-licensed zipcodes
+1.2.0 package data); ZIP_CENTROIDS_PATH points elsewhere:
+
+    b"ZIPC" | uint32 count | int32 zips[count] | float32 lats[count] | float32 lons[count]
+
+zips are sorted, lookups are a bisect over the mapped array. Rebuild it from
+the public-domain Census ZCTA gazetteer (or any zip,lat,lon CSV):
+
+    python -m app.matching.zip_index build 2023_Gaz_zcta_national.txt
+
+Without a table, dealer filters that restrict ZIP codes cannot be applied;
+indexing one raises ZipCentroidsMissing instead of matching every listing.
+
+Dealer radius disks are bucketed on a lat/lon grid; a listing only tests
+the disks registered in its own cell, so a lookup costs one cell scan no
+matter how many filters exist.
+"""
+
+import csv
+import logging
+import math
+import mmap
+import os
+import struct
+import sys
+from bisect import bisect_left
+
+logger = logging.getLogger(__name__)
+
+ZIP_CENTROIDS_PATH = os.getenv(
+    "ZIP_CENTROIDS_PATH",
+    os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "zip_centroids.bin")
+)
+
+MAGIC = b"ZIPC"
+HEADER = struct.Struct("<4sI")
+EARTH_RADIUS_MILES = 3958.8
+MILES_PER_DEGREE = 69.0
+
+# Grid cell size and the largest radius we honour (bounds cells per disk)
+CELL_DEGREES = 0.5
+MAX_RADIUS_MILES = 500
+DEFAULT_RADIUS_MILES = 50
+
+
+def zip_key(zip_code):
+    """'94103-1234' / ' 02134' / 2134 -> 94103 / 2134 / 2134, None when not a US ZIP
+
+    ZIPs stored as numbers lose their leading zeros (02134 -> 2134, 00501 ->
+    501), so numeric input and 3-4 digit strings are zero-padded.
+    """
+    if zip_code is None or isinstance(zip_code, bool):
+        return None
+    if isinstance(zip_code, float) and zip_code.is_integer():
+        zip_code = int(zip_code)
+    if isinstance(zip_code, int):
+        return zip_code if 0 < zip_code < 100000 else None
+    digits = str(zip_code).strip().split("-")[0]
+    if not digits.isdigit():
+        return None
+    if len(digits) in (3, 4):
+        digits = digits.zfill(5)
+    elif len(digits) == 9:
+        digits = digits[:5]    # ZIP+4 without the dash
+    return int(digits) if len(digits) == 5 else None
+
+
+def haversine_miles(lat1, lon1, lat2, lon2):
+    lat1, lon1, lat2, lon2 = map(math.radians, (lat1, lon1, lat2, lon2))
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_MILES * math.asin(math.sqrt(a))
+
+
+class ZipCentroids:
+    """Read-only, memory-mapped ZIP -> (lat, lon) table"""
+
+    def __init__(self, path):
+        self.file = open(path, "rb")
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, count = HEADER.unpack_from(self.map, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a ZIP centroid file")
+
+        view = memoryview(self.map)
+        start = HEADER.size
+        self.zips = view[start:start + 4 * count].cast("i")
+        self.lats = view[start + 4 * count:start + 8 * count].cast("f")
+        self.lons = view[start + 8 * count:start + 12 * count].cast("f")
+
+    def __len__(self):
+        return len(self.zips)
+
+    def lookup(self, zip_code):
+        """(lat, lon) of a ZIP centroid or None"""
+        key = zip_key(zip_code)
+        if key is None:
+            return None
+        i = bisect_left(self.zips, key)
+        if i < len(self.zips) and self.zips[i] == key:
+            return self.lats[i], self.lons[i]
+        return None
+
+
+class ZipCentroidsMissing(RuntimeError):
+    """A dealer filter restricts ZIP codes but no centroid table is loaded"""
+
+
+_centroids = None
+_centroids_loaded = False
+
+
+def get_zip_centroids():
+    """Process-wide centroid table, None when the file is missing"""
+    global _centroids, _centroids_loaded
+    if not _centroids_loaded:
+        _centroids_loaded = True
+        if os.path.exists(ZIP_CENTROIDS_PATH):
+            _centroids = ZipCentroids(ZIP_CENTROIDS_PATH)
+            logger.info(f"📍 Loaded {len(_centroids):,} ZIP centroids")
+        else:
+            logger.error(f"❌ {ZIP_CENTROIDS_PATH} not found - dealer filters with ZIP codes cannot be matched")
+    return _centroids
+
+
+def require_zip_centroids():
+    """The centroid table, ZipCentroidsMissing when it is not there"""
+    centroids = get_zip_centroids()
+    if centroids is None:
+        raise ZipCentroidsMissing(
+            f"ZIP centroid table {ZIP_CENTROIDS_PATH} not found; build it with "
+            f"python -m app.matching.zip_index build <gazetteer>"
+        )
+    return centroids
+
+
+def _cell(lat, lon):
+    return int(math.floor(lat / CELL_DEGREES)), int(math.floor(lon / CELL_DEGREES))
+
+
+class RadiusIndex:
+    """Dealer filter disks (centers + radius) bucketed by grid cell, results as slot bitsets"""
+
+    def __init__(self):
+        self.cells = {}        # (lat cell, lon cell) -> list of disk entries
+        self.slot_cells = {}   # slot -> cells it was registered in
+        self.wildcard = 0
+
+    def add(self, slot, centers, radius_miles):
+        """centers=None registers a filter without a geographic restriction; [] one matching nothing"""
+        if centers is None:
+            self.wildcard |= 1 << slot
+            return
+
+        if radius_miles is None:
+            radius_miles = DEFAULT_RADIUS_MILES
+        radius = min(radius_miles, MAX_RADIUS_MILES)
+        # Angular radius and the haversine term it corresponds to, so the
+        # lookup compares hav(distance) without the asin/sqrt per disk
+        angle = radius / EARTH_RADIUS_MILES
+        threshold = math.sin(angle / 2) ** 2
+        bit = 1 << slot
+        touched = set()
+        for lat, lon in centers:
+            entry = (bit, math.radians(lat), math.radians(lon), math.cos(math.radians(lat)), angle, threshold)
+            dlat = radius / MILES_PER_DEGREE
+            dlon = radius / (MILES_PER_DEGREE * max(math.cos(math.radians(lat)), 0.01))
+            lat_lo, lon_lo = _cell(lat - dlat, lon - dlon)
+            lat_hi, lon_hi = _cell(lat + dlat, lon + dlon)
+            for i in range(lat_lo, lat_hi + 1):
+                for j in range(lon_lo, lon_hi + 1):
+                    self.cells.setdefault((i, j), []).append(entry)
+                    touched.add((i, j))
+        self.slot_cells[slot] = touched
+
+    def remove(self, slot):
+        self.wildcard &= ~(1 << slot)
+        for cell in self.slot_cells.pop(slot, ()):
+            entries = [e for e in self.cells[cell] if e[0] != 1 << slot]
+            if entries:
+                self.cells[cell] = entries
+            else:
+                del self.cells[cell]
+
+    def match(self, point):
+        """Bitset of slots whose disks cover point; a missing point only matches unrestricted slots"""
+        mask = self.wildcard
+        if point is None:
+            return mask
+        lat, lon = point
+        cell = self.cells.get(_cell(lat, lon))
+        if not cell:
+            return mask
+
+        lat, lon = math.radians(lat), math.radians(lon)
+        cos_lat = math.cos(lat)
+        sin = math.sin
+        for bit, center_lat, center_lon, center_cos, angle, threshold in cell:
+            dlat = center_lat - lat
+            if dlat > angle or -dlat > angle or mask & bit:
+                continue
+            if sin(dlat / 2) ** 2 + cos_lat * center_cos * sin((center_lon - lon) / 2) ** 2 <= threshold:
+                mask |= bit
+        return mask
+
+
+def build(source_path, output_path=ZIP_CENTROIDS_PATH):
+    """Convert a Census ZCTA gazetteer (tab separated) or zip,lat,lon CSV into the binary table"""
+    with open(source_path, newline="", encoding="utf-8") as f:
+        sample = f.readline()
+        f.seek(0)
+        reader = csv.reader(f, delimiter="\t" if "\t" in sample else ",")
+        header = [h.strip().upper() for h in next(reader)]
+        if "GEOID" in header:
+            zip_col, lat_col, lon_col = header.index("GEOID"), header.index("INTPTLAT"), header.index("INTPTLONG")
+        else:
+            zip_col, lat_col, lon_col = header.index("ZIP"), header.index("LAT"), header.index("LON")
+
+        rows = {}
+        for row in reader:
+            key = zip_key(row[zip_col])
+            if key is not None:
+                rows[key] = (float(row[lat_col]), float(row[lon_col]))
+
+    zips = sorted(rows)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "wb") as out:
+        out.write(HEADER.pack(MAGIC, len(zips)))
+        out.write(struct.pack(f"<{len(zips)}i", *zips))
+        out.write(struct.pack(f"<{len(zips)}f", *(rows[z][0] for z in zips)))
+        out.write(struct.pack(f"<{len(zips)}f", *(rows[z][1] for z in zips)))
+
+    print(f"✅ Wrote {len(zips):,} ZIP centroids to {output_path}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] != "build":
+        print("Usage: python -m app.matching.zip_index build <gazetteer.txt|zips.csv> [output.bin]")
+        sys.exit(1)
+    build(*sys.argv[2:4])
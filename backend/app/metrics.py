@@ -0,0 +1,72 @@
+"""
+Lightweight in-process metrics
+Latency trackers keep a rolling window of recent samples and report
+percentiles. Values are per worker process; scrape every worker (or
+aggregate in the load balancer logs) for fleet-wide numbers.
+"""
+
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class LatencyTracker:
+    """Rolling window of recent durations with percentile summaries"""
+
+    def __init__(self, name, window=2048):
+        self.name = name
+        self.samples = deque(maxlen=window)
+        self.count = 0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.samples.append(seconds)
+            self.count += 1
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def snapshot(self):
+        with self.lock:
+            samples = sorted(self.samples)
+            count = self.count
+
+        if not samples:
+            return {"count": count, "p50_ms": None, "p95_ms": None, "p99_ms": None, "max_ms": None}
+
+        def percentile(p):
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 3)
+
+        return {
+            "count": count,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99),
+            "max_ms": round(samples[-1] * 1000, 3)
+        }
+
+
+_trackers = {}
+_trackers_lock = threading.Lock()
+
+
+def tracker(name):
+    """Get or create the latency tracker registered under name"""
+    with _trackers_lock:
+        if name not in _trackers:
+            _trackers[name] = LatencyTracker(name)
+        return _trackers[name]
+
+
+def snapshot():
+    """Percentile summary of every registered tracker"""
+    with _trackers_lock:
+        trackers = list(_trackers.values())
+    return {t.name: t.snapshot() for t in trackers}
@@ -2,10 +2,46 @@
 Migration script: Load comprehensive car data into PostgreSQL database
 Includes ALL major car makes and models available in the market
 Run this once to populate the database
+
+Seeding is set-based: rows are streamed in batches of SEED_BATCH_SIZE and
+upserted with INSERT ... ON CONFLICT (makes, models, trims, body types,
+transmissions, fuel types and the model association rows). Ids already
+seen stay in memory, so a batch only sends the names it has not met yet.
+Re-running a load is idempotent and model year ranges only ever widen.
+
+A catalog file is CSV (header row) or NDJSON, one row per line with
+make, model and optionally year_min, year_max (or year), trim, body_type,
+transmission, fuel_type; a .json file may also be one array of such rows.
+
+Run with: python -m app.migrate_data [catalog.csv|.ndjson|.json] [--replace]
 """
 
-from sqlalchemy import text
-from app.database import SessionLocal, init_db, Make, Model, Trim, BodyType, Transmission, FuelType
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from sqlalchemy import func, select, text, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from app.database import (
+    SessionLocal, init_db, Make, Model, Trim, BodyType, Transmission, FuelType,
+    model_trims, model_body_types, model_transmissions, model_fuel_types
+)
+
+SEED_BATCH_SIZE = int(os.getenv("CATALOG_SEED_BATCH_SIZE", "5000"))
+DEFAULT_YEAR_MIN = 1990
+DEFAULT_YEAR_MAX = 2026
+
+# row field -> (name table, association table, association column)
+DIMENSIONS = {
+    "trim": (Trim.__table__, model_trims, "trim_id"),
+    "body_type": (BodyType.__table__, model_body_types, "body_type_id"),
+    "transmission": (Transmission.__table__, model_transmissions, "transmission_id"),
+    "fuel_type": (FuelType.__table__, model_fuel_types, "fuel_type_id"),
+}
 
 # COMPREHENSIVE car database with ALL major makes and models (42 makes)
 CAR_DATABASE = {
@@ -63,60 +99,168 @@ CAR_DATABASE = {
 }
 
 
-def seed_database(force=False):
-    """Populate database with comprehensive car data"""
-    db = SessionLocal()
-    
+def _clean(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def _year(value):
+    value = _clean(value)
+    return int(float(value)) if value else None
+
+
+def normalize_row(record):
+    """Catalog row from a CSV / JSON record; None when make or model is missing or a year is not a number"""
+    make, model = _clean(record.get("make")), _clean(record.get("model"))
+    if not make or not model:
+        return None
     try:
-        # Check if data already exists
-        existing_count = db.query(Make).count()
-        if existing_count > 0 and not force:
-            print("Database already populated. Skipping seed.")
+        year_min = _year(record.get("year_min", record.get("year")))
+        year_max = _year(record.get("year_max", record.get("year")))
+    except (ValueError, OverflowError):
+        # "n/a", "nan", "inf" ... would otherwise abort the load mid-file
+        return None
+    return {
+        "make": make,
+        "model": model,
+        "year_min": year_min or year_max or DEFAULT_YEAR_MIN,
+        "year_max": year_max or year_min or DEFAULT_YEAR_MAX,
+        **{field: _clean(record.get(field)) for field in DIMENSIONS}
+    }
+
+
+def read_catalog(path):
+    """Stream raw records from a CSV, NDJSON or JSON array catalog file"""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.lower().endswith(".csv"):
+            yield from csv.DictReader(f)
             return
-        
-        print("Starting comprehensive database seed...")
-        total_makes = len(CAR_DATABASE)
-        total_models = sum(len(models) for models in CAR_DATABASE.values())
-        
-        print(f"📊 Total makes: {total_makes}")
-        print(f"📊 Total models: {total_models}")
-        print()
-        
-        for make_name, model_names in CAR_DATABASE.items():
-            print(f"✏️  Adding {make_name}... ({len(model_names)} models)")
-            
-            # Create or get make
-            make = db.query(Make).filter(Make.name == make_name).first()
-            if not make:
-                make = Make(name=make_name)
-                db.add(make)
-                db.flush()
-            
-            # Add models for this make
-            for model_name in model_names:
-                existing_model = db.query(Model).filter(
-                    Model.name == model_name,
-                    Model.make_id == make.id
-                ).first()
-                
-                if not existing_model:
-                    model = Model(
-                        name=model_name,
-                        make_id=make.id,
-                        year_min=1990,
-                        year_max=2026
-                    )
-                    db.add(model)
-        
-        db.commit()
-        print()
-        print("=" * 50)
-        print("✅ Database seed completed successfully!")
-        print("=" * 50)
-        print(f"✓ {total_makes} car makes added")
-        print(f"✓ {total_models} car models added")
-        print()
-        
+        first = f.read(1)
+        while first and first.isspace():
+            first = f.read(1)
+        if first == "[":
+            # A JSON document has to be parsed whole; NDJSON streams
+            yield from json.loads(first + f.read())
+            return
+        if first:
+            yield json.loads(first + f.readline())
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def catalog_rows(catalog=CAR_DATABASE):
+    """Rows for the built-in make -> models mapping"""
+    for make, models in catalog.items():
+        for model in models:
+            yield {"make": make, "model": model, "year_min": DEFAULT_YEAR_MIN, "year_max": DEFAULT_YEAR_MAX}
+
+
+class CatalogLoader:
+    """Upserts streamed catalog rows batch by batch; call load(), the caller owns the session"""
+
+    def __init__(self, db, batch_size=SEED_BATCH_SIZE):
+        self.db = db
+        self.batch_size = batch_size
+        self.insert = sqlite_insert if db.bind.dialect.name == "sqlite" else pg_insert
+        self.make_ids = {}
+        self.model_ids = {}                                  # (make id, name) -> id
+        self.name_ids = {field: {} for field in DIMENSIONS}  # field -> name -> id
+        self.links = {field: set() for field in DIMENSIONS}  # (model id, name id) already sent
+        self.counts = {"rows": 0, "skipped": 0, "batches": 0, "links": 0}
+
+    def _ids(self, table, names, known):
+        """Insert the names not seen yet (ON CONFLICT DO NOTHING) and fetch their ids"""
+        new = [name for name in names if name not in known]
+        if not new:
+            return
+        self.db.execute(self.insert(table).on_conflict_do_nothing(index_elements=["name"]), [{"name": n} for n in new])
+        known.update(self.db.execute(select(table.c.name, table.c.id).where(table.c.name.in_(new))).all())
+
+    def _models(self, years):
+        """Upsert (make id, name) -> (year_min, year_max); an existing model's range only widens"""
+        table = Model.__table__
+        least, greatest = (func.min, func.max) if self.db.bind.dialect.name == "sqlite" else (func.least, func.greatest)
+        stmt = self.insert(table)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["make_id", "name"],
+            set_={
+                "year_min": least(func.coalesce(table.c.year_min, stmt.excluded.year_min), stmt.excluded.year_min),
+                "year_max": greatest(func.coalesce(table.c.year_max, stmt.excluded.year_max), stmt.excluded.year_max),
+            }
+        )
+        self.db.execute(stmt, [
+            {"make_id": make_id, "name": name, "year_min": low, "year_max": high}
+            for (make_id, name), (low, high) in years.items()
+        ])
+        new = [key for key in years if key not in self.model_ids]
+        if new:
+            self.model_ids.update(
+                ((make_id, name), model_id) for model_id, make_id, name in self.db.execute(
+                    select(table.c.id, table.c.make_id, table.c.name)
+                    .where(tuple_(table.c.make_id, table.c.name).in_(new))
+                )
+            )
+
+    def _flush(self, rows):
+        self._ids(Make.__table__, {row["make"] for row in rows}, self.make_ids)
+        for field, (table, _, _) in DIMENSIONS.items():
+            self._ids(table, {row[field] for row in rows if row[field]}, self.name_ids[field])
+
+        years = {}
+        for row in rows:
+            key = (self.make_ids[row["make"]], row["model"])
+            low, high = years.get(key, (row["year_min"], row["year_max"]))
+            years[key] = (min(low, row["year_min"]), max(high, row["year_max"]))
+        self._models(years)
+
+        for field, (_, association, column) in DIMENSIONS.items():
+            pairs = {
+                (self.model_ids[(self.make_ids[row["make"]], row["model"])], self.name_ids[field][row[field]])
+                for row in rows if row[field]
+            } - self.links[field]
+            if pairs:
+                self.db.execute(
+                    self.insert(association).on_conflict_do_nothing(),
+                    [{"model_id": model_id, column: name_id} for model_id, name_id in pairs]
+                )
+                self.links[field] |= pairs
+                self.counts["links"] += len(pairs)
+
+    def load(self, records):
+        """Upsert every record, committing per batch; returns counts and rows/sec"""
+        started = time.perf_counter()
+        records = iter(records)
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            rows = [row for row in map(normalize_row, batch) if row]
+            self.counts["rows"] += len(batch)
+            self.counts["skipped"] += len(batch) - len(rows)
+            if rows:
+                self._flush(rows)
+            self.db.commit()
+            self.counts["batches"] += 1
+
+        elapsed = time.perf_counter() - started
+        return {
+            **self.counts,
+            "makes": len(self.make_ids),
+            "models": len(self.model_ids),
+            **{f"{field}s": len(ids) for field, ids in self.name_ids.items()},
+            "seconds": round(elapsed, 3),
+            "rows_per_second": round(self.counts["rows"] / elapsed, 1) if elapsed else None
+        }
+
+
+def load_catalog(records, batch_size=SEED_BATCH_SIZE):
+    """Bulk-upsert catalog records into the database and print what was loaded"""
+    db = SessionLocal()
+    try:
+        stats = CatalogLoader(db, batch_size).load(records)
     except Exception as e:
         db.rollback()
         print(f"❌ Error seeding database: {e}")
@@ -124,12 +268,40 @@ def seed_database(force=False):
     finally:
         db.close()
 
+    print("=" * 50)
+    print("✅ Catalog load completed successfully!")
+    print("=" * 50)
+    print(f"✓ {stats['rows']:,} rows in {stats['seconds']}s ({stats['rows_per_second']:,.0f} rows/sec), "
+          f"{stats['skipped']:,} skipped")
+    print(f"✓ {stats['makes']:,} makes, {stats['models']:,} models, {stats['trims']:,} trims, "
+          f"{stats['links']:,} new model associations")
+    print("↻ Running API servers keep their catalog snapshot until reloaded: kill -HUP <gunicorn master pid>")
+    print()
+    return stats
 
-if __name__ == "__main__":
-    init_db()
+
+def seed_database(force=False):
+    """Populate database with comprehensive car data"""
+    db = SessionLocal()
+    try:
+        # Check if data already exists
+        existing_count = db.query(Make).count()
+    finally:
+        db.close()
+    if existing_count > 0 and not force:
+        print("Database already populated. Skipping seed.")
+        return
+
+    print("Starting comprehensive database seed...")
+    print(f"📊 Total makes: {len(CAR_DATABASE)}")
+    print(f"📊 Total models: {sum(len(models) for models in CAR_DATABASE.values())}")
+    print()
+    return load_catalog(catalog_rows())
+
+
+def clear_catalog():
+    """Delete every make, model and model association (--replace)"""
     db = SessionLocal()
-    
-    # Clear old data first (clear junction tables first due to foreign keys)
     print("🗑️  Clearing old data...")
     try:
         # Delete from junction tables first
@@ -137,7 +309,6 @@ if __name__ == "__main__":
         db.execute(text("DELETE FROM model_body_types"))
         db.execute(text("DELETE FROM model_transmissions"))
         db.execute(text("DELETE FROM model_fuel_types"))
-        db.commit()
         
         # Now delete models and makes
         db.query(Model).delete()
@@ -147,8 +318,21 @@ if __name__ == "__main__":
     except Exception as e:
         print(f"Error clearing: {e}")
         db.rollback()
+        raise
     finally:
         db.close()
+
+
+if __name__ == "__main__":
+    init_db()
+    args = [arg for arg in sys.argv[1:] if arg != "--replace"]
+    
+    # Upserts keep existing rows; --replace starts from an empty catalog
+    if "--replace" in sys.argv:
+        clear_catalog()
     
-    # Force seed with fresh data
-    seed_database(force=True)
+    if args:
+        print(f"📂 Loading {args[0]}...")
+        load_catalog(read_catalog(args[0]))
+    else:
+        seed_database(force=True)
@@ -0,0 +1,314 @@
+"""
+Versioned schema migrations
+Each migration runs exactly once and is recorded in the schema_migrations
+table. A Postgres advisory lock makes sure only one process migrates when
+several workers boot at the same time; the others wait and then find the
+schema already current.
+
+Run with: python -m app.migrations
+"""
+
+import logging
+from sqlalchemy import text
+from sqlalchemy.exc import ProgrammingError
+
+from app import models, database
+from app.database import engine
+
+logger = logging.getLogger(__name__)
+
+# Arbitrary application-wide key for pg_advisory_lock
+MIGRATION_LOCK_ID = 7270301
+
+
+def _create_tables(conn):
+    models.Base.metadata.create_all(bind=conn)
+    database.Base.metadata.create_all(bind=conn)
+
+
+def _add_missing_columns(conn):
+    # Give up instead of queueing behind live traffic for the ACCESS EXCLUSIVE lock
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+
+    conn.execute(text("""
+        ALTER TABLE dealer_profiles
+        ADD COLUMN IF NOT EXISTS license_number VARCHAR(100),
+        ADD COLUMN IF NOT EXISTS phone VARCHAR(50),
+        ADD COLUMN IF NOT EXISTS address TEXT,
+        ADD COLUMN IF NOT EXISTS city VARCHAR(100),
+        ADD COLUMN IF NOT EXISTS state VARCHAR(50),
+        ADD COLUMN IF NOT EXISTS zip_code VARCHAR(20),
+        ADD COLUMN IF NOT EXISTS website VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS verification_status VARCHAR(50) DEFAULT 'pending',
+        ADD COLUMN IF NOT EXISTS auto_followup_enabled BOOLEAN DEFAULT true,
+        ADD COLUMN IF NOT EXISTS followup_day_1 BOOLEAN DEFAULT true,
+        ADD COLUMN IF NOT EXISTS followup_day_3 BOOLEAN DEFAULT true,
+        ADD COLUMN IF NOT EXISTS followup_day_7 BOOLEAN DEFAULT true
+    """))
+
+    conn.execute(text("""
+        ALTER TABLE seller_profiles
+        ADD COLUMN IF NOT EXISTS phone VARCHAR(50)
+    """))
+
+    conn.execute(text("""
+        ALTER TABLE leads
+        ADD COLUMN IF NOT EXISTS ai_estimated_value FLOAT,
+        ADD COLUMN IF NOT EXISTS ai_offer_low FLOAT,
+        ADD COLUMN IF NOT EXISTS ai_offer_fair FLOAT,
+        ADD COLUMN IF NOT EXISTS ai_offer_high FLOAT,
+        ADD COLUMN IF NOT EXISTS ai_rationale TEXT
+    """))
+
+    conn.execute(text("""
+        ALTER TABLE car_listings
+        ADD COLUMN IF NOT EXISTS photos JSON,
+        ADD COLUMN IF NOT EXISTS external_url TEXT,
+        ADD COLUMN IF NOT EXISTS external_listing_id VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS description TEXT,
+        ADD COLUMN IF NOT EXISTS seller_phone VARCHAR(50),
+        ADD COLUMN IF NOT EXISTS seller_email VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS seller_name VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS region VARCHAR(100),
+        ADD COLUMN IF NOT EXISTS fuel_type VARCHAR(50),
+        ADD COLUMN IF NOT EXISTS transmission VARCHAR(50),
+        ADD COLUMN IF NOT EXISTS color VARCHAR(50),
+        ADD COLUMN IF NOT EXISTS vin VARCHAR(17),
+        ADD COLUMN IF NOT EXISTS condition VARCHAR(50)
+    """))
+
+    conn.execute(text("""
+        ALTER TABLE messages
+        ADD COLUMN IF NOT EXISTS channel VARCHAR(50),
+        ADD COLUMN IF NOT EXISTS seller_replied BOOLEAN DEFAULT false,
+        ADD COLUMN IF NOT EXISTS read_by_seller BOOLEAN DEFAULT false,
+        ADD COLUMN IF NOT EXISTS sent_at TIMESTAMP,
+        ADD COLUMN IF NOT EXISTS sent BOOLEAN DEFAULT false,
+        ADD COLUMN IF NOT EXISTS modified_by_dealer BOOLEAN DEFAULT false,
+        ADD COLUMN IF NOT EXISTS generated_by_ai BOOLEAN DEFAULT true
+    """))
+
+    conn.execute(text("""
+        ALTER TABLE offers
+        ADD COLUMN IF NOT EXISTS status VARCHAR(50) DEFAULT 'pending'
+    """))
+
+    conn.execute(text("""
+        ALTER TABLE dealer_documents
+        ADD COLUMN IF NOT EXISTS uploaded_at TIMESTAMP,
+        ADD COLUMN IF NOT EXISTS verified BOOLEAN DEFAULT false,
+        ADD COLUMN IF NOT EXISTS expires_at DATE,
+        ADD COLUMN IF NOT EXISTS file_url TEXT,
+        ADD COLUMN IF NOT EXISTS document_name VARCHAR(255),
+        ADD COLUMN IF NOT EXISTS document_type VARCHAR(100)
+    """))
+
+
+def _filter_updated_at(conn):
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    conn.execute(text("""
+        ALTER TABLE dealer_marketplace_filters
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+    """))
+    conn.execute(text("""
+        CREATE INDEX IF NOT EXISTS ix_dealer_marketplace_filters_updated_at
+        ON dealer_marketplace_filters (updated_at)
+    """))
+
+
+def _ingestion_jobs(conn):
+    models.IngestionJob.__table__.create(bind=conn, checkfirst=True)
+
+
+def _listing_dedup_columns(conn):
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    conn.execute(text("""
+        ALTER TABLE car_listings
+        ADD COLUMN IF NOT EXISTS fingerprint VARCHAR(40),
+        ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP DEFAULT (now() AT TIME ZONE 'utc')
+    """))
+
+    # Repeats delivered before dedup would block the unique index: keep the
+    # external id on the oldest row, leads keep pointing at every copy
+    conn.execute(text("""
+        UPDATE car_listings SET external_listing_id = NULL
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (
+                    PARTITION BY source, external_listing_id ORDER BY id
+                ) AS n
+                FROM car_listings
+                WHERE external_listing_id IS NOT NULL
+            ) repeats
+            WHERE n > 1
+        )
+    """))
+
+    from app.matching.dedup import fingerprint
+    rows = conn.execute(text("""
+        SELECT id, make, model, year, mileage, seller_phone FROM car_listings
+        WHERE fingerprint IS NULL AND seller_phone IS NOT NULL
+    """)).all()
+    updates = [
+        {"id": row.id, "fingerprint": fingerprint(row.make, row.model, row.year, row.mileage, row.seller_phone)}
+        for row in rows
+    ]
+    updates = [u for u in updates if u["fingerprint"]]
+    if updates:
+        conn.execute(text("UPDATE car_listings SET fingerprint = :fingerprint WHERE id = :id"), updates)
+
+
+def _listing_dedup_indexes(conn):
+    from app.create_indexes import create_indexes
+    create_indexes(conn, names={
+        "uq_car_listings_source_external_id",
+        "ix_car_listings_vin",
+        "ix_car_listings_fingerprint",
+    })
+
+
+def _followup_stage(conn):
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    conn.execute(text("""
+        ALTER TABLE leads
+        ADD COLUMN IF NOT EXISTS followup_stage INTEGER DEFAULT 0
+    """))
+
+
+def _followup_indexes(conn):
+    from app.create_indexes import create_indexes
+    create_indexes(conn, names={"ix_leads_next_followup_at"})
+
+
+def _delivery_outbox(conn):
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    conn.execute(text("""
+        ALTER TABLE messages
+        ADD COLUMN IF NOT EXISTS delivery_status VARCHAR(20),
+        ADD COLUMN IF NOT EXISTS delivered_at TIMESTAMP,
+        ADD COLUMN IF NOT EXISTS delivery_error TEXT
+    """))
+    models.OutboxMessage.__table__.create(bind=conn, checkfirst=True)
+
+
+def _dealer_message_templates(conn):
+    models.DealerMessageTemplate.__table__.create(bind=conn, checkfirst=True)
+
+
+def _updated_at_utc_defaults(conn):
+    # Migrations 5 and 7 first shipped with DEFAULT now(), which stores the
+    # server's local time; the app writes datetime.utcnow() into these columns
+    conn.execute(text("SET LOCAL lock_timeout = '5s'"))
+    for table in ("dealer_marketplace_filters", "car_listings"):
+        conn.execute(text(f"""
+            ALTER TABLE {table}
+            ALTER COLUMN updated_at SET DEFAULT (now() AT TIME ZONE 'utc')
+        """))
+
+
+def _create_indexes(conn):
+    from app.create_indexes import create_indexes
+    create_indexes(conn, names={
+        "ix_dealer_profiles_verification_status",
+        "ix_car_listings_source",
+        "ix_leads_dealer_created",
+        "ix_leads_dealer_status_created",
+        "ix_leads_listing_id",
+        "ix_messages_lead_created",
+        "ix_messages_lead_type_sent",
+        "ix_offers_lead_id",
+    })
+
+
+def _seed_car_catalog(conn):
+    from app.migrate_data import seed_database
+    seed_database()
+
+
+# (version, description, function, transactional)
+# Non-transactional migrations get an AUTOCOMMIT connection, e.g. for
+# CREATE INDEX CONCURRENTLY. Never edit an applied migration - append a new one.
+MIGRATIONS = [
+    (1, "create tables", _create_tables, True),
+    (2, "add missing columns", _add_missing_columns, True),
+    (3, "marketplace indexes", _create_indexes, False),
+    (4, "seed car catalog", _seed_car_catalog, False),
+    (5, "dealer filter updated_at", _filter_updated_at, True),
+    (6, "ingestion queue", _ingestion_jobs, True),
+    (7, "listing dedup columns", _listing_dedup_columns, True),
+    (8, "listing dedup indexes", _listing_dedup_indexes, False),
+    (9, "lead followup stage", _followup_stage, True),
+    (10, "lead followup index", _followup_indexes, False),
+    (11, "delivery outbox", _delivery_outbox, True),
+    (12, "dealer message templates", _dealer_message_templates, True),
+    (13, "utc updated_at defaults", _updated_at_utc_defaults, True),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    """Highest applied migration version, 0 for a fresh database"""
+    try:
+        return conn.execute(text("SELECT max(version) FROM schema_migrations")).scalar() or 0
+    except ProgrammingError:
+        conn.rollback()
+        return 0
+
+
+def migrate():
+    """Apply all pending migrations while holding the migration advisory lock"""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as lock_conn:
+        logger.info("Waiting for migration lock...")
+        lock_conn.execute(text("SELECT pg_advisory_lock(:id)"), {"id": MIGRATION_LOCK_ID})
+        try:
+            lock_conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    description VARCHAR(255) NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT now()
+                )
+            """))
+
+            # Re-read under the lock - another process may have just finished
+            version = current_version(lock_conn)
+            pending = [m for m in MIGRATIONS if m[0] > version]
+            if not pending:
+                logger.info(f"✅ Schema is current (version {version})")
+                return version
+
+            for number, description, migration, transactional in pending:
+                logger.info(f"✏️  Applying migration {number}: {description}")
+                record = text(
+                    "INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"
+                )
+                if transactional:
+                    with engine.begin() as conn:
+                        migration(conn)
+                        conn.execute(record, {"version": number, "description": description})
+                else:
+                    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+                        migration(conn)
+                        conn.execute(record, {"version": number, "description": description})
+
+            logger.info(f"✅ Schema migrated to version {LATEST_VERSION}")
+            return LATEST_VERSION
+        finally:
+            lock_conn.execute(text("SELECT pg_advisory_unlock(:id)"), {"id": MIGRATION_LOCK_ID})
+
+
+def check_schema():
+    """Single SELECT used at startup: returns True when no migrations are pending"""
+    with engine.connect() as conn:
+        version = current_version(conn)
+
+    if version < LATEST_VERSION:
+        logger.warning(f"⚠️  Schema version {version} is behind {LATEST_VERSION}")
+        return False
+
+    return True
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey, JSON, DECIMAL, Date, Float
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, Enum, ForeignKey, JSON, DECIMAL, Date, Float, Index, text
 from sqlalchemy.ext.declarative import declarative_base
 from datetime import datetime
 import enum
@@ -58,6 +58,10 @@ class DealerProfile(Base):
     followup_day_7 = Column(Boolean, default=True)
     
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_dealer_profiles_verification_status", "verification_status"),
+    )
 
 class DealerMarketplaceFilter(Base):
     __tablename__ = "dealer_marketplace_filters"
@@ -84,6 +88,31 @@ class DealerMarketplaceFilter(Base):
     
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # Incremental sync of the in-memory filter index
+        Index("ix_dealer_marketplace_filters_updated_at", "updated_at"),
+    )
+
+class DealerMessageTemplate(Base):
+    __tablename__ = "dealer_message_templates"
+    
+    id = Column(Integer, primary_key=True)
+    dealer_id = Column(Integer, ForeignKey("dealer_profiles.id"), nullable=False)
+    name = Column(String(50), nullable=False)
+    
+    subject = Column(Text, nullable=False)
+    body = Column(Text, nullable=False)
+    sign_off = Column(String(100), nullable=False)
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # One override per dealer and template name (app.ai_provider.templates)
+        Index("uq_dealer_message_templates_dealer_name", dealer_id, name, unique=True),
+    )
 
 class SellerProfile(Base):
     __tablename__ = "seller_profiles"
@@ -129,7 +158,21 @@ class CarListing(Base):
     description = Column(Text)
     photos = Column(JSON)
     
+    # Dedup key: make/model/year/mileage bucket/seller phone (see app.matching.dedup)
+    fingerprint = Column(String(40))
+    
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_car_listings_source", "source"),
+        Index(
+            "uq_car_listings_source_external_id", "source", "external_listing_id",
+            unique=True, postgresql_where=text("external_listing_id IS NOT NULL")
+        ),
+        Index("ix_car_listings_vin", "vin", postgresql_where=text("vin IS NOT NULL")),
+        Index("ix_car_listings_fingerprint", "fingerprint", postgresql_where=text("fingerprint IS NOT NULL")),
+    )
 
 class Lead(Base):
     __tablename__ = "leads"
@@ -152,9 +195,24 @@ class Lead(Base):
     first_contact_at = Column(DateTime)
     last_contact_at = Column(DateTime)
     next_followup_at = Column(DateTime)
+    # Index into FOLLOWUP_SCHEDULE of the follow-up next_followup_at is for
+    followup_stage = Column(Integer, default=0)
     
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        # Dealer inbox: WHERE dealer_id = ? ORDER BY created_at DESC, id DESC
+        Index("ix_leads_dealer_created", dealer_id, created_at.desc(), id.desc()),
+        # Dealer inbox filtered by status
+        Index("ix_leads_dealer_status_created", dealer_id, status, created_at.desc()),
+        Index("ix_leads_listing_id", listing_id),
+        # Follow-up scheduler: WHERE next_followup_at <= now ORDER BY next_followup_at
+        Index(
+            "ix_leads_next_followup_at", next_followup_at,
+            postgresql_where=text("next_followup_at IS NOT NULL")
+        ),
+    )
 
 class Message(Base):
     __tablename__ = "messages"
@@ -177,7 +235,19 @@ class Message(Base):
     
     channel = Column(String(50))
     
+    # Set by the delivery workers: queued -> delivered, or failed
+    delivery_status = Column(String(20))
+    delivered_at = Column(DateTime)
+    delivery_error = Column(Text)
+    
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        # Latest message per lead and lead message history
+        Index("ix_messages_lead_created", lead_id, created_at),
+        # Unsent draft lookup in generate-message
+        Index("ix_messages_lead_type_sent", lead_id, message_type, sent),
+    )
 
 class Offer(Base):
     __tablename__ = "offers"
@@ -190,6 +260,10 @@ class Offer(Base):
     status = Column(String(50), default="pending")
     
     created_at = Column(DateTime, default=datetime.utcnow)
+    
+    __table_args__ = (
+        Index("ix_offers_lead_id", "lead_id"),
+    )
 
 class DealerDocument(Base):
     __tablename__ = "dealer_documents"
@@ -204,4 +278,53 @@ class DealerDocument(Base):
     expires_at = Column(Date)
     verified = Column(Boolean, default=False)
     
-    uploaded_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    uploaded_at = Column(DateTime, default=datetime.utcnow)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    
+    id = Column(Integer, primary_key=True)
+    payload = Column(JSON, nullable=False)
+    
+    # pending -> done, or dead once attempts run out
+    status = Column(String(20), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text)
+    
+    listing_id = Column(Integer, ForeignKey("car_listings.id"))
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    processed_at = Column(DateTime)
+    
+    __table_args__ = (
+        # Worker claim: WHERE status = 'pending' AND next_attempt_at <= now()
+        Index("ix_ingestion_jobs_status_next_attempt", status, next_attempt_at),
+        Index("ix_ingestion_jobs_processed_at", processed_at),
+    )
+
+class OutboxMessage(Base):
+    __tablename__ = "outbox"
+    
+    id = Column(Integer, primary_key=True)
+    message_id = Column(Integer, ForeignKey("messages.id"), nullable=False)
+    channel = Column(String(20), nullable=False)
+    recipient = Column(String(255), nullable=False)
+    subject = Column(String(500))
+    body = Column(Text, nullable=False)
+    
+    # pending -> sent, or dead once attempts run out / the provider rejects it
+    status = Column(String(20), default="pending", nullable=False)
+    attempts = Column(Integer, default=0, nullable=False)
+    next_attempt_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    last_error = Column(Text)
+    provider_message_id = Column(String(255))
+    
+    created_at = Column(DateTime, default=datetime.utcnow)
+    sent_at = Column(DateTime)
+    
+    __table_args__ = (
+        # Worker claim: WHERE status = 'pending' AND next_attempt_at <= now()
+        Index("ix_outbox_status_next_attempt", status, next_attempt_at),
+        Index("ix_outbox_sent_at", sent_at),
+    )
\ No newline at end of file
@@ -0,0 +1,183 @@
+"""
+Statement budgets for the car catalog
+Counts the SQL statements each catalog path sends and fails when one goes
+over its budget, so an N+1 (a lazy relationship load per row) or a
+catalog endpoint that starts querying again shows up before it ships.
+
+- Snapshot build: makes, models, the four association tables and the
+  body type / transmission / fuel type lists
+- Every /api/cars/* endpoint: none once the snapshot is loaded (served
+  through the ASGI app, middleware included)
+- ORM reads with the loader options from app.database: one statement
+  plus one per selectinload
+
+The same checks run as tests against a seeded SQLite catalog
+(tests/test_query_budgets.py); this script runs them against a real
+database. QueryCounter / assert_max_queries work for any other code path
+too:
+
+    with assert_max_queries(2):
+        ...
+
+Needs DATABASE_URL pointing at a database with the car catalog seeded.
+
+Run with: python -m app.query_budgets
+"""
+
+import asyncio
+import sys
+from contextlib import contextmanager
+from urllib.parse import urlencode
+
+from sqlalchemy import event, select
+
+from app.database import (
+    SessionLocal, async_engine, engine, Make, Model, MAKE_MODELS, MODEL_MAKE, MODEL_DETAILS
+)
+
+SNAPSHOT_BUDGET = 9
+ENDPOINT_BUDGET = 0
+
+
+class QueryCounter:
+    """Records every statement sent through the sync and async engines while active"""
+
+    def __init__(self, *engines):
+        self.engines = engines or (engine, async_engine.sync_engine)
+        self.statements = []
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        for target in self.engines:
+            event.listen(target, "before_cursor_execute", self._record)
+        return self
+
+    def __exit__(self, *exc_info):
+        for target in self.engines:
+            event.remove(target, "before_cursor_execute", self._record)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@contextmanager
+def assert_max_queries(limit, label="block"):
+    """AssertionError listing the statements when the block sends more than limit"""
+    with QueryCounter() as counter:
+        yield counter
+    if counter.count > limit:
+        statements = "\n".join(f"  {statement}" for statement in counter.statements)
+        raise AssertionError(f"{label}: {counter.count} statements, budget {limit}\n{statements}")
+
+
+async def _asgi_get(app, path, params=None):
+    """Status of GET path through the ASGI app, without a server"""
+    scope = {
+        "type": "http", "asgi": {"version": "3.0"}, "http_version": "1.1", "method": "GET",
+        "scheme": "http", "path": path, "raw_path": path.encode(), "root_path": "",
+        "query_string": urlencode(params or {}).encode(), "headers": [(b"host", b"localhost")],
+        "client": ("127.0.0.1", 0), "server": ("localhost", 80)
+    }
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    await app(scope, receive, send)
+    return messages[0]["status"]
+
+
+def catalog_requests(make, model):
+    """(path, params) of every /api/cars/* endpoint for a cataloged make / model"""
+    return [
+        ("/api/cars/makes", None),
+        ("/api/cars/models", {"make": make}),
+        ("/api/cars/trims", {"make": make, "model": model}),
+        ("/api/cars/years", {"make": make, "model": model}),
+        ("/api/cars/details", {"make": make, "model": model}),
+        ("/api/cars/details", {"make": make, "model": "No Such Model"}),
+        ("/api/cars/search", {"query": make[:3]}),
+        ("/api/cars/all-body-types", None),
+        ("/api/cars/all-transmissions", None),
+        ("/api/cars/all-fuel-types", None),
+    ]
+
+
+def orm_reads(make, model):
+    """Catalog reads through the ORM with the declared loader options, all relationships touched"""
+    def details(db):
+        row = db.execute(
+            select(Model).join(Make, Model.make_id == Make.id)
+            .where(Make.name == make, Model.name == model).options(*MODEL_DETAILS)
+        ).scalars().one()
+        return [row.trims, row.body_types, row.transmissions, row.fuel_types]
+
+    def models_of_make(db):
+        make_obj = db.execute(select(Make).where(Make.name == make).options(*MAKE_MODELS)).scalars().one()
+        return [m.name for m in make_obj.models]
+
+    def makes_with_models(db):
+        return [len(m.models) for m in db.execute(select(Make).options(*MAKE_MODELS)).scalars()]
+
+    def models_with_make(db):
+        return [m.make.name for m in db.execute(select(Model).options(*MODEL_MAKE)).scalars()]
+
+    return {
+        "Model + MODEL_DETAILS": (details, 1 + len(MODEL_DETAILS)),
+        "Make + MAKE_MODELS": (models_of_make, 2),
+        "all makes + MAKE_MODELS": (makes_with_models, 2),
+        "all models + MODEL_MAKE": (models_with_make, 1),
+    }
+
+
+def check_all():
+    """Print every budget check; True when all are within budget"""
+    from app.catalog import catalog
+    from app.main import app
+
+    results = []
+    with QueryCounter() as counter:
+        snapshot = catalog.reload()
+    results.append(("catalog snapshot build", counter.count, SNAPSHOT_BUDGET, True))
+    if not snapshot.details:
+        raise SystemExit("❌ Car catalog is empty - seed it first (python -m app.migrate_data)")
+    make, model = next(iter(snapshot.details))
+
+    for path, params in catalog_requests(make, model):
+        with QueryCounter() as counter:
+            status = asyncio.run(_asgi_get(app, path, params))
+        label = f"GET {path}" + (f"?{urlencode(params)}" if params else "")
+        results.append((label if status == 200 else f"{label} -> {status}", counter.count, ENDPOINT_BUDGET, status == 200))
+
+    db = SessionLocal()
+    try:
+        for label, (read, budget) in orm_reads(make, model).items():
+            with QueryCounter() as counter:
+                read(db)
+            db.expunge_all()
+            results.append((label, counter.count, budget, True))
+    finally:
+        db.close()
+
+    print(f"📊 Statement budgets, catalog {snapshot.etag}")
+    print("=" * 78)
+    print(f"{'check':<62} {'budget':>6} {'sent':>5}")
+    print("=" * 78)
+    over = 0
+    for label, count, budget, answered in results:
+        passed = answered and count <= budget
+        over += not passed
+        print(f"{label[:62]:<62} {budget:>6} {count:>5}  {'✅' if passed else '❌'}")
+    print("=" * 78)
+    print("✅ All within budget" if not over else f"❌ {over} check(s) failed")
+    return not over
+
+
+if __name__ == "__main__":
+    sys.exit(0 if check_all() else 1)
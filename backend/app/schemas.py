@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional
+from pydantic import BaseModel, EmailStr, Field
+from typing import List, Optional
 from enum import Enum
 
 class UserRole(str, Enum):
@@ -45,6 +45,11 @@ class LeadWebhookPayload(BaseModel):
     asking_price: Optional[float] = None
     description: Optional[str] = None
     photos: Optional[list] = None
+    city: Optional[str] = None
+    state: Optional[str] = None
+    zip_code: Optional[str] = None
+    external_id: Optional[str] = None
+    url: Optional[str] = None
 
 class OfferEstimateRequest(BaseModel):
     year: int
@@ -58,4 +63,32 @@ class OfferEstimate(BaseModel):
     low: float
     fair: float
     max: float
-    rationale: str
\ No newline at end of file
+    rationale: str
+
+class OfferEstimateBatchRequest(BaseModel):
+    """Columnar inventory: element i of every list describes the same car"""
+    year: List[int]
+    mileage: List[int]
+    condition: List[str]
+    region: Optional[List[str]] = None
+
+class OfferEstimateBatch(BaseModel):
+    count: int
+    low: List[float]
+    fair: List[float]
+    max: List[float]
+
+class GenerateMessagesRequest(BaseModel):
+    """Which of the dealer's leads to draft a message for; all filters are optional"""
+    message_type: str = "initial_contact"
+    tone: str = "friendly"
+    status: Optional[str] = "new"
+    source: Optional[str] = None  # "hot_lead" or "marketplace"
+    lead_ids: Optional[List[int]] = None
+    limit: int = Field(5000, ge=1, le=10000)
+
+class MessageTemplateRequest(BaseModel):
+    """A dealer's version of one message template; placeholders as in app.ai_provider.templates"""
+    subject: str = Field(..., min_length=1)
+    body: str = Field(..., min_length=1)
+    sign_off: str = Field("Best regards,", max_length=100)
@@ -0,0 +1,69 @@
+"""
+Production server process model: gunicorn master + uvicorn workers
+- Worker count from the CPUs this process may run on (cgroup / affinity
+  aware), WEB_CONCURRENCY overrides
+- The app is preloaded in the master and warm_up() builds read-only state
+  (car catalog, compiled message templates, ZIP centroids) before forking,
+  then gc.freeze() keeps those objects out of the collector so their pages
+  stay shared copy-on-write across workers
+- Workers recycle after MAX_REQUESTS +/- jitter and restart gracefully
+- uvloop event loop and httptools parser
+
+Settings live in gunicorn.conf.py.
+
+Run with: gunicorn -c gunicorn.conf.py app.main:app
+"""
+
+import gc
+import logging
+import os
+
+from uvicorn.workers import UvicornWorker as _UvicornWorker
+
+logger = logging.getLogger(__name__)
+
+WEB_CONCURRENCY = os.getenv("WEB_CONCURRENCY")
+WORKERS_PER_CORE = float(os.getenv("WORKERS_PER_CORE", "1"))
+MAX_WORKERS = int(os.getenv("MAX_WORKERS", "16"))
+
+
+class UvicornWorker(_UvicornWorker):
+    CONFIG_KWARGS = {"loop": "uvloop", "http": "httptools", "lifespan": "on"}
+
+
+def cpu_count():
+    """CPUs available to this process, not the host total"""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def worker_count():
+    """WEB_CONCURRENCY, else WORKERS_PER_CORE x CPUs clamped to [2, MAX_WORKERS]"""
+    if WEB_CONCURRENCY:
+        return int(WEB_CONCURRENCY)
+    return max(2, min(MAX_WORKERS, round(cpu_count() * WORKERS_PER_CORE)))
+
+
+def warm_up():
+    """Build read-only process state once in the preloaded master"""
+    from app.ai_provider.templates import message_templates
+    from app.catalog import catalog
+    from app.matching.zip_index import get_zip_centroids
+
+    try:
+        catalog.reload()
+    except Exception as e:
+        logger.error(f"❌ Car catalog not preloaded, workers will load their own: {e}")
+    get_zip_centroids()
+    logger.info(f"🔥 Preloaded {len(message_templates.compiled)} compiled templates")
+    gc.freeze()
+
+
+def reset_after_fork():
+    """Drop pooled connections inherited from the master; a socket must never be shared by two processes"""
+    from app.database import async_engine, engine
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
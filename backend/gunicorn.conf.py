@@ -0,0 +1,45 @@
+"""
+gunicorn settings for the API (see app/server.py)
+
+Run with: gunicorn -c gunicorn.conf.py app.main:app
+"""
+
+import os
+
+from app.server import reset_after_fork, warm_up, worker_count
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+workers = worker_count()
+worker_class = "app.server.UvicornWorker"
+
+# Import the app once in the master and fork workers from it
+preload_app = True
+
+# Recycle workers to bound slow leaks; jitter keeps them from restarting together
+max_requests = int(os.getenv("MAX_REQUESTS", "10000"))
+max_requests_jitter = int(os.getenv("MAX_REQUESTS_JITTER", "1000"))
+
+# Seconds a worker gets to finish in-flight requests on restart / SIGTERM
+graceful_timeout = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+timeout = int(os.getenv("WORKER_TIMEOUT", "60"))
+keepalive = int(os.getenv("KEEPALIVE", "5"))
+backlog = 2048
+
+accesslog = os.getenv("ACCESS_LOG") or None
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+
+def when_ready(server):
+    # Runs in the master after the app is preloaded, before the first fork
+    warm_up()
+    server.log.info(f"🚀 Starting {workers} uvicorn workers")
+
+
+def on_reload(server):
+    # kill -HUP after reseeding the car catalog: new workers fork from the fresh snapshot
+    warm_up()
+
+
+def post_fork(server, worker):
+    reset_after_fork()
@@ -0,0 +1,120 @@
+"""
+Shared fixtures: the app against a throwaway SQLite database
+app.database binds its engines at import, so DATABASE_URL is pointed at a
+temporary file before anything from app is imported.
+
+TEST_DATABASE_URL runs the suite against another database instead, e.g. a
+scratch Postgres for the tests that need it (pg_db). Every app table in it
+is emptied after each test, so never point it at real data.
+"""
+
+import asyncio
+import os
+import tempfile
+
+import pytest
+
+_db_dir = tempfile.mkdtemp(prefix="revomotors_tests_")
+os.environ["DATABASE_URL"] = os.getenv("TEST_DATABASE_URL") or f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.pop("ASYNC_DATABASE_URL", None)
+os.environ.pop("VALUATION_CACHE_URL", None)
+
+SAMPLE_TRIMS = ("Base", "Sport", "Limited")
+SAMPLE_BODY_TYPES = ("Sedan", "SUV")
+SAMPLE_TRANSMISSIONS = ("Automatic", "Manual")
+SAMPLE_FUEL_TYPES = ("Gasoline", "Hybrid")
+
+
+def _sample_catalog():
+    """Built-in makes / models, plus trims and the other associations for every model"""
+    from app.migrate_data import catalog_rows
+
+    for row in catalog_rows():
+        yield row
+        for i, trim in enumerate(SAMPLE_TRIMS):
+            yield {
+                **row,
+                "trim": trim,
+                "body_type": SAMPLE_BODY_TYPES[i % len(SAMPLE_BODY_TYPES)],
+                "transmission": SAMPLE_TRANSMISSIONS[i % len(SAMPLE_TRANSMISSIONS)],
+                "fuel_type": SAMPLE_FUEL_TYPES[i % len(SAMPLE_FUEL_TYPES)]
+            }
+
+
+@pytest.fixture(scope="session")
+def engine():
+    """The app's engines, disposed at the end of the session"""
+    from app.database import async_engine, engine
+
+    yield engine
+    engine.dispose()
+    # A pooled aiosqlite connection keeps its thread (and the interpreter) alive
+    asyncio.run(async_engine.dispose())
+
+
+@pytest.fixture(scope="session")
+def catalog_db(engine):
+    """Catalog tables seeded through app.migrate_data"""
+    from app.database import init_db
+    from app.migrate_data import load_catalog
+
+    init_db()
+    load_catalog(_sample_catalog())
+
+
+@pytest.fixture(scope="session")
+def app_tables(engine):
+    """Tables of app.models (users, dealers, listings, leads, ...)"""
+    from app.models import Base
+
+    Base.metadata.create_all(bind=engine)
+    return Base.metadata
+
+
+@pytest.fixture
+def db(engine, app_tables):
+    """Session on the app tables; every row written by the test is deleted afterwards"""
+    from app.database import SessionLocal
+
+    session = SessionLocal()
+    yield session
+    session.rollback()
+    session.close()
+    with engine.begin() as conn:
+        for table in reversed(app_tables.sorted_tables):
+            conn.execute(table.delete())
+
+
+@pytest.fixture
+def pg_db(db):
+    """db, skipping the test unless TEST_DATABASE_URL is Postgres (ON CONFLICT, RETURNING xmax, ...)"""
+    if db.bind.dialect.name != "postgresql":
+        pytest.skip("needs Postgres: set TEST_DATABASE_URL")
+    return db
+
+
+@pytest.fixture
+def make_dealer(db):
+    """make_dealer(verified=True) -> DealerProfile, with its dealer user"""
+    from app.models import DealerProfile, User, UserRole
+
+    count = 0
+
+    def make(verified=True):
+        nonlocal count
+        count += 1
+        user = User(
+            email=f"dealer{count}@example.com", hashed_password="x", role=UserRole.DEALER,
+            first_name="Test", last_name=f"Dealer {count}"
+        )
+        db.add(user)
+        db.flush()
+        dealer = DealerProfile(
+            user_id=user.id, company_name=f"Dealer {count} Motors",
+            verification_status="verified" if verified else "pending"
+        )
+        db.add(dealer)
+        db.commit()
+        return dealer
+
+    return make
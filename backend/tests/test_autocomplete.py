@@ -0,0 +1,121 @@
+"""
+Make / model autocomplete (see app.autocomplete): ranking, normalization,
+typo matches, and every ILIKE '%q%' match of the previous handler kept
+"""
+
+import random
+
+import pytest
+
+from app.autocomplete import AutocompleteIndex, SEARCH_LIMIT
+from app.migrate_data import catalog_rows
+
+PAIRS = [
+    ("Chevrolet", "Silverado 1500"), ("Ford", "F-150"), ("Ford", "Focus"), ("Honda", "Accord"),
+    ("Honda", "CR-V"), ("Honda", "Civic"), ("Hyundai", "Accent"), ("Land Rover", "Range Rover"),
+    ("Toyota", "Camry"), ("Toyota", "Corolla"),
+]
+CATALOG = [(row["make"], row["model"]) for row in catalog_rows()]
+
+index = AutocompleteIndex(PAIRS)
+catalog_index = AutocompleteIndex(CATALOG)
+
+
+def labels(query, **kwargs):
+    return [result["label"] for result in index.search(query, **kwargs)]
+
+
+def ilike(pairs, query):
+    """What the ILIKE '%q%' scans over makes and models matched"""
+    query = query.lower()
+    return {(make, model) for make, model in pairs if query in make.lower() or query in model.lower()}
+
+
+def test_results_are_label_dicts():
+    assert index.search("civ") == [{"make": "Honda", "model": "Civic", "label": "Honda Civic"}]
+    assert len(index) == len(PAIRS)
+
+
+@pytest.mark.parametrize("query", ["", "  ", "-", "xq", "zzzzzz"])
+def test_no_suggestions(query):
+    assert labels(query) == []
+
+
+@pytest.mark.parametrize("query", ["cr-v", "CR V", "crv", " Cr.V "])
+def test_punctuation_and_case_are_ignored(query):
+    assert labels(query) == ["Honda CR-V"]
+
+
+def test_make_prefix_ranks_before_model_prefix():
+    # Chevrolet by make, then the C models by label
+    assert labels("c") == [
+        "Chevrolet Silverado 1500", "Honda Civic", "Honda CR-V", "Toyota Camry", "Toyota Corolla"
+    ]
+    assert labels("ho") == ["Honda Accord", "Honda Civic", "Honda CR-V"]
+
+
+def test_model_prefix_then_word_prefix_then_substring():
+    assert labels("acc") == ["Honda Accord", "Hyundai Accent"]
+    # "rover" starts the make's second word and the model
+    assert labels("rover") == ["Land Rover Range Rover"]
+    # Within a rank the closer word wins: "150" is all of F-150's last word
+    assert labels("150") == ["Ford F-150", "Chevrolet Silverado 1500"]
+    assert labels("ilverad") == ["Chevrolet Silverado 1500"]
+
+
+def test_make_and_model_across_words():
+    assert labels("honda c") == ["Honda Civic", "Honda CR-V"]
+    assert labels("toy cam") == ["Toyota Camry"]
+    assert labels("hondacivic")[0] == "Honda Civic"
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("camyr", "Toyota Camry"),
+    ("corrola", "Toyota Corolla"),
+    ("silverdo", "Chevrolet Silverado 1500"),
+    ("toyta corola", "Toyota Corolla"),
+    ("hyundia", "Hyundai Accent"),
+])
+def test_typos_are_matched(query, expected):
+    assert labels(query)[0] == expected
+
+
+def test_typo_matches_rank_last_and_every_word_must_resemble():
+    # Accent by prefix, Accord only by similarity
+    assert labels("accen", limit=None) == ["Hyundai Accent", "Honda Accord"]
+    assert labels("toyta zzzzz") == []
+
+
+def test_limit():
+    assert len(catalog_index.search("a")) == SEARCH_LIMIT
+    assert len(catalog_index.search("a", limit=5)) == 5
+    every = catalog_index.search("a", limit=None)
+    assert len(every) > SEARCH_LIMIT
+    assert catalog_index.search("a") == every[:SEARCH_LIMIT]
+
+
+def test_every_ilike_match_is_suggested():
+    rng = random.Random(3)
+    names = [name for pair in CATALOG for name in pair]
+    queries = set()
+    for name in rng.sample(names, 150):
+        compact = name.lower()
+        for length in (3, 4, 6):
+            if len(compact) >= length:
+                start = rng.randrange(len(compact) - length + 1)
+                query = compact[start:start + length]
+                if query.isalnum():
+                    queries.add(query)
+    assert queries
+    for query in queries:
+        found = {(result["make"], result["model"]) for result in catalog_index.search(query, limit=None)}
+        missing = ilike(CATALOG, query) - found
+        assert not missing, f"{query!r} misses {sorted(missing)[:5]}"
+
+
+def test_top_results_keep_the_ilike_matches_first():
+    # A substring match never ranks below a typo match
+    for query in ("ord", "ila", "ang"):
+        results = catalog_index.search(query, limit=None)
+        matched = [(r["make"], r["model"]) in ilike(CATALOG, query) for r in results]
+        assert matched == sorted(matched, reverse=True), query
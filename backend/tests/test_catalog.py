@@ -0,0 +1,56 @@
+"""
+Catalog snapshot loading (see app.catalog): a process without a preloaded
+snapshot loads it once, off the event loop; and catalog rows that
+app.migrate_data skips instead of aborting the load
+"""
+
+import asyncio
+import threading
+import time
+
+from app.catalog import Catalog
+
+
+def test_first_use_loads_once_off_the_event_loop(catalog_db):
+    catalog = Catalog()
+    loads = []
+    reload = catalog.reload
+
+    def slow_reload():
+        loads.append(threading.current_thread())
+        time.sleep(0.05)
+        return reload()
+
+    catalog.reload = slow_reload
+
+    async def requests():
+        loop_thread = threading.current_thread()
+        snapshots = await asyncio.gather(*(catalog.get_async() for _ in range(8)))
+        return loop_thread, snapshots
+
+    loop_thread, snapshots = asyncio.run(requests())
+    assert len(loads) == 1 and loads[0] is not loop_thread
+    assert all(snapshot is snapshots[0] for snapshot in snapshots)
+    assert snapshots[0].details and catalog.get() is snapshots[0]
+
+
+def test_rows_with_unusable_years_are_skipped(catalog_db):
+    from app.database import SessionLocal
+    from app.migrate_data import CatalogLoader, normalize_row
+
+    assert normalize_row({"make": "Honda", "model": "Civic", "year": "2019.0"})["year_min"] == 2019
+    assert normalize_row({"make": "Honda", "model": "Civic", "year": " "})["year_max"] == 2026
+    bad = [
+        {"make": "Honda", "model": "Civic", "year": "n/a"},
+        {"make": "Honda", "model": "Civic", "year_min": "2015", "year_max": "nan"},
+        {"make": "Honda", "model": "Civic", "year": float("inf")},
+        {"make": "Honda", "model": " "},
+    ]
+    assert [normalize_row(record) for record in bad] == [None] * len(bad)
+
+    db = SessionLocal()
+    try:
+        stats = CatalogLoader(db, batch_size=2).load(bad)
+    finally:
+        db.close()
+    assert (stats["rows"], stats["skipped"], stats["batches"]) == (4, 4, 2)
@@ -0,0 +1,142 @@
+"""
+Listing deduplication (see app.matching.dedup) and the upsert that folds
+duplicates into existing listings (app.ingestion.upsert_listings)
+"""
+
+import pytest
+
+from app.ingestion import listing_values, upsert_listings
+from app.matching import dedup
+from app.matching.dedup import FingerprintCache, find_duplicates, fingerprint, normalize_phone, normalize_vin
+from app.models import CarListing, LeadSource
+
+VIN = "1HGCM82633A004352"
+
+
+@pytest.fixture(autouse=True)
+def empty_cache(monkeypatch):
+    monkeypatch.setattr(dedup, "fingerprint_cache", FingerprintCache())
+    return dedup.fingerprint_cache
+
+
+def payload(**fields):
+    values = {
+        "year": 2018, "make": "Honda", "model": "Accord", "mileage": 42000,
+        "seller_contact_phone": "(555) 123-4567", "marketplace": "facebook"
+    }
+    values.update(fields)
+    return values
+
+
+def add_listing(db, **fields):
+    values = listing_values(payload(**fields))
+    listing = CarListing(**values)
+    db.add(listing)
+    db.commit()
+    return listing.id
+
+
+def test_normalize_vin():
+    assert normalize_vin(" 1hgcm-82633a004352 ") == VIN
+    assert normalize_vin("1HGCM82633A00435") is None          # 16 characters
+    assert normalize_vin("1HGCM82633A00435O") is None         # O is never used
+    assert normalize_vin(None) is None
+
+
+def test_normalize_phone():
+    assert normalize_phone("+1 (555) 123-4567") == "5551234567"
+    assert normalize_phone("555.123.4567") == "5551234567"
+    assert normalize_phone("123-4567") is None
+
+
+def test_fingerprint_collapses_reposts():
+    original = fingerprint("Honda", "Accord", 2018, 42000, "(555) 123-4567")
+    assert fingerprint(" honda", "ACCORD ", 2018, 44999, "+1 555 123 4567") == original
+    assert fingerprint("Honda", "Accord", 2018, 45000, "(555) 123-4567") != original
+    assert fingerprint("Honda", "Accord", 2018, 42000, "(555) 765-4321") != original
+    assert fingerprint("Honda", "Accord", 2018, 42000, None) is None
+
+
+def test_batch_keys():
+    values = listing_values(payload(external_id="fb-1", vin=VIN))
+    assert dedup.batch_keys(values) == [
+        ("external", LeadSource.FACEBOOK, "fb-1"), ("vin", VIN), ("fingerprint", values["fingerprint"])
+    ]
+    assert dedup.batch_keys(listing_values(payload(seller_contact_phone=None))) == []
+
+
+def test_fingerprint_cache_is_a_bounded_lru():
+    cache = FingerprintCache(max_size=2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None
+    assert (cache.get("a"), cache.get("c")) == (1, 3)
+
+
+def test_find_duplicates_strongest_key_first(db):
+    by_external = add_listing(db, external_id="fb-1", seller_contact_phone="555 000 0001")
+    oldest_vin = add_listing(db, vin=VIN, seller_contact_phone="555 000 0002")
+    add_listing(db, vin=VIN, seller_contact_phone="555 000 0003")
+    by_fingerprint = add_listing(db)
+
+    rows = [
+        listing_values(payload(external_id="fb-1", vin=VIN)),       # external id beats the VIN
+        listing_values(payload(vin=VIN.lower(), mileage=90000)),    # oldest of the VIN's rows
+        listing_values(payload(mileage=44000, seller_contact_phone="+1 555-123-4567")),
+        listing_values(payload(external_id="fb-1", marketplace="offerup", seller_contact_phone=None)),
+        listing_values(payload(make="Toyota")),
+    ]
+    assert find_duplicates(db, rows) == [by_external, oldest_vin, by_fingerprint, None, None]
+
+
+def test_fingerprints_are_cached_only_after_commit(db, empty_cache):
+    listing_id = add_listing(db)
+    key = listing_values(payload())["fingerprint"]
+
+    assert find_duplicates(db, [listing_values(payload())]) == [listing_id]
+    assert len(empty_cache) == 0
+    db.rollback()
+    assert len(empty_cache) == 0
+
+    find_duplicates(db, [listing_values(payload())])
+    db.commit()
+    assert empty_cache.get(key) == listing_id
+
+
+def test_rolled_back_savepoint_leaves_no_cached_fingerprint(db, empty_cache):
+    listing_id = add_listing(db)
+    with pytest.raises(RuntimeError):
+        with db.begin_nested():
+            find_duplicates(db, [listing_values(payload())])
+            raise RuntimeError("job failed")
+    db.commit()
+    assert len(empty_cache) == 0
+
+    dedup.remember(db, "kept", listing_id)
+    db.commit()
+    assert empty_cache.get("kept") == listing_id
+
+
+def test_upsert_collapses_batch_repeats_and_existing_rows(pg_db):
+    db = pg_db
+    rows = [
+        listing_values(payload(external_id="fb-1", price=9000)),
+        listing_values(payload(external_id="fb-1", price=8500)),                 # same external id
+        listing_values(payload(vin=VIN, seller_contact_phone="555 000 0009")),
+        listing_values(payload(vin=VIN, marketplace="craigslist", seller_contact_phone=None)),
+    ]
+    results = upsert_listings(db, rows)
+    db.commit()
+    first, vin_listing = results[0][0], results[2][0]
+    assert results == [(first, True), (first, False), (vin_listing, True), (vin_listing, False)]
+    assert db.get(CarListing, first, populate_existing=True).asking_price == 8500
+
+    # A re-delivery updates the listing it repeats and inserts nothing
+    again = upsert_listings(db, [listing_values(payload(external_id="fb-1", price=8000, color="Blue"))])
+    db.commit()
+    assert again == [(first, False)]
+    refreshed = db.get(CarListing, first, populate_existing=True)
+    assert (refreshed.asking_price, refreshed.color) == (8000, "Blue")
+    assert db.query(CarListing).count() == 2
@@ -0,0 +1,246 @@
+"""
+Dealer filter matching (see app.matching.filter_index): the bitset index
+against a naive scan of every filter, incremental upserts and database sync
+"""
+
+import random
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from app.benchmarks.filter_matching import random_filter, random_listing
+from app.matching.filter_index import FilterIndex, MARKETPLACE_TOGGLES, _normalize, _source_name
+from app.matching.zip_index import DEFAULT_RADIUS_MILES, MAX_RADIUS_MILES, get_zip_centroids, haversine_miles
+
+# A few metro areas, near and far from each other, plus ZIPs that never resolve
+ZIPS = ["10001", "10019", "07030", "11201", "19103", "02134", "60601", "94103", "90210", "73301"]
+BAD_ZIPS = ["00000", "ABCDE", "1234567"]
+
+
+def naive_match(filters, verified_dealers, listing):
+    """Reference implementation: test every active filter against the listing"""
+    centroids = get_zip_centroids()
+    source = _source_name(listing.source)
+    point = centroids.lookup(getattr(listing, "zip_code", None))
+    price = listing.asking_price
+    dealers, filtered_dealers = set(), set()
+    for f in filters:
+        if not f.is_active:
+            continue
+        filtered_dealers.add(f.dealer_id)
+        if source in MARKETPLACE_TOGGLES and not getattr(f, MARKETPLACE_TOGGLES[source]):
+            continue
+        if f.makes and _normalize(listing.make) not in {_normalize(m) for m in f.makes}:
+            continue
+        if f.models and _normalize(listing.model) not in {_normalize(m) for m in f.models}:
+            continue
+        if f.year_min is not None and listing.year < f.year_min:
+            continue
+        if f.year_max is not None and listing.year > f.year_max:
+            continue
+        if f.mileage_max is not None and listing.mileage > f.mileage_max:
+            continue
+        if price is not None and f.price_min is not None and price < f.price_min:
+            continue
+        if price is not None and f.price_max is not None and price > f.price_max:
+            continue
+        if f.zip_codes:
+            radius = min(f.radius_miles or DEFAULT_RADIUS_MILES, MAX_RADIUS_MILES)
+            centers = [c for c in map(centroids.lookup, f.zip_codes) if c is not None]
+            if point is None or not any(haversine_miles(*point, *center) <= radius for center in centers):
+                continue
+        dealers.add(f.dealer_id)
+    return (dealers & verified_dealers) | (verified_dealers - filtered_dealers)
+
+
+def geo_filter(rng, filter_id, dealer_count):
+    f = random_filter(rng, filter_id, dealer_count)
+    f.zip_codes = rng.sample(ZIPS + BAD_ZIPS, rng.randint(1, 3)) if rng.random() < 0.4 else None
+    f.radius_miles = rng.choice([None, 10, 25, 100, 1000])
+    f.is_active = rng.random() < 0.9
+    return f
+
+
+def geo_listing(rng):
+    listing = random_listing(rng)
+    listing.zip_code = rng.choice(ZIPS + BAD_ZIPS + [None])
+    return listing
+
+
+def filter_row(dealer_id, **fields):
+    """Filter attributes as DealerMarketplaceFilter defaults them"""
+    values = dict(
+        makes=None, models=None, year_min=None, year_max=None, mileage_max=None, price_min=None,
+        price_max=None, zip_codes=None, radius_miles=50, facebook_enabled=True, offerup_enabled=True,
+        craigslist_enabled=True, autotrader_enabled=False, carscom_enabled=False, is_active=True
+    )
+    values.update(fields)
+    return dict(dealer_id=dealer_id, **values)
+
+
+def listing(**fields):
+    values = dict(
+        make="Toyota", model="Camry", year=2018, mileage=40000, asking_price=15000,
+        source="facebook", zip_code="10001"
+    )
+    values.update(fields)
+    return SimpleNamespace(**values)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_matches_naive_scan(seed):
+    rng = random.Random(seed)
+    dealer_count = 40
+    filters = [geo_filter(rng, i, dealer_count) for i in range(1, 151)]
+    verified = set(rng.sample(range(1, dealer_count + 1), 30))
+    index = FilterIndex()
+    index.rebuild(filters, verified)
+
+    for _ in range(300):
+        listing = geo_listing(rng)
+        assert index.match(listing) == naive_match(filters, verified, listing)
+
+
+@pytest.mark.parametrize("seed", [4, 5])
+def test_incremental_upserts_match_rebuild(seed):
+    rng = random.Random(seed)
+    dealer_count = 30
+    filters = {i: geo_filter(rng, i, dealer_count) for i in range(1, 101)}
+    verified = set(range(1, dealer_count + 1))
+    index = FilterIndex()
+    index.rebuild(filters.values(), verified)
+
+    # Replace, deactivate and add filters one at a time
+    for _ in range(200):
+        f = geo_filter(rng, rng.randint(1, 130), dealer_count)
+        filters[f.id] = f
+        index.upsert(f)
+
+    fresh = FilterIndex()
+    fresh.rebuild(filters.values(), verified)
+    for _ in range(300):
+        listing = geo_listing(rng)
+        expected = naive_match(filters.values(), verified, listing)
+        assert index.match(listing) == expected
+        assert fresh.match(listing) == expected
+
+
+def test_terms_ranges_and_marketplaces():
+    index = FilterIndex()
+    index.rebuild([
+        SimpleNamespace(id=1, **filter_row(1, makes=["toyota "], models=["Camry"])),
+        SimpleNamespace(id=2, **filter_row(2, year_min=2015, year_max=2020, mileage_max=50000)),
+        SimpleNamespace(id=3, **filter_row(3, price_min=10000, price_max=20000)),
+        SimpleNamespace(id=4, **filter_row(4, facebook_enabled=False)),
+    ], {1, 2, 3, 4})
+
+    assert index.match(listing()) == {1, 2, 3}
+    assert index.match(listing(make="Honda")) == {2, 3}
+    assert index.match(listing(year=2021, mileage=60000)) == {1, 3}
+    assert index.match(listing(asking_price=25000)) == {1, 2}
+    assert index.match(listing(asking_price=None)) == {1, 2, 3}
+    assert index.match(listing(source="craigslist")) == {1, 2, 3, 4}
+    # No toggle for hot leads: delivered to every filter
+    assert index.match(listing(source="hot_lead")) == {1, 2, 3, 4}
+
+
+def test_radius_and_unresolvable_zips():
+    index = FilterIndex()
+    index.rebuild([
+        SimpleNamespace(id=1, **filter_row(1, zip_codes=["10001"], radius_miles=10)),
+        SimpleNamespace(id=2, **filter_row(2, zip_codes=["94103"], radius_miles=25)),
+        SimpleNamespace(id=3, **filter_row(3, zip_codes=["ABCDE"])),
+        SimpleNamespace(id=4, **filter_row(4)),
+    ], {1, 2, 3, 4})
+
+    assert index.match(listing(zip_code="10019")) == {1, 4}     # midtown, ~1 mile away
+    assert index.match(listing(zip_code="19103")) == {4}        # Philadelphia, ~80 miles
+    assert index.match(listing(zip_code="94103")) == {2, 4}
+    # A listing without a resolvable ZIP only reaches unrestricted filters
+    assert index.match(listing(zip_code=None)) == {4}
+    assert index.match(listing(zip_code="00000")) == {4}
+
+
+def test_deactivation_and_unverified_dealers():
+    index = FilterIndex()
+    index.rebuild([
+        SimpleNamespace(id=1, **filter_row(1, makes=["Honda"])),
+        SimpleNamespace(id=2, **filter_row(2, makes=["Toyota"])),
+    ], {1, 2, 3})
+
+    # Dealer 3 has no filter and gets everything
+    assert index.match(listing()) == {2, 3}
+
+    # Deactivating dealer 1's only filter makes it unfiltered again
+    index.upsert(SimpleNamespace(id=1, **filter_row(1, makes=["Honda"], is_active=False)))
+    assert index.match(listing()) == {1, 2, 3}
+
+    index.set_verified_dealers({1, 3})
+    assert index.match(listing()) == {1, 3}
+
+    index.remove(2)
+    index.set_verified_dealers({1, 2, 3})
+    assert index.match(listing()) == {1, 2, 3}
+
+
+def test_refresh_picks_up_out_of_order_commits(db, make_dealer):
+    from app.models import DealerMarketplaceFilter
+
+    first, second, third = make_dealer(), make_dealer(), make_dealer()
+    now = datetime.utcnow()
+    db.add_all([
+        DealerMarketplaceFilter(**filter_row(second.id, makes=["Honda"]), updated_at=now),
+        DealerMarketplaceFilter(**filter_row(third.id, makes=["Ford"], is_active=False), updated_at=now)
+    ])
+    db.commit()
+    index = FilterIndex()
+    index.load(db)
+    assert index.synced_at == now
+    assert index.match(listing()) == {first.id, third.id}
+
+    # Stamped before the watermark, committed after it
+    db.add(DealerMarketplaceFilter(**filter_row(first.id, makes=["Toyota"]), updated_at=now - timedelta(seconds=30)))
+    db.commit()
+    index.refresh(db, max_age=0)
+    assert index.match(listing()) == {first.id, third.id}
+    assert index.match(listing(make="Honda")) == {second.id, third.id}
+
+    # An edit stamped behind the watermark, with the active count unchanged
+    honda = db.query(DealerMarketplaceFilter).filter_by(dealer_id=second.id).one()
+    honda.makes = ["Toyota"]
+    honda.updated_at = now - timedelta(seconds=10)
+    db.commit()
+    index.refresh(db, max_age=0)
+    assert index.match(listing()) == {first.id, second.id, third.id}
+    assert index.match(listing(make="Honda")) == {third.id}
+
+    # One filter deactivated and another activated: the active count stays the same
+    ford = db.query(DealerMarketplaceFilter).filter_by(dealer_id=third.id).one()
+    honda.is_active = False
+    honda.updated_at = ford.updated_at = now - timedelta(seconds=5)
+    ford.is_active = True
+    db.commit()
+    index.refresh(db, max_age=0)
+    assert index.match(listing()) == {first.id, second.id}
+    assert index.match(listing(make="Ford")) == {second.id, third.id}
+
+
+def test_refresh_without_updated_at_does_not_reload(db, make_dealer, monkeypatch):
+    from app.models import DealerMarketplaceFilter
+
+    dealer = make_dealer()
+    db.add(DealerMarketplaceFilter(**filter_row(dealer.id, makes=["Honda"])))
+    db.commit()
+    db.query(DealerMarketplaceFilter).update({"updated_at": None})
+    db.commit()
+
+    index = FilterIndex()
+    index.load(db)
+    assert index.synced_at is None
+
+    loads = []
+    monkeypatch.setattr(index, "load", lambda db: loads.append(db))
+    index.refresh(db, max_age=0)
+    assert loads == []
+    assert index.match(listing(make="Honda")) == {dealer.id}
@@ -0,0 +1,66 @@
+"""
+Follow-up scheduler (see app.followups): due follow-ups are stored as sent
+messages and queued in the delivery outbox in the same transaction
+"""
+
+from datetime import datetime, timedelta
+
+from app.followups import followup_stats, process_due
+from app.models import CarListing, Lead, LeadStatus, Message, OutboxMessage
+
+
+def contacted_lead(db, dealer, days_ago=2, **listing_fields):
+    listing = CarListing(
+        title="2018 Honda Accord", year=2018, make="Honda", model="Accord", mileage=42000, seller_name="Sam",
+        **listing_fields
+    )
+    db.add(listing)
+    db.flush()
+    first_contact = datetime.utcnow() - timedelta(days=days_ago)
+    lead = Lead(
+        listing_id=listing.id, dealer_id=dealer.id, status=LeadStatus.CONTACTED, ai_offer_fair=15000,
+        first_contact_sent=True, first_contact_at=first_contact,
+        followup_stage=0, next_followup_at=first_contact + timedelta(days=1)
+    )
+    db.add(lead)
+    db.commit()
+    return lead.id
+
+
+def test_due_followups_are_queued_for_delivery(db, make_dealer):
+    dealer = make_dealer()
+    lead_id = contacted_lead(db, dealer, seller_email="sam@example.com")
+
+    assert process_due(db) == 1
+    message = db.query(Message).filter_by(lead_id=lead_id).one()
+    assert (message.message_type, message.sent, message.delivery_status) == ("follow_up_1", True, "queued")
+    outbox = db.query(OutboxMessage).one()
+    assert (outbox.message_id, outbox.recipient, outbox.status) == (message.id, "sam@example.com", "pending")
+    assert (outbox.subject, outbox.body) == (message.subject, message.body)
+
+    lead = db.get(Lead, lead_id)
+    assert (lead.status, lead.followup_stage, lead.last_contact_at) == (LeadStatus.FOLLOW_UP, 1, message.sent_at)
+    assert lead.next_followup_at > datetime.utcnow()
+    assert followup_stats(db)["queued_last_window"] == 1
+
+
+def test_sellers_without_an_address_are_marked_failed(db, make_dealer):
+    lead_id = contacted_lead(db, make_dealer(), seller_phone="555-0100")
+
+    assert process_due(db) == 1
+    message = db.query(Message).filter_by(lead_id=lead_id).one()
+    assert (message.delivery_status, message.delivery_error) == ("failed", "Seller has no email address")
+    assert db.query(OutboxMessage).count() == 0
+    assert followup_stats(db)["queued_last_window"] == 0
+
+
+def test_a_stage_already_sent_is_not_sent_again(db, make_dealer):
+    dealer = make_dealer()
+    lead_id = contacted_lead(db, dealer, seller_email="sam@example.com")
+    db.add(Message(lead_id=lead_id, dealer_id=dealer.id, message_type="follow_up_1", body="Sent by hand", sent=True))
+    db.commit()
+
+    assert process_due(db) == 1
+    assert db.query(Message).filter_by(lead_id=lead_id).count() == 1
+    assert db.query(OutboxMessage).count() == 0
+    assert db.get(Lead, lead_id).followup_stage == 1
@@ -0,0 +1,68 @@
+"""
+Columnar offers (MockAIProvider.estimate_offers_batch) against the scalar
+price_offer, compared bit for bit
+"""
+
+import random
+
+import numpy as np
+import pytest
+
+from app.ai_provider import mock_provider
+from app.ai_provider.mock_provider import MockAIProvider, condition_codes
+from app.benchmarks.offer_batch import random_inventory
+
+provider = MockAIProvider()
+
+
+def assert_matches_scalar(years, mileages, conditions, batch):
+    for key in ("low", "fair", "max"):
+        expected = np.array([
+            provider.price_offer(year, mileage, condition)[key]
+            for year, mileage, condition in zip(years, mileages, conditions)
+        ], dtype=np.float64)
+        assert batch[key].dtype == np.float64
+        # Bit patterns, so a last-bit rounding difference fails too
+        mismatches = np.flatnonzero(expected.view(np.int64) != batch[key].view(np.int64))
+        assert not mismatches.size, (
+            f"{key} differs for {[(years[i], mileages[i], conditions[i]) for i in mismatches[:5]]}"
+        )
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_batch_equals_price_offer(seed):
+    years, mileages, conditions = random_inventory(random.Random(seed), 20000)
+    batch = provider.estimate_offers_batch(np.array(years), np.array(mileages), condition_codes(conditions))
+    assert_matches_scalar(years, mileages, conditions, batch)
+
+
+def test_condition_names_and_codes_price_the_same():
+    years, mileages, conditions = random_inventory(random.Random(4), 2000)
+    by_name = provider.estimate_offers_batch(years, mileages, conditions)
+    by_code = provider.estimate_offers_batch(years, mileages, condition_codes(conditions))
+    for key in ("low", "fair", "max"):
+        assert np.array_equal(by_name[key], by_code[key])
+    assert_matches_scalar(years, mileages, conditions, by_name)
+
+
+def test_mileage_tiers_floor_and_unknown_conditions():
+    years = [2025, 2025, 2025, 2025, 2025, 2025, 2025, 1900, 2020, 2020]
+    mileages = [50000, 50001, 75000, 75001, 100000, 100001, 0, 250000, 30000, 30000]
+    conditions = ["good"] * 7 + ["poor", "salvage", "EXCELLENT"]
+    batch = provider.estimate_offers_batch(years, mileages, conditions)
+    assert_matches_scalar(years, mileages, conditions, batch)
+    assert batch["fair"][7] == mock_provider.MIN_VALUE
+    # Unknown conditions price as "good"
+    assert batch["fair"][8] == provider.price_offer(2020, 30000, "good")["fair"]
+
+
+def test_sparse_keys_take_the_sorting_path(monkeypatch):
+    monkeypatch.setattr(mock_provider, "DENSE_KEY_SPAN", 0)
+    years, mileages, conditions = random_inventory(random.Random(5), 5000)
+    batch = provider.estimate_offers_batch(years, mileages, conditions)
+    assert_matches_scalar(years, mileages, conditions, batch)
+
+
+def test_empty_batch():
+    batch = provider.estimate_offers_batch([], [], np.array([], dtype=np.int64))
+    assert all(batch[key].shape == (0,) for key in ("low", "fair", "max"))
@@ -0,0 +1,134 @@
+"""
+Cached JWT principals (see app.auth): LRU and TTL, invalidation by commits
+that touch users / dealer_profiles, and tokens whose claims no longer match
+"""
+
+import pytest
+from fastapi import HTTPException
+
+from app import auth
+from app.auth import Principal, PrincipalCache, create_token, get_principal
+from app.models import User, UserRole
+from app.query_budgets import assert_max_queries
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = PrincipalCache(ttl=60)
+    monkeypatch.setattr(auth, "principal_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(auth, "time", clock)
+    return clock
+
+
+def principal(user_id):
+    return Principal(user_id, UserRole.DEALER, user_id * 10, "Test", "Dealer", "Motors")
+
+
+def dealer_token(dealer, **claims):
+    claims = {"role": "dealer", "dealer_id": dealer.id, **claims}
+    return create_token(dealer.user_id, claims["role"], claims["dealer_id"])
+
+
+def test_lru_eviction_and_ttl(clock):
+    cache = PrincipalCache(max_size=2, ttl=60)
+    for user_id in (1, 2):
+        cache.put(principal(user_id))
+    assert cache.get(1) == principal(1)
+    cache.put(principal(3))
+    assert cache.get(2) is None
+    assert cache.get(1) == principal(1)
+
+    clock.now += 60
+    assert cache.get(1) is None and cache.get(3) is None
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 3, 1, 0)
+
+
+def test_second_resolution_is_served_from_the_cache(db, make_dealer, cache):
+    dealer = make_dealer()
+    token = dealer_token(dealer)
+    expected = Principal(dealer.user_id, UserRole.DEALER, dealer.id, "Test", "Dealer 1", "Dealer 1 Motors")
+
+    assert get_principal(token, db) == expected
+    with assert_max_queries(0, "cached principal"):
+        assert get_principal(token, db) == expected
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_commits_invalidate_the_users_they_touch(db, make_dealer, cache):
+    dealer, other = make_dealer(), make_dealer()
+    token, other_token = dealer_token(dealer), dealer_token(other)
+    get_principal(token, db)
+    get_principal(other_token, db)
+
+    dealer.company_name = "Renamed Motors"
+    db.commit()
+    assert dealer.user_id not in cache.entries and other.user_id in cache.entries
+    assert get_principal(token, db).company_name == "Renamed Motors"
+
+    db.get(User, dealer.user_id).first_name = "Alex"
+    db.commit()
+    assert get_principal(token, db).first_name == "Alex"
+    assert cache.invalidations == 2
+
+
+def test_rollback_keeps_the_cached_principal(db, make_dealer, cache):
+    dealer = make_dealer()
+    token = dealer_token(dealer)
+    cached = get_principal(token, db)
+
+    dealer.company_name = "Never Saved"
+    db.flush()
+    db.rollback()
+    assert cache.get(dealer.user_id) is cached
+
+    # The rolled back change is not carried into the next commit's invalidations
+    db.commit()
+    assert get_principal(token, db) is cached
+    assert cache.invalidations == 0
+
+
+@pytest.mark.parametrize("claims", [{"role": "seller"}, {"dealer_id": 999999}, {"dealer_id": None}])
+def test_mismatched_claims_are_rejected_cached_or_not(db, make_dealer, cache, claims):
+    dealer = make_dealer()
+    stale = dealer_token(dealer, **claims)
+
+    with pytest.raises(HTTPException) as uncached:
+        get_principal(stale, db)
+    assert uncached.value.status_code == 401
+    assert dealer.user_id in cache.entries
+
+    with pytest.raises(HTTPException) as cached:
+        get_principal(stale, db)
+    assert cached.value.status_code == 401
+    assert get_principal(dealer_token(dealer), db).dealer_id == dealer.id
+
+
+def test_tokens_without_a_dealer_id_claim_still_resolve(db, make_dealer, cache):
+    dealer = make_dealer()
+    legacy = auth.jwt.encode({"sub": str(dealer.user_id), "role": "dealer"}, auth.SECRET_KEY, auth.ALGORITHM)
+    assert get_principal(legacy, db).dealer_id == dealer.id
+
+
+def test_unknown_users_and_bad_tokens(db, cache):
+    with pytest.raises(HTTPException) as missing:
+        get_principal(create_token(424242, "dealer", 1), db)
+    assert missing.value.status_code == 404
+    with pytest.raises(HTTPException) as invalid:
+        get_principal("not-a-token", db)
+    assert invalid.value.status_code == 401
+    assert len(cache.entries) == 0
@@ -0,0 +1,55 @@
+"""
+Statement budgets of the car catalog (see app.query_budgets)
+"""
+
+import asyncio
+from urllib.parse import urlencode
+
+import pytest
+
+from app.query_budgets import (
+    ENDPOINT_BUDGET, SNAPSHOT_BUDGET, _asgi_get, assert_max_queries, catalog_requests, orm_reads
+)
+
+MAKE, MODEL = "Toyota", "Camry"
+
+
+@pytest.fixture(scope="module")
+def snapshot(catalog_db):
+    from app.catalog import catalog
+    return catalog.reload()
+
+
+def test_snapshot_build(catalog_db):
+    from app.catalog import catalog
+
+    with assert_max_queries(SNAPSHOT_BUDGET, "catalog snapshot build"):
+        snapshot = catalog.reload()
+    details = snapshot.find(MAKE, MODEL)
+    assert details is not None
+    assert details.trims and details.body_types and details.transmissions and details.fuel_types
+
+
+@pytest.mark.parametrize(
+    "path, params", catalog_requests(MAKE, MODEL),
+    ids=lambda value: urlencode(value) if isinstance(value, dict) else value
+)
+def test_catalog_endpoint(snapshot, path, params):
+    from app.main import app
+
+    with assert_max_queries(ENDPOINT_BUDGET, f"GET {path}"):
+        status = asyncio.run(_asgi_get(app, path, params))
+    assert status == 200
+
+
+@pytest.mark.parametrize("label", list(orm_reads(MAKE, MODEL)))
+def test_orm_read(catalog_db, label):
+    from app.database import SessionLocal
+
+    read, budget = orm_reads(MAKE, MODEL)[label]
+    db = SessionLocal()
+    try:
+        with assert_max_queries(budget, label):
+            read(db)
+    finally:
+        db.close()
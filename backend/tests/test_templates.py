@@ -0,0 +1,169 @@
+"""
+Compiled message templates (see app.ai_provider.templates): output against
+plain str.format, escaping of dealer-supplied text that reaches exec, and
+the dealer_message_templates sync
+"""
+
+import pytest
+
+from app.ai_provider import templates
+from app.ai_provider.templates import (
+    FIELDS, TEMPLATES, TONES, TemplateRegistry, compile_override, compile_template, lead_values
+)
+from app.benchmarks.message_render import LEGACY_TEMPLATES, legacy_generate_message
+from app.query_budgets import assert_max_queries
+
+LEAD = {
+    "listing": {"year": 2018, "make": "Honda", "model": "Accord", "mileage": 42000},
+    "seller_name": "Sam",
+    "offer": {"amount": 15250.4},
+    "dealer_name": "Alex Doe",
+    "dealership_name": "Doe Motors",
+    "dealer_phone": "555-0100"
+}
+
+
+def formatted(template, tone, lead_data):
+    """Reference rendering through str.format"""
+    phrases = TONES[tone]
+    values = dict(zip(FIELDS, lead_values(lead_data)))
+    body = template.body.replace("{greeting}", phrases["greeting"])
+    body = body.replace("{sign_off}", phrases["sign_off"] or template.sign_off)
+    return template.subject.format(**values), body.format(**values)
+
+
+@pytest.mark.parametrize("name", list(TEMPLATES))
+@pytest.mark.parametrize("tone", list(TONES))
+def test_compiled_templates_equal_str_format(name, tone):
+    render = compile_template(TEMPLATES[name], tone)
+    assert render(*lead_values(LEAD)) == formatted(TEMPLATES[name], tone, LEAD)
+
+
+@pytest.mark.parametrize("name", LEGACY_TEMPLATES)
+def test_friendly_output_equals_the_legacy_renderer(name):
+    assert TemplateRegistry().render(name, LEAD) == legacy_generate_message(name, LEAD)
+
+
+def test_lead_values_are_inserted_literally():
+    lead = {**LEAD, "seller_name": "{dealer_name}'\"\\n{{", "dealership_name": "'''); import os; ('"}
+    subject, body = compile_override("{seller_name}", "{seller_name} / {dealership_name}")["friendly"](
+        *lead_values(lead)
+    )
+    assert subject == lead["seller_name"]
+    assert body == f"{lead['seller_name']} / {lead['dealership_name']}"
+
+
+@pytest.mark.parametrize("text", [
+    "It's \"quoted\" \\ with a backslash\\",
+    "''' triple quotes \"\"\" and f'{{1 + 1}}' text",
+    "Line one\nLine two\r\n\ttabbed",
+    "Escaped {{braces}} stay literal",
+    "\\N{{BULLET}} \\x41 \\u0041 are not escapes",
+    "Emoji 🚗 and accents é",
+])
+def test_literal_text_survives_compilation(text):
+    render = compile_override(text, text + " {seller_name}")["casual"]
+    subject, body = render(*lead_values(LEAD))
+    assert subject == text.replace("{{", "{").replace("}}", "}")
+    assert body == subject + " Sam"
+
+
+@pytest.mark.parametrize("text", [
+    "{__import__('os').system('true')}",
+    "{seller_name.__class__}",
+    "{seller_name[0]}",
+    "{0}",
+    "{}",
+    "{offer:>10}",
+    "{seller_name!r}",
+    "{unknown}",
+    "{seller_name",
+])
+def test_only_plain_whitelisted_placeholders_compile(text):
+    with pytest.raises(ValueError):
+        compile_override("Subject", text)
+    with pytest.raises(ValueError):
+        compile_override(text, "Body")
+
+
+def test_resolve_fallbacks_and_dealer_overrides():
+    registry = TemplateRegistry()
+    default = registry.render("initial_contact", LEAD)
+    assert registry.render("initial_contact", LEAD, tone="shouty") == default
+    assert registry.render("no_such_template", LEAD) == default
+
+    registry.set_override(7, "initial_contact", "Hi {seller_name}", "{greeting} {offer} {sign_off}", "Thanks,")
+    assert registry.render("initial_contact", LEAD, "professional", dealer_id=7) == {
+        "subject": "Hi Sam", "body": "Dear Sam, 15,250 Kind regards,"
+    }
+    assert registry.render("initial_contact", LEAD, dealer_id=7)["body"] == "Hi Sam, 15,250 Thanks,"
+    assert registry.render("initial_contact", LEAD, dealer_id=8) == default
+
+    registry.clear_overrides(7)
+    assert registry.render("initial_contact", LEAD, dealer_id=7) == default
+
+
+def test_resolve_never_queries_the_database(db, make_dealer):
+    from app.models import DealerMessageTemplate
+
+    dealer_id = make_dealer().id
+    db.add(DealerMessageTemplate(dealer_id=dealer_id, name="initial_contact", subject="S", body="B", sign_off="-"))
+    db.commit()
+    registry = TemplateRegistry()
+    with assert_max_queries(0, "render"):
+        assert registry.render("initial_contact", LEAD, dealer_id=dealer_id)["subject"] != "S"
+        registry.render_many([LEAD] * 3, dealer_id=dealer_id)
+
+
+def test_load_syncs_the_table(db, make_dealer, caplog):
+    from app.models import DealerMessageTemplate
+
+    first, second = make_dealer(), make_dealer()
+    db.add_all([
+        DealerMessageTemplate(dealer_id=first.id, name="initial_contact", subject="A {vehicle}", body="a", sign_off="-"),
+        DealerMessageTemplate(dealer_id=first.id, name="follow_up_1", subject="B", body="b", sign_off="-"),
+        DealerMessageTemplate(dealer_id=second.id, name="initial_contact", subject="{bad}", body="c", sign_off="-"),
+    ])
+    db.commit()
+    registry = TemplateRegistry()
+    assert registry.load()
+
+    assert registry.render("initial_contact", LEAD, dealer_id=first.id)["subject"] == "A 2018 Honda Accord"
+    # A row that no longer compiles is skipped, not served
+    assert registry.render("initial_contact", LEAD, dealer_id=second.id) == registry.render("initial_contact", LEAD)
+    assert "Skipping template 'initial_contact'" in caplog.text
+
+    unchanged = registry.resolve("initial_contact", dealer_id=first.id)
+    db.query(DealerMessageTemplate).filter_by(name="follow_up_1").update({"subject": "B2"})
+    db.query(DealerMessageTemplate).filter_by(dealer_id=second.id).delete()
+    db.commit()
+    assert registry.load()
+
+    assert registry.resolve("initial_contact", dealer_id=first.id) is unchanged
+    assert registry.render("follow_up_1", LEAD, dealer_id=first.id)["subject"] == "B2"
+    assert set(registry.sources) == {(first.id, "initial_contact"), (first.id, "follow_up_1")}
+
+
+def test_load_never_undoes_a_newer_local_edit(db, make_dealer, monkeypatch):
+    from app import database
+
+    dealer = make_dealer()
+    registry = TemplateRegistry()
+    session_factory = database.SessionLocal
+
+    def edited_while_reading():
+        registry.set_override(dealer.id, "initial_contact", "Saved", "Just now")
+        return session_factory()
+
+    monkeypatch.setattr(database, "SessionLocal", edited_while_reading)
+    assert registry.load() is False
+    assert registry.render("initial_contact", LEAD, dealer_id=dealer.id)["subject"] == "Saved"
+
+
+def test_start_sync_runs_once(monkeypatch):
+    started = []
+    monkeypatch.setattr(templates.threading.Thread, "start", lambda thread: started.append(thread.name))
+    registry = TemplateRegistry()
+    registry.start_sync()
+    registry.start_sync()
+    assert started == ["template-sync"]
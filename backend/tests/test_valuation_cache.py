@@ -0,0 +1,169 @@
+"""
+Valuation cache (see app.ai_provider.valuation_cache): LRU and TTL, group
+invalidation, the shared second level, and invalidations coalesced per
+comps commit
+"""
+
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+
+from app.ai_provider import valuation_cache as module
+from app.ai_provider.valuation_cache import LocalBackend, RedisBackend, ValuationCache, valuation_key
+from app.matching.comps import CompsIndex, bucket_key
+from app.models import CarListing
+
+CAMRY = valuation_key(2018, "Toyota", "Camry", 42000, "good", "normal")
+CAMRY_HIGH_MILES = valuation_key(2018, "toyota ", "CAMRY", 120000, "good", "normal")
+CIVIC = valuation_key(2018, "Honda", "Civic", 42000, "good", "normal")
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+
+class CountingBackend(LocalBackend):
+    def __init__(self):
+        super().__init__()
+        self.incr_calls = []
+
+    def incr_many(self, keys):
+        self.incr_calls.append(sorted(keys))
+        super().incr_many(keys)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(module, "time", clock)
+    return clock
+
+
+def group(key):
+    return bucket_key(key[1], key[2], key[0])
+
+
+def test_valuation_key_buckets_and_tier_bounds():
+    assert valuation_key(2018, " Toyota", "camry ", 41500, "Good", "Normal") == CAMRY
+    # Tier bounds (50k, 75k, 100k) stay at the top of their bucket
+    assert valuation_key(2018, "Toyota", "Camry", 50000, "good", "normal")[3] == \
+        valuation_key(2018, "Toyota", "Camry", 49001, "good", "normal")[3]
+    assert valuation_key(2018, "Toyota", "Camry", 50001, "good", "normal")[3] != \
+        valuation_key(2018, "Toyota", "Camry", 50000, "good", "normal")[3]
+
+
+def test_hits_misses_and_lru_eviction(clock):
+    cache = ValuationCache(max_size=2, ttl=60)
+    assert cache.get(CAMRY) is None
+    cache.put(CAMRY, {"fair": 1})
+    cache.put(CIVIC, {"fair": 2})
+    assert cache.get(CAMRY) == {"fair": 1}
+    cache.put(CAMRY_HIGH_MILES, {"fair": 3})
+
+    assert cache.get(CIVIC) is None
+    assert cache.get(CAMRY) == {"fair": 1}
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"], stats["size"]) == (2, 2, 1, 2)
+
+
+def test_entries_expire_after_ttl(clock):
+    cache = ValuationCache(ttl=60)
+    computed = []
+    compute = lambda: computed.append(1) or {"fair": len(computed)}
+
+    assert cache.get_or_compute(CAMRY, compute) == {"fair": 1}
+    clock.now += 59
+    assert cache.get_or_compute(CAMRY, compute) == {"fair": 1}
+    clock.now += 1
+    assert cache.get_or_compute(CAMRY, compute) == {"fair": 2}
+    assert cache.stats()["expirations"] == 1
+
+
+def test_invalidate_drops_only_the_given_groups(clock):
+    cache = ValuationCache(ttl=60)
+    for key in (CAMRY, CAMRY_HIGH_MILES, CIVIC):
+        cache.put(key, {"fair": 1})
+
+    cache.invalidate({group(CAMRY)})
+    assert cache.get(CAMRY) is None and cache.get(CAMRY_HIGH_MILES) is None
+    assert cache.get(CIVIC) == {"fair": 1}
+
+    cache.invalidate(None)
+    assert cache.get(CIVIC) is None
+    assert cache.stats()["invalidations"] == 3
+
+
+def test_shared_backend_across_workers(clock):
+    backend = LocalBackend()
+    first, second = ValuationCache(ttl=60, backend=backend), ValuationCache(ttl=60, backend=backend)
+
+    first.put(CAMRY, {"fair": 1})
+    assert second.get(CAMRY) == {"fair": 1}
+    assert second.stats()["shared_hits"] == 1
+
+    # An invalidation in one worker retires the shared entries of the group for all
+    first.invalidate({group(CAMRY)})
+    third = ValuationCache(ttl=60, backend=backend)
+    assert third.get(CAMRY) is None
+
+    # Shared entries expire with the same TTL
+    first.put(CIVIC, {"fair": 2})
+    clock.now += 60
+    assert ValuationCache(ttl=60, backend=backend).get(CIVIC) is None
+
+
+def test_redis_backend_batches_increments():
+    calls = []
+
+    class Pipeline:
+        def incr(self, key):
+            calls.append(("incr", key))
+
+        def execute(self):
+            calls.append(("execute",))
+
+    backend = RedisBackend.__new__(RedisBackend)
+    backend.client = SimpleNamespace(pipeline=lambda transaction: Pipeline())
+    backend.incr_many(["a", "b"])
+    assert calls == [("incr", "a"), ("incr", "b"), ("execute",)]
+
+
+def test_one_invalidation_per_comps_commit(db, clock):
+    backend = CountingBackend()
+    cache = ValuationCache(ttl=60, backend=backend)
+    comps = CompsIndex()
+    comps.loaded = True
+    comps.listeners.append(cache.invalidate)
+    for key in (CAMRY, CIVIC):
+        cache.put(key, {"fair": 1})
+
+    def listing(listing_id, make, model):
+        return CarListing(
+            id=listing_id, make=make, model=model, year=2018, mileage=40000,
+            asking_price=15000, created_at=datetime.utcnow()
+        )
+
+    for listing_id in range(1, 6):
+        with db.begin_nested():
+            comps.add_after_commit(db, listing(listing_id, "Toyota", "Camry"))
+    with pytest.raises(RuntimeError):
+        with db.begin_nested():
+            comps.add_after_commit(db, listing(6, "Ford", "F-150"))
+            raise RuntimeError("job failed")
+    comps.add_after_commit(db, listing(7, "Honda", "Civic"))
+
+    assert backend.incr_calls == []
+    assert cache.get(CAMRY) == {"fair": 1}
+    db.commit()
+
+    assert len(backend.incr_calls) == 1
+    assert backend.incr_calls[0] == sorted(
+        f"valuation:gen:{'|'.join(map(str, group(key)))}" for key in (CAMRY, CIVIC)
+    )
+    assert cache.get(CAMRY) is None and cache.get(CIVIC) is None
+    assert comps.seen == {1, 2, 3, 4, 5, 7}
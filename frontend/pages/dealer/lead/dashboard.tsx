@@ -54,6 +54,8 @@ export default function DealerDashboard() {
   const [leads, setLeads] = useState<Lead[]>([]);
   const [stats, setStats] = useState<Stats | null>(null);
   const [loading, setLoading] = useState(true);
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [dealerEmail, setDealerEmail] = useState('');
   const [selectedLead, setSelectedLead] = useState<Lead | null>(null);
 
@@ -85,24 +87,40 @@ export default function DealerDashboard() {
     }
   };
 
-  const fetchLeads = async (token: string, source: string) => {
+  // The API returns one page at a time; next_cursor fetches the page after it
+  const fetchLeads = async (token: string, source: string, cursor: string | null = null) => {
     try {
-      setLoading(true);
-      const response = await fetch(`https://revomotors.onrender.com/api/leads?source=${source}`, {
+      if (cursor) {
+        setLoadingMore(true);
+      } else {
+        setLoading(true);
+      }
+      const params = new URLSearchParams({ source });
+      if (cursor) params.set('cursor', cursor);
+      const response = await fetch(`https://revomotors.onrender.com/api/leads?${params}`, {
         headers: { 'Authorization': `Bearer ${token}` },
       });
 
       if (response.ok) {
         const data = await response.json();
-        setLeads(data.leads || []);
+        const page: Lead[] = data.leads || [];
+        setLeads((previous) => (cursor ? [...previous, ...page] : page));
+        setNextCursor(data.next_cursor || null);
       }
     } catch (error) {
       console.error('Error fetching leads:', error);
     } finally {
       setLoading(false);
+      setLoadingMore(false);
     }
   };
 
+  const handleLoadMore = () => {
+    const token = localStorage.getItem('dealer_token');
+    if (!token || !nextCursor) return;
+    fetchLeads(token, activeTab === 'hot' ? 'hot_lead' : 'marketplace', nextCursor);
+  };
+
   const handleGenerateMessage = async (leadId: number) => {
     const token = localStorage.getItem('dealer_token');
     try {
@@ -354,6 +372,24 @@ export default function DealerDashboard() {
                     </div>
                   </div>
                 ))}
+                {nextCursor && (
+                  <button
+                    onClick={handleLoadMore}
+                    disabled={loadingMore}
+                    style={{
+                      padding: '12px 20px',
+                      backgroundColor: 'white',
+                      color: '#2563eb',
+                      fontSize: '14px',
+                      fontWeight: '600',
+                      borderRadius: '6px',
+                      border: '1px solid #2563eb',
+                      cursor: loadingMore ? 'default' : 'pointer'
+                    }}
+                  >
+                    {loadingMore ? 'Loading...' : 'Load more leads'}
+                  </button>
+                )}
               </div>
             )}
           </div>
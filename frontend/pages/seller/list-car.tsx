@@ -95,7 +95,7 @@ export default function ListCar() {
       if (response.ok) {
         alert(
           `✅ Success! Your car has been listed.\n\n` +
-          `Listing ID: ${data.listing_id}\n` +
+          `Reference: ${data.listing_id ?? data.ingestion_id}\n` +
           `AI Fair Offer: $${data.ai_draft_offer?.fair || 'N/A'}\n` +
           `Price Range: $${data.ai_draft_offer?.low || 'N/A'} - $${data.ai_draft_offer?.max || 'N/A'}\n\n` +
           `Dealers will contact you soon!`